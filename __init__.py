@@ -18,6 +18,10 @@ def create_app(config_name=None):
     from config import config
     app.config.from_object(config[config_name])
     
+    # JSON com orjson quando disponível
+    from utils.serialization import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # Inicializar extensões
     db.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
@@ -32,15 +36,24 @@ def create_app(config_name=None):
     from routes.tasks import tasks_bp
     from routes.finances import finances_bp
     from routes.uploads import uploads_bp
+    from routes.dashboard import dashboard_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(tasks_bp, url_prefix='/api')
     app.register_blueprint(finances_bp, url_prefix='/api')
     app.register_blueprint(uploads_bp, url_prefix='/api')
+    app.register_blueprint(dashboard_bp, url_prefix='/api')
+    
+    # Pós-processamento dos anexos em segundo plano
+    from models.attachment import Attachment
+    from routes.uploads import ALLOWED_EXTENSIONS
+    from utils.attachment_pipeline import init_attachment_pipeline
+    init_attachment_pipeline(app, db, Attachment, ALLOWED_EXTENSIONS)
     
-    # Criar tabelas do banco
+    # Criar tabelas do banco (e índices novos em bancos existentes)
+    from utils.schema import upgrade_schema
     with app.app_context():
-        db.create_all()
+        upgrade_schema(db)
     
     return app
@@ -7,11 +7,64 @@ Aplicação Flask para gestão de tarefas e controle financeiro
 from flask import Flask, jsonify, render_template, request, send_file, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import date, datetime
 import os
 
+from utils.analytics import finance_analytics, parse_analytics_args
+from utils.attachment_pipeline import (
+    DEFAULT_WORKERS, REJECTED, init_attachment_pipeline
+)
+from utils.blobs import blob_path, discard_temp, publish_blob, store_blob
+from utils.boards import board_columns, parse_board_args
+from utils.cashflow import cashflow, parse_cashflow_args
+from utils.dashboard import dashboard_summary
+from utils.dates import month_range, parse_year
+from utils.downloads import (
+    DEFAULT_ACCEL_PREFIX, DEFAULT_SEND_MODE, send_attachment, wants_download
+)
+from utils.finance_reports import (
+    monthly_series, parse_series_range, series_response
+)
+from utils.installments import (
+    insert_installments, parse_upcoming_args, upcoming_installments
+)
+from utils.money import parse_money, track_cents
+from utils.pagination import (
+    keyset_paginate, order_clauses, page_response, parse_limit,
+    wants_full_listing
+)
+from utils.plans import (
+    delete_plan, parse_plan_changes, parse_plan_scope, update_plan
+)
+from utils.recurrence import (
+    configure_schedule, merge_occurrences, occurrence_title, schedules_in_range,
+    wants_virtual
+)
+from utils.rollup import track_rollup
+from utils.schema import upgrade_schema
+from utils.serialization import (
+    FINANCE_FIELDS, TASK_FIELDS, FastJSONProvider, json_bytes_response,
+    project, row_serializer, rows_to_dicts, wants_fast_path
+)
+from utils.streaming import stream_query, stream_select, wants_stream
+from utils.upload_sessions import (
+    DEFAULT_MAX_RESERVED_BYTES, DEFAULT_MAX_UPLOAD_SESSIONS,
+    UploadCapacityError, create_upload_session, discard_upload_session,
+    expire_upload_sessions, finalize_upload, parse_offset, parse_upload_size,
+    session_file, session_response, write_chunk
+)
+from utils.statement_import import (
+    import_statement, parse_import_args, statement_records
+)
+from utils.sync import changes_since, sync_response, track_deletions
+from utils.versioning import make_conditional_get, track_versions
+from utils.task_filters import (
+    apply_task_filters, parse_task_filters, task_sort_keys
+)
+
 # =========================
 # Configuração da Aplicação
 # =========================
@@ -21,11 +74,36 @@ def create_app():
     app = Flask(__name__)
     
     # Configurações
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///banco.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL', 'sqlite:///banco.db'
+    )
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = 'uploads/'
     app.config['SECRET_KEY'] = 'minha_chave_secreta'
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    # Envio dos anexos: direct, x-accel-redirect (nginx) ou x-sendfile
+    app.config['ATTACHMENT_SEND_MODE'] = os.environ.get(
+        'ATTACHMENT_SEND_MODE', DEFAULT_SEND_MODE
+    )
+    app.config['ATTACHMENT_ACCEL_PREFIX'] = os.environ.get(
+        'ATTACHMENT_ACCEL_PREFIX', DEFAULT_ACCEL_PREFIX
+    )
+    # Pós-processamento dos anexos: threads por processo e verificador
+    # opcional (modulo:funcao, recebe o caminho e o anexo)
+    app.config['ATTACHMENT_WORKERS'] = int(os.environ.get(
+        'ATTACHMENT_WORKERS', DEFAULT_WORKERS
+    ))
+    app.config['ATTACHMENT_SCANNER'] = os.environ.get('ATTACHMENT_SCANNER')
+    # Uploads em partes abertos ao mesmo tempo e soma dos tamanhos declarados
+    app.config['UPLOAD_MAX_SESSIONS'] = int(os.environ.get(
+        'UPLOAD_MAX_SESSIONS', DEFAULT_MAX_UPLOAD_SESSIONS
+    ))
+    app.config['UPLOAD_MAX_RESERVED_BYTES'] = int(os.environ.get(
+        'UPLOAD_MAX_RESERVED_BYTES', DEFAULT_MAX_RESERVED_BYTES
+    ))
+    
+    # JSON com orjson quando disponível
+    app.json = FastJSONProvider(app)
     
     # Configurar CORS
     CORS(app, origins=['http://127.0.0.1:5000', 'http://localhost:5000'])
@@ -79,6 +157,23 @@ class TaskCategory(db.Model):
 class Task(db.Model):
     """Modelo para tarefas do sistema Kanban"""
     __tablename__ = 'task'
+    __table_args__ = (
+        # Quadros por tipo (e coluna); o rowid implícito em cada índice
+        # mantém a ordem por id sem ordenação temporária
+        db.Index('ix_task_type', 'type'),
+        db.Index('ix_task_type_status', 'type', 'status'),
+        db.Index('ix_task_due_date', 'due_date'),
+        db.Index('ix_task_updated_at', 'updated_at', 'id'),
+        db.Index('ix_task_assigned_to', 'assigned_to'),
+        db.Index('ix_task_created_by', 'created_by'),
+        db.Index('ix_task_category_id', 'category_id'),
+        # Filtros sem tipo e ordenações de ?sort= (id no fim desempata
+        # na mesma ordem do cursor)
+        db.Index('ix_task_status', 'status', 'id'),
+        db.Index('ix_task_priority', 'priority', 'id'),
+        db.Index('ix_task_created_at', 'created_at', 'id'),
+        db.Index('ix_task_title', 'title', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -116,6 +211,9 @@ class Task(db.Model):
 class TaskHistory(db.Model):
     """Modelo para histórico de mudanças nas tarefas"""
     __tablename__ = 'task_history'
+    __table_args__ = (
+        db.Index('ix_task_history_task_id_changed_at', 'task_id', 'changed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
@@ -126,6 +224,16 @@ class TaskHistory(db.Model):
 
     task = db.relationship('Task', backref=db.backref('histories', lazy=True))
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'changed_at': self.changed_at.isoformat(),
+            'old_status': self.old_status,
+            'new_status': self.new_status,
+            'observation': self.observation
+        }
+
 class FinanceCategory(db.Model):
     """Modelo para categorias financeiras"""
     __tablename__ = 'finance_category'
@@ -144,18 +252,45 @@ class FinanceCategory(db.Model):
 class Finance(db.Model):
     """Modelo para movimentações financeiras"""
     __tablename__ = 'finance'
+    __table_args__ = (
+        db.Index('ix_finance_transaction_date', 'transaction_date'),
+        db.Index('ix_finance_updated_at', 'updated_at', 'id'),
+        # Próximas parcelas: recurrence = ? AND transaction_date >= ?
+        db.Index(
+            'ix_finance_recurrence_transaction_date',
+            'recurrence', 'transaction_date'
+        ),
+        db.Index('ix_finance_parent_finance_id', 'parent_finance_id'),
+        db.Index('ix_finance_category_id', 'category_id'),
+        db.Index(
+            'ix_finance_schedule_interval_transaction_date',
+            'schedule_interval', 'transaction_date'
+        ),
+        # Importação de extratos: a mesma transação não entra duas vezes
+        db.Index('ix_finance_import_key', 'import_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     value = db.Column(db.Float, nullable=False)
+    # Valor exato em centavos, usado nas somas (utils.money.track_cents)
+    value_cents = db.Column(db.BigInteger, nullable=False)
     transaction_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     recurrence = db.Column(db.String(20), default='NONE')
     installments_total = db.Column(db.Integer, default=1)
     installment_current = db.Column(db.Integer, default=1)
     parent_finance_id = db.Column(db.Integer, db.ForeignKey('finance.id'))
     category_id = db.Column(db.Integer, db.ForeignKey('finance_category.id'))
+    # Agenda virtual (utils.recurrence): meses entre ocorrências e data da
+    # última; NULL em movimentações comuns
+    schedule_interval = db.Column(db.Integer)
+    schedule_end = db.Column(db.Date)
+    # Identificador da transação no extrato importado (utils.statement_import);
+    # NULL nas movimentações criadas pela API
+    import_key = db.Column(db.String(64))
 
     category = db.relationship('FinanceCategory', backref=db.backref('finances', lazy=True))
     parent_finance = db.relationship('Finance', remote_side=[id])
@@ -166,77 +301,209 @@ class Finance(db.Model):
             'title': self.title,
             'description': self.description,
             'value': self.value,
+            'value_cents': self.value_cents,
             'transaction_date': self.transaction_date.isoformat(),
             'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'recurrence': self.recurrence,
             'installments_total': self.installments_total,
             'installment_current': self.installment_current,
             'parent_finance_id': self.parent_finance_id,
-            'category_id': self.category_id
+            'category_id': self.category_id,
+            'schedule_interval': self.schedule_interval,
+            'schedule_end': self.schedule_end.isoformat() if self.schedule_end else None
         }
 
 class Attachment(db.Model):
     """Modelo para anexos de tarefas e finanças"""
     __tablename__ = 'attachment'
+    __table_args__ = (
+        db.Index('ix_attachment_task_id', 'task_id'),
+        db.Index('ix_attachment_finance_id', 'finance_id'),
+        db.Index('ix_attachment_blob_id', 'blob_id'),
+        db.Index('ix_attachment_status', 'status', 'status_changed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    # Caminho do conteúdo em disco (o do blob, para anexos deduplicados)
     file_path = db.Column(db.String(255), nullable=False)
+    # Nome original (já passado por secure_filename)
+    filename = db.Column(db.String(255))
+    blob_id = db.Column(db.Integer, db.ForeignKey('attachment_blob.id'))
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
     finance_id = db.Column(db.Integer, db.ForeignKey('finance.id'))
+    # Pós-processamento em segundo plano (utils.attachment_pipeline)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    status_detail = db.Column(db.Text)
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    mime_type = db.Column(db.String(100))
+    # Texto extraído de txt/pdf para busca
+    text_content = db.Column(db.Text)
 
     task = db.relationship('Task', backref=db.backref('attachments', lazy=True))
     finance = db.relationship('Finance', backref=db.backref('attachments', lazy=True))
+    blob = db.relationship('AttachmentBlob')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_path': self.file_path,
+            'filename': self.filename,
+            'sha256': self.blob.sha256 if self.blob else None,
+            'size': self.blob.size if self.blob else None,
+            'description': self.description,
+            'status': self.status,
+            'status_detail': self.status_detail,
+            'mime_type': self.mime_type,
+            'created_at': self.created_at.isoformat(),
+            'task_id': self.task_id,
+            'finance_id': self.finance_id
+        }
+
+class AttachmentBlob(db.Model):
+    """Conteúdo de anexo gravado uma única vez, endereçado pelo SHA-256"""
+    __tablename__ = 'attachment_blob'
+    __table_args__ = (
+        db.Index('ix_attachment_blob_sha256', 'sha256', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Quantos anexos apontam para este conteúdo (utils.blobs)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    """Upload em partes em andamento (utils.upload_sessions)"""
+    __tablename__ = 'upload_session'
+    __table_args__ = (
+        # Limpeza das sessões abandonadas: updated_at < ?
+        db.Index('ix_upload_session_updated_at', 'updated_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Bytes confirmados a partir do início; o próximo PATCH começa aqui
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    description = db.Column(db.Text)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
+    finance_id = db.Column(db.Integer, db.ForeignKey('finance.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class DeletedRecord(db.Model):
+    """Tombstones de registros apagados (sincronização incremental)"""
+    __tablename__ = 'deleted_record'
+    __table_args__ = (
+        db.Index('ix_deleted_record_table_name_id', 'table_name', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class TableVersion(db.Model):
+    """Contador de versão por tabela, usado nos ETags das listagens"""
+    __tablename__ = 'table_version'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class FinanceMonthlyRollup(db.Model):
+    """Totais mensais por categoria, mantidos junto com ``finance``"""
+    __tablename__ = 'finance_monthly_rollup'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 0 = sem categoria (ver utils.rollup.UNCATEGORIZED)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    income_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    expense_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transactions_count = db.Column(db.Integer, nullable=False, default=0)
+
+track_deletions(Task, DeletedRecord)
+track_deletions(Finance, DeletedRecord)
+track_versions(Task, TableVersion)
+track_versions(Finance, TableVersion)
+track_versions(FinanceCategory, TableVersion)
+track_cents(Finance)
+track_rollup(Finance, FinanceMonthlyRollup)
+
+conditional_get = make_conditional_get(db, TableVersion)
+
+# Esquema atualizado também quando o módulo só é importado (gunicorn
+# app:app), como em ``__init__.create_app``
+with app.app_context():
+    schema_changes = upgrade_schema(db)
 
 # =========================
 # Funções Utilitárias
 # =========================
 
 def create_future_installments(finance):
-    """Cria as parcelas futuras de uma movimentação parcelada"""
-    if finance.installments_total <= 1:
-        return
-    
-    for i in range(2, finance.installments_total + 1):
-        future_date = finance.transaction_date
-        
-        # Adiciona meses para cada parcela
-        month = future_date.month + (i - 1)
-        year = future_date.year + (month - 1) // 12
-        month = ((month - 1) % 12) + 1
-        
-        try:
-            future_finance = Finance(
-                title=f"{finance.title} - Parcela {i}/{finance.installments_total}",
-                description=finance.description,
-                value=finance.value,
-                transaction_date=future_date.replace(year=year, month=month),
-                recurrence='INSTALLMENT',
-                installments_total=finance.installments_total,
-                installment_current=i,
-                parent_finance_id=finance.id,
-                category_id=finance.category_id
+    """Cria as parcelas futuras de uma movimentação parcelada (sem commit)"""
+    return insert_installments(
+        db.session, finance, TableVersion, FinanceMonthlyRollup
+    )
+
+def list_tasks(task_type=None):
+    """Responde uma listagem de tarefas filtrada e paginada por cursor
+
+    Os filtros da query string são validados antes de qualquer consulta.
+    Com ``?all=true`` devolve a lista completa (formato legado do kanban).
+    Com ``?fast=true`` lê só as colunas via ``select()``, sem hidratar
+    objetos do ORM. Com ``?stream=true`` envia a listagem completa em
+    lotes, sem montar a lista inteira em memória.
+    """
+    spec = parse_task_filters(request.args, task_type)
+    keys = task_sort_keys(Task, spec)
+    fast = wants_fast_path(request.args)
+    base = select(*project(Task, TASK_FIELDS)) if fast else Task.query
+    query = apply_task_filters(base, Task, spec)
+
+    if wants_stream(request.args):
+        query = query.order_by(*order_clauses(keys))
+        if fast:
+            return stream_select(
+                db.session, query, row_serializer(TASK_FIELDS)
             )
-            db.session.add(future_finance)
-        except ValueError:
-            # Se a data for inválida, ajusta para o último dia do mês
-            import calendar
-            last_day = calendar.monthrange(year, month)[1]
-            day = min(future_date.day, last_day)
-            
-            future_finance = Finance(
-                title=f"{finance.title} - Parcela {i}/{finance.installments_total}",
-                description=finance.description,
-                value=finance.value,
-                transaction_date=future_date.replace(year=year, month=month, day=day),
-                recurrence='INSTALLMENT',
-                installments_total=finance.installments_total,
-                installment_current=i,
-                parent_finance_id=finance.id,
-                category_id=finance.category_id
+        return stream_query(query, Task.to_dict)
+
+    if wants_full_listing(request.args):
+        query = query.order_by(*order_clauses(keys))
+        if fast:
+            return json_bytes_response(
+                rows_to_dicts(db.session.execute(query), TASK_FIELDS)
             )
-            db.session.add(future_finance)
+        return jsonify([task.to_dict() for task in query.all()])
+
+    limit = parse_limit(request.args.get('limit'))
+    tasks, next_cursor = keyset_paginate(
+        query, keys, request.args.get('cursor'), limit,
+        session=db.session if fast else None
+    )
+    if fast:
+        return json_bytes_response(page_response(
+            rows_to_dicts(tasks, TASK_FIELDS), next_cursor, limit
+        ))
+    return jsonify(page_response(
+        [task.to_dict() for task in tasks], next_cursor, limit
+    ))
 
 def validate_request_data(data, required_fields):
     """Valida se os campos obrigatórios estão presentes"""
@@ -274,6 +541,24 @@ def kanban_work():
     """Página do Kanban para atividades de trabalho"""
     return render_template('kanban-work.html')
 
+# =========================
+# Dashboard
+# =========================
+
+@app.route('/dashboard/summary', methods=['GET', 'OPTIONS'])
+@conditional_get('task', 'finance', extra=date.today)
+def get_dashboard_summary():
+    """Agregados do dashboard calculados no banco"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        return jsonify(dashboard_summary(
+            db.session, Task, Finance, FinanceMonthlyRollup
+        ))
+    except Exception as e:
+        return jsonify({'message': f'Erro ao calcular resumo: {str(e)}'}), 500
+
 # =========================
 # Rotas de Arquivos Estáticos
 # =========================
@@ -382,29 +667,52 @@ def logout():
 # =========================
 
 @app.route('/tasks', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
 def get_tasks():
-    """Lista todas as tarefas"""
+    """Lista as tarefas (paginado por cursor)"""
     if request.method == 'OPTIONS':
         return '', 200
         
     try:
-        tasks = Task.query.all()
-        return jsonify([task.to_dict() for task in tasks])
+        return list_tasks()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro ao buscar tarefas: {str(e)}'}), 500
 
 @app.route('/tasks/<task_type>', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
 def get_tasks_by_type(task_type):
     """Lista tarefas por tipo (university/work)"""
     if request.method == 'OPTIONS':
         return '', 200
         
     try:
-        tasks = Task.query.filter_by(type=task_type.upper()).all()
-        return jsonify([task.to_dict() for task in tasks])
+        return list_tasks(task_type)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro ao buscar tarefas: {str(e)}'}), 500
 
+@app.route('/boards/<task_type>', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
+def get_board(task_type):
+    """Quadro kanban agrupado por status, limitado por coluna"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        spec, per_column = parse_board_args(request.args, task_type)
+        return jsonify({
+            'type': task_type.upper(),
+            'per_column': per_column,
+            'columns': board_columns(db.session, Task, spec, per_column)
+        })
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao montar quadro: {str(e)}'}), 500
+
 @app.route('/tasks', methods=['POST', 'OPTIONS'])
 def create_task():
     """Cria uma nova tarefa"""
@@ -507,14 +815,16 @@ def delete_task(task_id):
 
 @app.route('/tasks/month/<int:month>', methods=['GET', 'OPTIONS'])
 def get_tasks_by_month(month):
-    """Lista tarefas por mês"""
+    """Lista tarefas com prazo no mês (``?year=``, padrão: ano corrente)"""
     if request.method == 'OPTIONS':
         return '', 200
         
     try:
+        start, end = month_range(parse_year(request.args.get('year')), month)
         tasks = Task.query.filter(
-            db.extract('month', Task.due_date) == month
-        ).all()
+            Task.due_date >= start,
+            Task.due_date < end
+        ).order_by(Task.due_date).all()
         
         return jsonify([
             {
@@ -524,20 +834,86 @@ def get_tasks_by_month(month):
             }
             for task in tasks
         ])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro ao buscar tarefas: {str(e)}'}), 500
 
+@app.route('/tasks/changes', methods=['GET', 'OPTIONS'])
+def get_task_changes():
+    """Tarefas criadas/alteradas e ids apagados desde o token ``since``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        query = Task.query
+        if request.args.get('type'):
+            query = query.filter_by(type=request.args['type'].upper())
+        tasks, deleted, next_since, has_more = changes_since(
+            query, Task, DeletedRecord, request.args.get('since'), limit
+        )
+        return jsonify(sync_response(
+            [task.to_dict() for task in tasks], deleted, next_since, has_more
+        ))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao buscar alterações: {str(e)}'}), 500
+
+@app.route('/tasks/<int:task_id>/history', methods=['GET', 'OPTIONS'])
+def get_task_history(task_id):
+    """Retorna o histórico de uma tarefa (``?stream=true`` em lotes)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    Task.query.get_or_404(task_id)
+    
+    try:
+        histories = (
+            TaskHistory.query
+            .filter_by(task_id=task_id)
+            .order_by(TaskHistory.changed_at.desc())
+        )
+        if wants_stream(request.args):
+            return stream_query(histories, TaskHistory.to_dict)
+        return jsonify([history.to_dict() for history in histories])
+    except Exception as e:
+        return jsonify({'message': f'Erro ao buscar histórico: {str(e)}'}), 500
+
 # =========================
 # CRUD de Finanças
 # =========================
 
 @app.route('/finances', methods=['GET', 'OPTIONS'])
+@conditional_get('finance')
 def get_finances():
-    """Lista todas as movimentações financeiras"""
+    """Lista todas as movimentações financeiras
+
+    ``?stream=true`` envia em lotes; ``?fast=true`` evita o ORM.
+    """
     if request.method == 'OPTIONS':
         return '', 200
         
     try:
+        if wants_stream(request.args):
+            if wants_fast_path(request.args):
+                return stream_select(
+                    db.session,
+                    select(*project(Finance, FINANCE_FIELDS))
+                    .order_by(Finance.id),
+                    row_serializer(FINANCE_FIELDS)
+                )
+            return stream_query(
+                Finance.query.order_by(Finance.id), Finance.to_dict
+            )
+
+        if wants_fast_path(request.args):
+            rows = db.session.execute(
+                select(*project(Finance, FINANCE_FIELDS))
+            )
+            return json_bytes_response(rows_to_dicts(rows, FINANCE_FIELDS))
+
         finances = Finance.query.all()
         return jsonify([finance.to_dict() for finance in finances])
     except Exception as e:
@@ -560,7 +936,7 @@ def create_finance():
         new_finance = Finance(
             title=data['title'],
             description=data.get('description', ''),
-            value=float(data['value']),
+            value=parse_money(data['value']),
             transaction_date=datetime.strptime(data['transaction_date'], '%Y-%m-%d').date(),
             recurrence=data.get('recurrence', 'NONE'),
             installments_total=data.get('installments_total', 1),
@@ -568,19 +944,24 @@ def create_finance():
             category_id=data.get('category_id')
         )
         
+        # "virtual": true grava a recorrência como agenda, em uma só linha
+        if wants_virtual(data):
+            configure_schedule(new_finance, data.get('schedule_end'))
+        
         db.session.add(new_finance)
-        db.session.commit()
 
-        # Cria parcelas futuras, se for parcelado
-        if new_finance.installments_total > 1:
-            create_future_installments(new_finance)
-            db.session.commit()
+        # Pai e parcelas futuras gravados no mesmo commit
+        create_future_installments(new_finance)
+        db.session.commit()
 
         return jsonify({
             'id': new_finance.id,
             'message': 'Movimentação financeira criada com sucesso!',
             'finance': new_finance.to_dict()
         })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro ao criar movimentação: {str(e)}'}), 500
@@ -597,7 +978,7 @@ def update_finance(finance_id):
     try:
         finance.title = data.get('title', finance.title)
         finance.description = data.get('description', finance.description)
-        finance.value = float(data.get('value', finance.value))
+        finance.value = parse_money(data.get('value', finance.value))
         
         if data.get('transaction_date'):
             finance.transaction_date = datetime.strptime(data['transaction_date'], '%Y-%m-%d').date()
@@ -607,12 +988,21 @@ def update_finance(finance_id):
         finance.installment_current = data.get('installment_current', finance.installment_current)
         finance.category_id = data.get('category_id', finance.category_id)
 
+        # Agenda virtual: editar a linha edita o plano inteiro
+        if finance.schedule_interval is not None:
+            configure_schedule(
+                finance, data.get('schedule_end', finance.schedule_end)
+            )
+
         db.session.commit()
         
         return jsonify({
             'message': 'Movimentação atualizada com sucesso!',
             'finance': finance.to_dict()
         })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro ao atualizar movimentação: {str(e)}'}), 500
@@ -633,48 +1023,204 @@ def delete_finance(finance_id):
         db.session.rollback()
         return jsonify({'message': f'Erro ao deletar movimentação: {str(e)}'}), 500
 
+@app.route('/finances/<int:finance_id>/plan', methods=['PUT', 'DELETE', 'OPTIONS'])
+def change_finance_plan(finance_id):
+    """Altera ou apaga o plano de parcelas inteiro em uma transação
+
+    ``finance_id`` pode ser o pai ou qualquer parcela. Com
+    ``?scope=onward`` só a parcela informada e as seguintes.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    finance = Finance.query.get_or_404(finance_id)
+    
+    try:
+        scope = parse_plan_scope(request.args.get('scope'))
+        if request.method == 'DELETE':
+            count = delete_plan(
+                db.session, finance, scope,
+                TableVersion, FinanceMonthlyRollup, DeletedRecord
+            )
+            db.session.commit()
+            return jsonify({
+                'message': f'{count} parcela(s) deletada(s) com sucesso!',
+                'deleted': count
+            })
+        
+        changes = parse_plan_changes(request.get_json(silent=True))
+        count = update_plan(
+            db.session, finance, changes, scope,
+            TableVersion, FinanceMonthlyRollup
+        )
+        db.session.commit()
+        return jsonify({
+            'message': f'{count} parcela(s) atualizada(s) com sucesso!',
+            'updated': count
+        })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao alterar plano: {str(e)}'}), 500
+
+@app.route('/finances/changes', methods=['GET', 'OPTIONS'])
+def get_finance_changes():
+    """Movimentações criadas/alteradas e ids apagados desde ``since``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        finances, deleted, next_since, has_more = changes_since(
+            Finance.query, Finance, DeletedRecord,
+            request.args.get('since'), limit
+        )
+        return jsonify(sync_response(
+            [finance.to_dict() for finance in finances],
+            deleted, next_since, has_more
+        ))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao buscar alterações: {str(e)}'}), 500
+
 @app.route('/finances/month/<int:month>', methods=['GET', 'OPTIONS'])
 def get_finances_by_month(month):
-    """Lista movimentações por mês"""
+    """Lista movimentações do mês (``?year=``, padrão: ano corrente)
+
+    Inclui as ocorrências das agendas virtuais que caem no mês.
+    """
     if request.method == 'OPTIONS':
         return '', 200
         
     try:
+        start, end = month_range(parse_year(request.args.get('year')), month)
         finances = Finance.query.filter(
-            db.extract('month', Finance.transaction_date) == month
-        ).all()
+            Finance.transaction_date >= start,
+            Finance.transaction_date < end,
+            Finance.schedule_interval.is_(None)
+        ).order_by(Finance.transaction_date).all()
+        schedules = schedules_in_range(Finance.query, Finance, start, end).all()
         
         return jsonify([
             {
                 'id': f.id,
-                'title': f.title,
+                'title': occurrence_title(f, number) if number else f.title,
                 'value': f.value,
-                'transaction_date': f.transaction_date.isoformat()
+                'value_cents': f.value_cents,
+                'transaction_date': day.isoformat(),
+                **({'installment_current': number, 'virtual': True} if number else {})
             }
-            for f in finances
+            for day, f, number in merge_occurrences(finances, schedules, start, end)
         ])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro ao buscar finanças: {str(e)}'}), 500
 
+@app.route('/finances/summary', methods=['GET', 'OPTIONS'])
+@conditional_get('finance')
+def get_finances_summary():
+    """Totais mês a mês (``?from=YYYY-MM&to=YYYY-MM`` ou ``?year=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        first, last = parse_series_range(request.args)
+        series = monthly_series(
+            db.session, FinanceMonthlyRollup, Finance, first, last
+        )
+        return jsonify(series_response(first, last, series))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao calcular resumo: {str(e)}'}), 500
+
+@app.route('/finances/cashflow', methods=['GET', 'OPTIONS'])
+@conditional_get('finance', extra=date.today)
+def get_finances_cashflow():
+    """Saldo corrido (``?granularity=day|month&from=YYYY-MM-DD&to=YYYY-MM-DD``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        granularity, start, end, next_from = parse_cashflow_args(
+            request.args, db.session, Finance
+        )
+        return jsonify(cashflow(
+            db.session, Finance, FinanceMonthlyRollup, granularity, start, end,
+            next_from
+        ))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao calcular fluxo de caixa: {str(e)}'}), 500
+
+@app.route('/finances/analytics', methods=['GET', 'OPTIONS'])
+@conditional_get('finance', 'finance_category')
+def get_finances_analytics():
+    """Análise por categoria e período (``?from=YYYY-MM&to=YYYY-MM&top=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        first, last, top = parse_analytics_args(request.args)
+        return jsonify(finance_analytics(
+            db.session, Finance, FinanceCategory, TableVersion,
+            first, last, top
+        ))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Erro ao calcular análise: {str(e)}'}), 500
+
 @app.route('/finances/upcoming-installments', methods=['GET', 'OPTIONS'])
+@conditional_get('finance', extra=date.today)
 def get_upcoming_installments():
-    """Lista próximas parcelas"""
+    """Próximas parcelas (``?limit=&cursor=&horizon=YYYY-MM-DD``)"""
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
-        from datetime import date
-        today = date.today()
-        
-        upcoming = Finance.query.filter(
-            Finance.transaction_date >= today,
-            Finance.recurrence == 'INSTALLMENT'
-        ).order_by(Finance.transaction_date).limit(10).all()
-        
-        return jsonify([finance.to_dict() for finance in upcoming])
+        start, end, limit, cursor = parse_upcoming_args(request.args, Finance)
+        return jsonify(upcoming_installments(
+            db.session, Finance, start, end, cursor, limit
+        ))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro ao buscar parcelas: {str(e)}'}), 500
 
+@app.route('/finances/import', methods=['POST', 'OPTIONS'])
+def import_finances():
+    """Importa um extrato CSV/OFX (``file``; ``?format=&batch_size=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if 'file' not in request.files:
+        return jsonify({'message': 'Nenhum arquivo encontrado'}), 400
+    
+    file = request.files['file']
+    try:
+        import_format, batch_size = parse_import_args(
+            request.args, file.filename
+        )
+        records = statement_records(
+            file.stream, import_format, request.args.get('encoding')
+        )
+        return jsonify(import_statement(
+            db.session, Finance, FinanceCategory, TableVersion,
+            FinanceMonthlyRollup, records, batch_size
+        ))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao importar extrato: {str(e)}'}), 500
+
 # =========================
 # Upload de Arquivos
 # =========================
@@ -685,6 +1231,9 @@ def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Pós-processamento dos anexos em segundo plano, depois da resposta
+attachment_pipeline = init_attachment_pipeline(app, db, Attachment, ALLOWED_EXTENSIONS)
+
 @app.route('/upload', methods=['POST', 'OPTIONS'])
 def upload_file():
     """Faz upload de um arquivo"""
@@ -701,13 +1250,18 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({'message': 'Tipo de arquivo não permitido'}), 400
 
+    temp_path = None
     try:
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        # Conteúdo deduplicado por SHA-256 (utils.blobs)
+        root = app.config['UPLOAD_FOLDER']
+        blob, temp_path = store_blob(
+            db.session, AttachmentBlob, file.stream, root
+        )
 
         new_attachment = Attachment(
-            file_path=file_path,
+            file_path=blob_path(root, blob.sha256),
+            filename=secure_filename(file.filename),
+            blob=blob,
             description=request.form.get('description', ''),
             task_id=request.form.get('task_id') if request.form.get('task_id') else None,
             finance_id=request.form.get('finance_id') if request.form.get('finance_id') else None
@@ -715,19 +1269,190 @@ def upload_file():
         
         db.session.add(new_attachment)
         db.session.commit()
+        publish_blob(root, blob.sha256, temp_path)
 
-        return jsonify({
+        # MIME, checksum, texto e verificador rodam depois da resposta
+        return attachment_pipeline.submit_after(jsonify({
             'message': 'Arquivo enviado com sucesso!',
-            'attachment': {
-                'id': new_attachment.id,
-                'file_path': new_attachment.file_path,
-                'description': new_attachment.description
-            }
-        })
+            'attachment': new_attachment.to_dict()
+        }), new_attachment.id)
     except Exception as e:
         db.session.rollback()
+        discard_temp(temp_path)
         return jsonify({'message': f'Erro ao fazer upload: {str(e)}'}), 500
 
+@app.route('/attachments/<int:attachment_id>', methods=['GET', 'OPTIONS'])
+def get_attachment(attachment_id):
+    """Dados do anexo, com o estado do pós-processamento"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    attachment = Attachment.query.get_or_404(attachment_id)
+    return jsonify(attachment.to_dict())
+
+@app.route('/attachments/<int:attachment_id>/content', methods=['GET', 'OPTIONS'])
+def get_attachment_content(attachment_id):
+    """Conteúdo do anexo, com Range, ETag e Last-Modified (?download=true)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    attachment = Attachment.query.get_or_404(attachment_id)
+    if attachment.status == REJECTED:
+        return jsonify({
+            'message': 'Anexo reprovado no processamento',
+            'status_detail': attachment.status_detail
+        }), 403
+    
+    try:
+        return send_attachment(
+            attachment, app.config['UPLOAD_FOLDER'],
+            mode=app.config['ATTACHMENT_SEND_MODE'],
+            accel_prefix=app.config['ATTACHMENT_ACCEL_PREFIX'],
+            as_attachment=wants_download(request.args)
+        )
+    except FileNotFoundError:
+        return jsonify({'message': 'Arquivo do anexo não encontrado'}), 404
+    except Exception as e:
+        return jsonify({'message': f'Erro ao baixar anexo: {str(e)}'}), 500
+
+# Upload em partes: POST /uploads, PATCH /uploads/<id> (Upload-Offset),
+# POST /uploads/<id>/finalize; GET retoma do último offset confirmado
+
+@app.route('/uploads', methods=['POST', 'OPTIONS'])
+def create_upload():
+    """Abre uma sessão de upload em partes (``filename`` e ``size``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    data = request.get_json() or {}
+    filename = data.get('filename') or ''
+    if not allowed_file(filename):
+        return jsonify({'message': 'Tipo de arquivo não permitido'}), 400
+    
+    try:
+        size = parse_upload_size(data.get('size'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    root = app.config['UPLOAD_FOLDER']
+    try:
+        expire_upload_sessions(db.session, UploadSession, root)
+        upload = create_upload_session(
+            db.session, UploadSession, root, secure_filename(filename), size,
+            max_sessions=app.config['UPLOAD_MAX_SESSIONS'],
+            max_reserved=app.config['UPLOAD_MAX_RESERVED_BYTES'],
+            description=data.get('description', ''),
+            task_id=data.get('task_id') or None,
+            finance_id=data.get('finance_id') or None
+        )
+        db.session.commit()
+        return jsonify(session_response(upload)), 201
+    except UploadCapacityError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao iniciar upload: {str(e)}'}), 500
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'OPTIONS'])
+def get_upload(upload_id):
+    """Estado da sessão: ``offset`` é de onde o envio deve continuar"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    return jsonify(session_response(upload))
+
+@app.route('/uploads/<upload_id>', methods=['PATCH', 'OPTIONS'])
+def patch_upload(upload_id):
+    """Grava um chunk (corpo cru) no offset de ``Upload-Offset``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    
+    try:
+        offset = parse_offset(
+            request.headers.get('Upload-Offset', request.args.get('offset'))
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    if offset > upload.received:
+        return jsonify({
+            'message': 'Offset à frente do último byte confirmado',
+            'offset': upload.received
+        }), 409
+    
+    try:
+        write_chunk(
+            db.session, UploadSession, upload, request.stream, offset,
+            app.config['UPLOAD_FOLDER']
+        )
+        db.session.commit()
+        return jsonify(session_response(upload))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao gravar chunk: {str(e)}'}), 500
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST', 'OPTIONS'])
+def finalize_chunked_upload(upload_id):
+    """Conclui o upload completo e cria o anexo"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.received < upload.size:
+        return jsonify({
+            'message': 'Upload incompleto',
+            'offset': upload.received
+        }), 409
+    
+    try:
+        root = app.config['UPLOAD_FOLDER']
+        new_attachment = Attachment(
+            filename=upload.filename,
+            description=upload.description,
+            task_id=upload.task_id,
+            finance_id=upload.finance_id
+        )
+        blob = finalize_upload(db.session, AttachmentBlob, upload, root)
+        new_attachment.blob = blob
+        new_attachment.file_path = blob_path(root, blob.sha256)
+        
+        db.session.add(new_attachment)
+        db.session.commit()
+        publish_blob(root, blob.sha256, session_file(root, upload_id))
+        
+        return attachment_pipeline.submit_after(jsonify({
+            'message': 'Arquivo enviado com sucesso!',
+            'attachment': new_attachment.to_dict()
+        }), new_attachment.id), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao concluir upload: {str(e)}'}), 500
+
+@app.route('/uploads/<upload_id>', methods=['DELETE', 'OPTIONS'])
+def cancel_upload(upload_id):
+    """Cancela a sessão e descarta o que já foi enviado"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    
+    try:
+        discard_upload_session(
+            db.session, upload, app.config['UPLOAD_FOLDER']
+        )
+        db.session.commit()
+        return jsonify({'message': 'Upload cancelado'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao cancelar upload: {str(e)}'}), 500
+
 # =========================
 # Inicialização do Banco
 # =========================
@@ -736,8 +1461,9 @@ def init_database():
     """Inicializa o banco de dados"""
     with app.app_context():
         try:
-            db.create_all()
             print("✅ Banco de dados inicializado!")
+            if schema_changes:
+                print(f"🔧 Esquema atualizado: {', '.join(schema_changes)}")
             
             # Verifica se existe pelo menos um usuário
             user_count = User.query.count()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark da serialização das listagens
+
+Compara o caminho atual (objetos do ORM + to_dict + jsonify) com o
+caminho rápido (select() projetado + tuplas + provider JSON) usando um
+banco temporário, sem tocar no banco da aplicação.
+
+Uso: python bench_serialization.py [quantidade_de_linhas]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix='bench_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import app, db, Task  # noqa: E402
+from utils.serialization import (  # noqa: E402
+    TASK_FIELDS, json_bytes_response, orjson, project, rows_to_dicts
+)
+
+
+def seed_tasks(count):
+    """Insere ``count`` tarefas em lote"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            'title': f'Tarefa {i}',
+            'description': 'Descrição de exemplo para o benchmark',
+            'status': ('TO_DO', 'IN_PROGRESS', 'DONE')[i % 3],
+            'priority': ('LOW', 'MEDIUM', 'HIGH')[i % 3],
+            'type': ('WORK', 'UNIVERSITY')[i % 2],
+            'created_at': now,
+            'updated_at': now,
+            'due_date': date.today() + timedelta(days=i % 90),
+            'created_by': 'admin',
+            'assigned_to': f'pessoa{i % 20}',
+            'tags': 'benchmark',
+        }
+        for i in range(count)
+    ]
+    db.session.execute(insert(Task), rows)
+    db.session.commit()
+
+
+def orm_path():
+    tasks = Task.query.all()
+    return app.json.response([task.to_dict() for task in tasks]).get_data()
+
+
+def fast_path():
+    rows = db.session.execute(select(*project(Task, TASK_FIELDS)))
+    return json_bytes_response(rows_to_dicts(rows, TASK_FIELDS)).get_data()
+
+
+def measure(func, repeat):
+    """Menor tempo entre ``repeat`` execuções (sessão limpa a cada uma)"""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        size = len(func())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeat = 3
+
+    with app.app_context():
+        db.create_all()
+        print(f"📦 Inserindo {count} tarefas em {_tmpdir}...")
+        seed_tasks(count)
+
+        print(f"⚙️  Encoder: {'orjson' if orjson else 'json (stdlib)'}")
+        orm_time, orm_size = measure(orm_path, repeat)
+        fast_time, fast_size = measure(fast_path, repeat)
+
+    print(f"ORM + to_dict : {orm_time:.3f}s ({orm_size} bytes)")
+    print(f"select + rows : {fast_time:.3f}s ({fast_size} bytes)")
+    print(f"Ganho         : {orm_time / fast_time:.1f}x")
+    shutil.rmtree(_tmpdir, ignore_errors=True)
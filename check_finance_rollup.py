@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Script para verificar a consistência da tabela finance_monthly_rollup
+
+Compara cada (ano, mês, categoria) do rollup com a soma direta das
+movimentações e falha se houver divergência.
+"""
+
+import sys
+
+from app import app, db, Finance, FinanceMonthlyRollup
+from utils.rollup import check_rollup
+
+
+def main():
+    print("=== Verificação do Rollup Mensal de Finanças ===")
+    with app.app_context():
+        with db.engine.connect() as connection:
+            mismatches = check_rollup(
+                connection, Finance.__table__, FinanceMonthlyRollup.__table__
+            )
+
+    for (year, month, category_id), expected, stored in mismatches:
+        print(
+            f"❌ {year}-{month:02d} categoria {category_id}: "
+            f"esperado {expected}, armazenado {stored}"
+        )
+    if mismatches:
+        print(f"\n❌ {len(mismatches)} divergência(s); "
+              "rode rebuild_finance_rollup.py")
+        sys.exit(1)
+    print("✅ Rollup consistente com as movimentações")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Script para verificar se as consultas das rotas usam índices
+
+Roda EXPLAIN QUERY PLAN na consulta de cada rota e falha se alguma
+fizer varredura completa de tabela (SCAN).
+"""
+
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import or_
+
+from app import (
+    app, db, Task, TaskHistory, Finance, FinanceMonthlyRollup, Attachment,
+    AttachmentBlob, DeletedRecord, UploadSession
+)
+from utils.attachment_pipeline import pending_query
+from utils.boards import board_statement
+from utils.cashflow import running_by_day_query, running_by_month_query
+from utils.dates import month_range
+from utils.finance_reports import monthly_totals_query
+from utils.installments import upcoming_query
+from utils.pagination import after_cursor, order_clauses
+from utils.recurrence import schedules_in_range
+from utils.schema import upgrade_schema
+from utils.task_filters import apply_task_filters, task_sort_keys
+
+
+def task_listing(spec, cursor_values=None):
+    """Consulta de /tasks com a especificação de filtros informada"""
+    spec = dict(spec)
+    spec.setdefault('sort', ('id', False))
+    keys = task_sort_keys(Task, spec)
+    query = apply_task_filters(Task.query, Task, spec)
+    if cursor_values is not None:
+        query = query.filter(after_cursor(keys, cursor_values))
+    return query.order_by(*order_clauses(keys)).limit(51)
+
+
+def route_queries():
+    """Consultas representativas de cada rota
+
+    Listagens completas por desenho (``/finances`` e ``?all=true``) não
+    entram aqui: elas leem a tabela inteira de propósito.
+    """
+    today = date.today()
+    start, end = month_range(today.year, today.month)
+    return {
+        'GET /tasks (próxima página)': task_listing({}, [100]),
+        'GET /tasks/<type>': task_listing({'type': ['WORK']}),
+        'GET /tasks/<type>?status=': task_listing(
+            {'type': ['WORK'], 'status': ['DONE']}
+        ),
+        'GET /tasks?status=': task_listing({'status': ['TO_DO']}),
+        'GET /tasks?priority=': task_listing({'priority': ['HIGH']}),
+        'GET /tasks?sort=created_at (próxima página)': task_listing(
+            {'sort': ('created_at', False)}, [datetime.utcnow(), 100]
+        ),
+        'GET /tasks?sort=-created_at (próxima página)': task_listing(
+            {'sort': ('created_at', True)}, [datetime.utcnow(), 100]
+        ),
+        'GET /tasks?sort=title (próxima página)': task_listing(
+            {'sort': ('title', False)}, ['m', 100]
+        ),
+        'GET /tasks?sort=-title (próxima página)': task_listing(
+            {'sort': ('title', True)}, ['m', 100]
+        ),
+        'GET /tasks?assigned_to=': task_listing({'assigned_to': 'ana'}),
+        'GET /tasks?created_by=': task_listing({'created_by': 'ana'}),
+        'GET /tasks?category_id=': task_listing({'category_id': 1}),
+        'GET /tasks?due_from=&due_to=&sort=due_date': task_listing({
+            'due_from': today,
+            'due_to': today,
+            'sort': ('due_date', False),
+        }),
+        'GET /boards/<type>': board_statement(
+            Task, {'type': ['WORK'], 'sort': ('id', False)}, 20
+        ),
+        'GET /tasks/month/<month>?year=': (
+            Task.query.filter(Task.due_date >= start, Task.due_date < end)
+            .order_by(Task.due_date)
+        ),
+        'GET /tasks/changes?since=': (
+            Task.query.filter(
+                Task.updated_at <= datetime.utcnow(),
+                after_cursor(
+                    [(Task.updated_at, False), (Task.id, False)],
+                    [datetime.utcnow(), 1]
+                )
+            ).order_by(Task.updated_at, Task.id).limit(51)
+        ),
+        'GET /tasks/changes (tombstones)': (
+            DeletedRecord.query.filter(
+                DeletedRecord.table_name == 'task',
+                DeletedRecord.id > 1,
+                DeletedRecord.deleted_at <= datetime.utcnow()
+            ).order_by(DeletedRecord.id).limit(51)
+        ),
+        'GET /tasks/<id>/history': (
+            TaskHistory.query
+            .filter_by(task_id=1)
+            .order_by(TaskHistory.changed_at.desc())
+        ),
+        'GET /finances/month/<month>?year=': (
+            Finance.query.filter(
+                Finance.transaction_date >= start,
+                Finance.transaction_date < end,
+                Finance.schedule_interval.is_(None)
+            ).order_by(Finance.transaction_date)
+        ),
+        'Agendas virtuais do intervalo': schedules_in_range(
+            Finance.query, Finance, start, end
+        ),
+        'GET /finances/summary': monthly_totals_query(
+            db.session, FinanceMonthlyRollup, (today.year, 1), (today.year, 12)
+        ),
+        'GET /finances/cashflow?granularity=day': running_by_day_query(
+            db.session, Finance, start, end
+        ),
+        'GET /finances/cashflow?granularity=month': running_by_month_query(
+            db.session, FinanceMonthlyRollup, start, end
+        ),
+        'GET /finances/upcoming-installments?cursor=&horizon=': (
+            upcoming_query(
+                db.session, Finance, today, end, [today, 1]
+            ).limit(11)
+        ),
+        'Parcelas de um plano (parent_finance_id)': (
+            Finance.query.filter_by(parent_finance_id=1)
+        ),
+        'PUT/DELETE /finances/<id>/plan': Finance.query.filter(
+            or_(Finance.id == 1, Finance.parent_finance_id == 1),
+            Finance.installment_current >= 2
+        ),
+        'Anexos de uma tarefa': Attachment.query.filter_by(task_id=1),
+        'Anexos de uma finança': Attachment.query.filter_by(finance_id=1),
+        'POST /upload (blob por SHA-256)': AttachmentBlob.query.filter_by(
+            sha256='0' * 64
+        ),
+        'Sessões de upload abandonadas': UploadSession.query.filter(
+            UploadSession.updated_at < datetime.utcnow()
+        ),
+        'Anexos pendentes (pós-processamento)': pending_query(
+            db.session, Attachment
+        ),
+        'Anexo já processado do mesmo blob': Attachment.query.filter(
+            Attachment.blob_id == 1, Attachment.status == 'ready'
+        ),
+    }
+
+
+def explain(query):
+    """Executa EXPLAIN QUERY PLAN e devolve as linhas de detalhe"""
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    rows = db.session.connection().exec_driver_sql(
+        f'EXPLAIN QUERY PLAN {compiled}', params
+    ).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_table_scans(details):
+    """Linhas SCAN sobre tabelas (ignora subconsultas/CO-ROUTINE)
+
+    Consultas com janela (ex.: ``/boards``) leem o resultado de uma
+    subconsulta com SCAN, o que não é uma varredura da tabela.
+    """
+    derived = {
+        detail.split(' ', 1)[1]
+        for detail in details
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    return [
+        detail for detail in details
+        if detail.startswith('SCAN ')
+        and detail.split(' ')[1] not in derived
+    ]
+
+
+def check_query_plans():
+    """Verifica o plano de cada rota; retorna a lista de rotas com SCAN"""
+    failures = []
+    with app.app_context():
+        # Tabelas e índices novos num banco existente
+        upgrade_schema(db)
+        for name, query in route_queries().items():
+            details = explain(query)
+            full_scan = bool(full_table_scans(details))
+            print(f"{'❌' if full_scan else '✅'} {name}")
+            for detail in details:
+                # Ordenação temporária não é varredura, mas cresce com a
+                # quantidade de linhas filtradas e merece atenção
+                marker = '⚠️ ' if detail.startswith('USE TEMP B-TREE') else ''
+                print(f"   {marker}{detail}")
+            if full_scan:
+                failures.append(name)
+    return failures
+
+
+if __name__ == '__main__':
+    print("=== Verificação dos Planos de Consulta ===")
+    failures = check_query_plans()
+    if failures:
+        print(f"\n❌ {len(failures)} rota(s) com varredura completa")
+        sys.exit(1)
+    print("\n✅ Nenhuma rota faz varredura completa")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script para limpar uploads em partes abandonados
+
+Apaga as sessões sem PATCH há mais de 24 horas e os arquivos
+temporários antigos de uploads/tmp. A limpeza também roda a cada nova
+sessão aberta; este script serve para agendar no cron.
+"""
+
+import argparse
+
+from app import app, db, UploadSession
+from utils.schema import upgrade_schema
+from utils.upload_sessions import expire_upload_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    with app.app_context():
+        upgrade_schema(db)
+        sessions, files = expire_upload_sessions(
+            db.session, UploadSession, app.config['UPLOAD_FOLDER']
+        )
+    print(f"✅ {sessions} sessão(ões) expirada(s), {files} arquivo(s) removido(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Script para importar extratos bancários (CSV ou OFX) em finance
+
+Lê o arquivo em streaming e grava em lotes (um INSERT executemany e um
+commit por lote). Linhas inválidas são listadas ao final com o número
+da linha; o código de saída é 1 se houver alguma.
+"""
+
+import argparse
+import sys
+
+from app import (
+    app, db, Finance, FinanceCategory, FinanceMonthlyRollup, TableVersion
+)
+from utils.schema import upgrade_schema
+from utils.statement_import import (
+    DEFAULT_BATCH_SIZE, import_statement, parse_import_args, statement_records
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help='Arquivo .csv ou .ofx')
+    parser.add_argument('--format', help='csv ou ofx (padrão: pela extensão)')
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+        help=f'Linhas por lote (padrão: {DEFAULT_BATCH_SIZE})'
+    )
+    parser.add_argument('--encoding', help='Codificação do CSV (padrão: UTF-8)')
+    args = parser.parse_args()
+
+    try:
+        import_format, batch_size = parse_import_args(
+            {'format': args.format, 'batch_size': args.batch_size}, args.path
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    with app.app_context():
+        upgrade_schema(db)
+        with open(args.path, 'rb') as stream:
+            try:
+                records = statement_records(stream, import_format, args.encoding)
+            except ValueError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            report = import_statement(
+                db.session, Finance, FinanceCategory, TableVersion,
+                FinanceMonthlyRollup, records, batch_size
+            )
+
+    print(
+        f"✅ {report['imported']} movimentação(ões) importada(s) "
+        f"em {report['batches']} lote(s)"
+    )
+    if report['duplicates']:
+        print(f"   {report['duplicates']} já importada(s) antes, ignorada(s)")
+    for error in report['errors']:
+        print(f"   linha {error['line']}: {error['message']}")
+    if report['errors_count'] > len(report['errors']):
+        print(f"   ... e mais {report['errors_count'] - len(report['errors'])} erro(s)")
+    if report['errors_count']:
+        print(f"⚠️ {report['errors_count']} linha(s) com erro")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
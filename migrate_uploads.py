@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para migrar os anexos para o layout em subdiretórios
+
+Move os arquivos de uploads/blobs/<sha256> e os uploads antigos (um
+arquivo por anexo, sem deduplicação) para uploads/blobs/ab/cd/<sha256>,
+em lotes: cada lote atualiza os anexos numa transação e só depois apaga
+os caminhos antigos. Pode ser interrompido e executado de novo; anexos
+já migrados são pulados (--after-id retoma a partir do último lote).
+"""
+
+import argparse
+
+from app import app, db, Attachment, AttachmentBlob
+from utils.blob_migration import (
+    DEFAULT_MIGRATION_BATCH_SIZE, migrate_upload_layout
+)
+from utils.schema import upgrade_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--batch-size', type=int, default=DEFAULT_MIGRATION_BATCH_SIZE,
+        help=f'Anexos por lote (padrão: {DEFAULT_MIGRATION_BATCH_SIZE})'
+    )
+    parser.add_argument(
+        '--after-id', type=int, default=0,
+        help='Começa depois deste id de anexo (último lote concluído)'
+    )
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error('--batch-size deve ser maior que zero')
+
+    def progress(last_id, stats):
+        print(f"   lote {stats['batches']} concluído (até o anexo {last_id})")
+
+    with app.app_context():
+        upgrade_schema(db)
+        stats = migrate_upload_layout(
+            db.session, Attachment, AttachmentBlob,
+            app.config['UPLOAD_FOLDER'], args.after_id, args.batch_size,
+            progress
+        )
+
+    print(
+        f"✅ {stats['moved']} anexo(s) movido(s), {stats['adopted']} "
+        f"convertido(s) em blob, {stats['already']} já migrado(s), "
+        f"{stats['removed']} arquivo(s) antigo(s) removido(s)"
+    )
+    if stats['missing']:
+        print(f"⚠️  {stats['missing']} anexo(s) sem arquivo em disco")
+
+
+if __name__ == '__main__':
+    main()
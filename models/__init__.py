@@ -2,10 +2,35 @@ from .user import User
 from .task import Task, TaskCategory, TaskHistory
 from .finance import Finance, FinanceCategory
 from .attachment import Attachment
+from .attachment_blob import AttachmentBlob
+from .upload_session import UploadSession
+from .deleted_record import DeletedRecord
+from .table_version import TableVersion
+from .finance_monthly_rollup import FinanceMonthlyRollup
+from utils.money import track_cents
+from utils.rollup import track_rollup
+from utils.sync import track_deletions
+from utils.versioning import track_versions
+
+# Tombstones para /tasks/changes e /finances/changes
+track_deletions(Task, DeletedRecord)
+track_deletions(Finance, DeletedRecord)
+
+# Versões por tabela para os ETags das listagens
+track_versions(Task, TableVersion)
+track_versions(Finance, TableVersion)
+track_versions(FinanceCategory, TableVersion)
+
+# Centavos exatos e totais mensais de /finances/summary e do dashboard
+track_cents(Finance)
+track_rollup(Finance, FinanceMonthlyRollup)
 
 __all__ = [
     'User',
     'Task', 'TaskCategory', 'TaskHistory',
     'Finance', 'FinanceCategory',
-    'Attachment'
+    'Attachment', 'AttachmentBlob', 'UploadSession',
+    'DeletedRecord',
+    'TableVersion',
+    'FinanceMonthlyRollup'
 ]
@@ -5,13 +5,30 @@ from datetime import datetime
 class Attachment(db.Model):
     """Modelo para anexos de tarefas e finanças"""
     __tablename__ = 'attachment'
+    __table_args__ = (
+        db.Index('ix_attachment_task_id', 'task_id'),
+        db.Index('ix_attachment_finance_id', 'finance_id'),
+        db.Index('ix_attachment_blob_id', 'blob_id'),
+        db.Index('ix_attachment_status', 'status', 'status_changed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    # Caminho do conteúdo em disco (o do blob, para anexos deduplicados)
     file_path = db.Column(db.String(255), nullable=False)
+    # Nome original (já passado por secure_filename)
+    filename = db.Column(db.String(255))
+    blob_id = db.Column(db.Integer, db.ForeignKey('attachment_blob.id'))
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
     finance_id = db.Column(db.Integer, db.ForeignKey('finance.id'))
+    # Pós-processamento em segundo plano (utils.attachment_pipeline)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    status_detail = db.Column(db.Text)
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    mime_type = db.Column(db.String(100))
+    # Texto extraído de txt/pdf para busca
+    text_content = db.Column(db.Text)
 
     # Relacionamentos
     task = db.relationship(
@@ -22,6 +39,7 @@ class Attachment(db.Model):
         'Finance',
         backref=db.backref('attachments', lazy=True)
     )
+    blob = db.relationship('AttachmentBlob')
     
     def __repr__(self):
         return f'<Attachment {self.file_path}>'
@@ -30,7 +48,13 @@ class Attachment(db.Model):
         return {
             'id': self.id,
             'file_path': self.file_path,
+            'filename': self.filename,
+            'sha256': self.blob.sha256 if self.blob else None,
+            'size': self.blob.size if self.blob else None,
             'description': self.description,
+            'status': self.status,
+            'status_detail': self.status_detail,
+            'mime_type': self.mime_type,
             'created_at': self.created_at.isoformat(),
             'task_id': self.task_id,
             'finance_id': self.finance_id
@@ -0,0 +1,20 @@
+from __init__ import db
+from datetime import datetime
+
+
+class AttachmentBlob(db.Model):
+    """Conteúdo de anexo gravado uma única vez, endereçado pelo SHA-256"""
+    __tablename__ = 'attachment_blob'
+    __table_args__ = (
+        db.Index('ix_attachment_blob_sha256', 'sha256', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Quantos anexos apontam para este conteúdo (utils.blobs)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AttachmentBlob {self.sha256[:12]} ({self.refcount})>'
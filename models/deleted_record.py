@@ -0,0 +1,20 @@
+from __init__ import db
+from datetime import datetime
+
+
+class DeletedRecord(db.Model):
+    """Tombstones de registros apagados (sincronização incremental)"""
+    __tablename__ = 'deleted_record'
+    __table_args__ = (
+        db.Index('ix_deleted_record_table_name_id', 'table_name', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(
+        db.DateTime, default=datetime.utcnow, nullable=False
+    )
+    
+    def __repr__(self):
+        return f'<DeletedRecord {self.table_name}:{self.record_id}>'
@@ -26,13 +26,37 @@ class FinanceCategory(db.Model):
 class Finance(db.Model):
     """Modelo para movimentações financeiras"""
     __tablename__ = 'finance'
+    __table_args__ = (
+        db.Index('ix_finance_transaction_date', 'transaction_date'),
+        db.Index('ix_finance_updated_at', 'updated_at', 'id'),
+        # Próximas parcelas: recurrence = ? AND transaction_date >= ?
+        db.Index(
+            'ix_finance_recurrence_transaction_date',
+            'recurrence', 'transaction_date'
+        ),
+        db.Index('ix_finance_parent_finance_id', 'parent_finance_id'),
+        db.Index('ix_finance_category_id', 'category_id'),
+        db.Index(
+            'ix_finance_schedule_interval_transaction_date',
+            'schedule_interval', 'transaction_date'
+        ),
+        # Importação de extratos: a mesma transação não entra duas vezes
+        db.Index('ix_finance_import_key', 'import_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     value = db.Column(db.Float, nullable=False)
+    # Valor exato em centavos, usado nas somas (utils.money.track_cents)
+    value_cents = db.Column(db.BigInteger, nullable=False)
     transaction_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
     recurrence = db.Column(db.String(20), default='NONE')
     installments_total = db.Column(db.Integer, default=1)  # Total de parcelas
     installment_current = db.Column(db.Integer, default=1)  # Parcela atual
@@ -41,6 +65,13 @@ class Finance(db.Model):
         db.ForeignKey('finance.id')
     )  # Para parcelas futuras
     category_id = db.Column(db.Integer, db.ForeignKey('finance_category.id'))
+    # Agenda virtual (utils.recurrence): meses entre ocorrências e data da
+    # última; NULL em movimentações comuns
+    schedule_interval = db.Column(db.Integer)
+    schedule_end = db.Column(db.Date)
+    # Identificador da transação no extrato importado (utils.statement_import);
+    # NULL nas movimentações criadas pela API
+    import_key = db.Column(db.String(64))
 
     # Relacionamentos
     category = db.relationship(
@@ -59,11 +90,19 @@ class Finance(db.Model):
             'title': self.title,
             'description': self.description,
             'value': self.value,
+            'value_cents': self.value_cents,
             'transaction_date': self.transaction_date.isoformat(),
             'created_at': self.created_at.isoformat(),
+            'updated_at': (
+                self.updated_at.isoformat() if self.updated_at else None
+            ),
             'recurrence': self.recurrence,
             'installments_total': self.installments_total,
             'installment_current': self.installment_current,
             'parent_finance_id': self.parent_finance_id,
-            'category_id': self.category_id
+            'category_id': self.category_id,
+            'schedule_interval': self.schedule_interval,
+            'schedule_end': (
+                self.schedule_end.isoformat() if self.schedule_end else None
+            )
         }
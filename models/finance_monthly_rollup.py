@@ -0,0 +1,20 @@
+from __init__ import db
+
+
+class FinanceMonthlyRollup(db.Model):
+    """Totais mensais por categoria, mantidos junto com ``finance``"""
+    __tablename__ = 'finance_monthly_rollup'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 0 = sem categoria (ver utils.rollup.UNCATEGORIZED)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    income_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    expense_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    transactions_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return (
+            f'<FinanceMonthlyRollup {self.year}-{self.month:02d} '
+            f'categoria {self.category_id}>'
+        )
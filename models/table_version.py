@@ -0,0 +1,12 @@
+from __init__ import db
+
+
+class TableVersion(db.Model):
+    """Contador de versão por tabela, usado nos ETags das listagens"""
+    __tablename__ = 'table_version'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}: {self.version}>'
@@ -24,6 +24,23 @@ class TaskCategory(db.Model):
 class Task(db.Model):
     """Modelo para tarefas do sistema Kanban"""
     __tablename__ = 'task'
+    __table_args__ = (
+        # Quadros por tipo (e coluna); o rowid implícito em cada índice
+        # mantém a ordem por id sem ordenação temporária
+        db.Index('ix_task_type', 'type'),
+        db.Index('ix_task_type_status', 'type', 'status'),
+        db.Index('ix_task_due_date', 'due_date'),
+        db.Index('ix_task_updated_at', 'updated_at', 'id'),
+        db.Index('ix_task_assigned_to', 'assigned_to'),
+        db.Index('ix_task_created_by', 'created_by'),
+        db.Index('ix_task_category_id', 'category_id'),
+        # Filtros sem tipo e ordenações de ?sort= (id no fim desempata
+        # na mesma ordem do cursor)
+        db.Index('ix_task_status', 'status', 'id'),
+        db.Index('ix_task_priority', 'priority', 'id'),
+        db.Index('ix_task_created_at', 'created_at', 'id'),
+        db.Index('ix_task_title', 'title', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -76,6 +93,11 @@ class Task(db.Model):
 class TaskHistory(db.Model):
     """Modelo para histórico de mudanças nas tarefas"""
     __tablename__ = 'task_history'
+    __table_args__ = (
+        db.Index(
+            'ix_task_history_task_id_changed_at', 'task_id', 'changed_at'
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
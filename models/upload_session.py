@@ -0,0 +1,35 @@
+from __init__ import db
+from datetime import datetime
+
+
+class UploadSession(db.Model):
+    """Upload em partes em andamento (utils.upload_sessions)"""
+    __tablename__ = 'upload_session'
+    __table_args__ = (
+        # Limpeza das sessões abandonadas: updated_at < ?
+        db.Index('ix_upload_session_updated_at', 'updated_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    # Bytes confirmados a partir do início; o próximo PATCH começa aqui
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    description = db.Column(db.Text)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
+    finance_id = db.Column(db.Integer, db.ForeignKey('finance.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.received}/{self.size}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
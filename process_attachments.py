@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script para processar anexos pendentes
+
+Roda o pós-processamento (tipo MIME, SHA-256, texto para busca e
+verificador) nos anexos ``pending`` e nos ``processing`` abandonados,
+sem o pool da aplicação. Útil depois de atualizar o banco, quando todos
+os anexos antigos ficam pendentes, ou agendado no cron.
+"""
+
+import argparse
+
+from app import ALLOWED_EXTENSIONS, app, db, Attachment
+from utils.attachment_pipeline import (
+    load_scanner, pending_attachments, process_attachment
+)
+from utils.schema import upgrade_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--limit', type=int, default=None,
+        help='Processa no máximo este número de anexos'
+    )
+    args = parser.parse_args()
+
+    scanner = load_scanner(app.config['ATTACHMENT_SCANNER'])
+    totals = {}
+    with app.app_context():
+        upgrade_schema(db)
+        while args.limit is None or sum(totals.values()) < args.limit:
+            ids = pending_attachments(db.session, Attachment)
+            if args.limit is not None:
+                ids = ids[:args.limit - sum(totals.values())]
+            if not ids:
+                break
+            for attachment_id in ids:
+                status = process_attachment(
+                    db.session, Attachment, attachment_id,
+                    ALLOWED_EXTENSIONS, scanner
+                )
+                if status is not None:
+                    totals[status] = totals.get(status, 0) + 1
+
+    summary = ', '.join(f'{count} {status}' for status, count in totals.items())
+    print(f"✅ Anexos processados: {summary or 'nenhum pendente'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir a tabela finance_monthly_rollup
+
+Recalcula os totais mensais a partir de ``finance`` em uma única
+transação. Use ``--from YYYY-MM --to YYYY-MM`` para refazer só um
+intervalo de meses.
+"""
+
+import argparse
+
+from app import app, db, Finance, FinanceMonthlyRollup
+from utils.dates import parse_year_month
+from utils.rollup import rebuild_rollup
+from utils.schema import upgrade_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--from', dest='first', help='Primeiro mês (YYYY-MM)')
+    parser.add_argument('--to', dest='last', help='Último mês (YYYY-MM)')
+    args = parser.parse_args()
+
+    if bool(args.first) != bool(args.last):
+        parser.error('--from e --to devem ser informados juntos')
+    first = parse_year_month(args.first, 'from') if args.first else None
+    last = parse_year_month(args.last, 'to') if args.last else None
+
+    with app.app_context():
+        upgrade_schema(db)
+        with db.engine.begin() as connection:
+            rebuild_rollup(
+                connection, Finance.__table__, FinanceMonthlyRollup.__table__,
+                first, last
+            )
+        rows = FinanceMonthlyRollup.query.count()
+    print(f"✅ Rollup mensal reconstruído ({rows} linha(s))")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+from flask import Blueprint, request, jsonify
+from datetime import date
+from models.finance import Finance
+from models.finance_monthly_rollup import FinanceMonthlyRollup
+from models.table_version import TableVersion
+from models.task import Task
+from utils.dashboard import dashboard_summary
+from utils.versioning import make_conditional_get
+from __init__ import db
+
+dashboard_bp = Blueprint('dashboard', __name__)
+conditional_get = make_conditional_get(db, TableVersion)
+
+
+@dashboard_bp.route('/dashboard/summary', methods=['GET', 'OPTIONS'])
+@conditional_get('task', 'finance', extra=date.today)
+def get_dashboard_summary():
+    """Agregados do dashboard calculados no banco"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    return jsonify(dashboard_summary(
+        db.session, Task, Finance, FinanceMonthlyRollup
+    ))
@@ -1,22 +1,91 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime
-from models.finance import Finance
+from datetime import date, datetime
+from sqlalchemy import select
+from models.deleted_record import DeletedRecord
+from models.finance import Finance, FinanceCategory
+from models.finance_monthly_rollup import FinanceMonthlyRollup
+from models.table_version import TableVersion
+from utils.analytics import finance_analytics, parse_analytics_args
+from utils.cashflow import cashflow, parse_cashflow_args
+from utils.dates import month_range, parse_year
+from utils.finance_reports import (
+    monthly_series, parse_series_range, series_response
+)
 from utils.finance_utils import create_future_installments
+from utils.installments import parse_upcoming_args, upcoming_installments
+from utils.serialization import (
+    FINANCE_FIELDS, json_bytes_response, project, row_serializer,
+    rows_to_dicts, wants_fast_path
+)
+from utils.money import parse_money
+from utils.pagination import parse_limit
+from utils.plans import (
+    delete_plan, parse_plan_changes, parse_plan_scope, update_plan
+)
+from utils.recurrence import (
+    configure_schedule, merge_occurrences, occurrence_title, schedules_in_range,
+    wants_virtual
+)
+from utils.statement_import import (
+    import_statement, parse_import_args, statement_records
+)
+from utils.streaming import stream_query, stream_select, wants_stream
+from utils.sync import changes_since, sync_response
+from utils.versioning import make_conditional_get
 from __init__ import db
 
 finances_bp = Blueprint('finances', __name__)
+conditional_get = make_conditional_get(db, TableVersion)
 
 
 @finances_bp.route('/finances', methods=['GET', 'OPTIONS'])
+@conditional_get('finance')
 def get_finances():
-    """Lista todas as movimentações financeiras"""
+    """Lista todas as movimentações financeiras
+
+    ``?stream=true`` envia em lotes; ``?fast=true`` evita o ORM.
+    """
     if request.method == 'OPTIONS':
         return '', 200
         
+    if wants_stream(request.args):
+        if wants_fast_path(request.args):
+            return stream_select(
+                db.session,
+                select(*project(Finance, FINANCE_FIELDS)).order_by(Finance.id),
+                row_serializer(FINANCE_FIELDS)
+            )
+        return stream_query(Finance.query.order_by(Finance.id), Finance.to_dict)
+
+    if wants_fast_path(request.args):
+        rows = db.session.execute(select(*project(Finance, FINANCE_FIELDS)))
+        return json_bytes_response(rows_to_dicts(rows, FINANCE_FIELDS))
+
     finances = Finance.query.all()
     return jsonify([finance.to_dict() for finance in finances])
 
 
+@finances_bp.route('/finances/changes', methods=['GET', 'OPTIONS'])
+def get_finance_changes():
+    """Movimentações criadas/alteradas e ids apagados desde ``since``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        finances, deleted, next_since, has_more = changes_since(
+            Finance.query, Finance, DeletedRecord,
+            request.args.get('since'), limit
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(sync_response(
+        [finance.to_dict() for finance in finances],
+        deleted, next_since, has_more
+    ))
+
+
 @finances_bp.route('/finances', methods=['POST', 'OPTIONS'])
 def create_finance():
     """Cria uma nova movimentação financeira"""
@@ -39,7 +108,7 @@ def create_finance():
         new_finance = Finance(
             title=data['title'],
             description=data.get('description', ''),
-            value=float(data['value']),
+            value=parse_money(data['value']),
             transaction_date=(
                 datetime.strptime(
                     data['transaction_date'], '%Y-%m-%d'
@@ -51,19 +120,24 @@ def create_finance():
             category_id=data.get('category_id')
         )
         
+        # "virtual": true grava a recorrência como agenda, em uma só linha
+        if wants_virtual(data):
+            configure_schedule(new_finance, data.get('schedule_end'))
+        
         db.session.add(new_finance)
-        db.session.commit()
 
-        # Cria parcelas futuras, se for parcelado
-        if new_finance.installments_total > 1:
-            create_future_installments(new_finance)
-            db.session.commit()
+        # Pai e parcelas futuras gravados no mesmo commit
+        create_future_installments(new_finance)
+        db.session.commit()
 
         return jsonify({
             'id': new_finance.id,
             'message': 'Movimentação financeira criada com sucesso!',
             'finance': new_finance.to_dict()
         })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -85,7 +159,7 @@ def update_finance(finance_id):
     try:
         finance.title = data.get('title', finance.title)
         finance.description = data.get('description', finance.description)
-        finance.value = float(data.get('value', finance.value))
+        finance.value = parse_money(data.get('value', finance.value))
         
         if data.get('transaction_date'):
             finance.transaction_date = (
@@ -103,12 +177,21 @@ def update_finance(finance_id):
         )
         finance.category_id = data.get('category_id', finance.category_id)
 
+        # Agenda virtual: editar a linha edita o plano inteiro
+        if finance.schedule_interval is not None:
+            configure_schedule(
+                finance, data.get('schedule_end', finance.schedule_end)
+            )
+
         db.session.commit()
         
         return jsonify({
             'message': 'Movimentação atualizada com sucesso!',
             'finance': finance.to_dict()
         })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -139,42 +222,201 @@ def delete_finance(finance_id):
         }), 500
     
 
+@finances_bp.route(
+    '/finances/<int:finance_id>/plan',
+    methods=['PUT', 'DELETE', 'OPTIONS']
+)
+def change_finance_plan(finance_id):
+    """Altera ou apaga o plano de parcelas inteiro em uma transação
+
+    ``finance_id`` pode ser o pai ou qualquer parcela. Com
+    ``?scope=onward`` só a parcela informada e as seguintes.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    finance = Finance.query.get_or_404(finance_id)
+    
+    try:
+        scope = parse_plan_scope(request.args.get('scope'))
+        changes = (
+            parse_plan_changes(request.get_json(silent=True))
+            if request.method == 'PUT' else None
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        if request.method == 'DELETE':
+            count = delete_plan(
+                db.session, finance, scope,
+                TableVersion, FinanceMonthlyRollup, DeletedRecord
+            )
+            db.session.commit()
+            return jsonify({
+                'message': f'{count} parcela(s) deletada(s) com sucesso!',
+                'deleted': count
+            })
+        
+        count = update_plan(
+            db.session, finance, changes, scope,
+            TableVersion, FinanceMonthlyRollup
+        )
+        db.session.commit()
+        return jsonify({
+            'message': f'{count} parcela(s) atualizada(s) com sucesso!',
+            'updated': count
+        })
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'message': (
+                f'Erro ao alterar plano: {str(e)}'
+            )
+        }), 500
+    
+
 @finances_bp.route('/finances/month/<int:month>', methods=['GET', 'OPTIONS'])
 def get_finances_by_month(month):
-    """Lista movimentações por mês"""
+    """Lista movimentações do mês (``?year=``, padrão: ano corrente)
+
+    Inclui as ocorrências das agendas virtuais que caem no mês.
+    """
     if request.method == 'OPTIONS':
         return '', 200
         
+    try:
+        start, end = month_range(parse_year(request.args.get('year')), month)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
     finances = Finance.query.filter(
-        db.extract('month', Finance.transaction_date) == month
-    ).all()
+        Finance.transaction_date >= start,
+        Finance.transaction_date < end,
+        Finance.schedule_interval.is_(None)
+    ).order_by(Finance.transaction_date).all()
+    schedules = schedules_in_range(Finance.query, Finance, start, end).all()
     
     return jsonify([
         {
             'id': f.id,
-            'title': f.title,
+            'title': occurrence_title(f, number) if number else f.title,
             'value': f.value,
-            'transaction_date': f.transaction_date.isoformat()
+            'value_cents': f.value_cents,
+            'transaction_date': day.isoformat(),
+            **(
+                {'installment_current': number, 'virtual': True}
+                if number else {}
+            )
         }
-        for f in finances
+        for day, f, number in merge_occurrences(
+            finances, schedules, start, end
+        )
     ])
 
 
+@finances_bp.route('/finances/summary', methods=['GET', 'OPTIONS'])
+@conditional_get('finance')
+def get_finances_summary():
+    """Totais mês a mês (``?from=YYYY-MM&to=YYYY-MM`` ou ``?year=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        first, last = parse_series_range(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    series = monthly_series(
+        db.session, FinanceMonthlyRollup, Finance, first, last
+    )
+    return jsonify(series_response(first, last, series))
+
+
+@finances_bp.route('/finances/cashflow', methods=['GET', 'OPTIONS'])
+@conditional_get('finance', extra=date.today)
+def get_finances_cashflow():
+    """Saldo corrido (``?granularity=day|month&from=YYYY-MM-DD&to=YYYY-MM-DD``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        granularity, start, end, next_from = parse_cashflow_args(
+            request.args, db.session, Finance
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(cashflow(
+        db.session, Finance, FinanceMonthlyRollup, granularity, start, end,
+        next_from
+    ))
+
+
+@finances_bp.route('/finances/analytics', methods=['GET', 'OPTIONS'])
+@conditional_get('finance', 'finance_category')
+def get_finances_analytics():
+    """Análise por categoria e período (``?from=YYYY-MM&to=YYYY-MM&top=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        first, last, top = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(finance_analytics(
+        db.session, Finance, FinanceCategory, TableVersion, first, last, top
+    ))
+
+
 @finances_bp.route(
     '/finances/upcoming-installments',
     methods=['GET', 'OPTIONS']
 )
+@conditional_get('finance', extra=date.today)
 def get_upcoming_installments():
-    """Lista próximas parcelas"""
+    """Próximas parcelas (``?limit=&cursor=&horizon=YYYY-MM-DD``)"""
     if request.method == 'OPTIONS':
         return '', 200
     
-    from datetime import date
-    today = date.today()
+    try:
+        start, end, limit, cursor = parse_upcoming_args(request.args, Finance)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    upcoming = Finance.query.filter(
-        Finance.transaction_date >= today,
-        Finance.recurrence == 'INSTALLMENT'
-    ).order_by(Finance.transaction_date).limit(10).all()
+    return jsonify(upcoming_installments(
+        db.session, Finance, start, end, cursor, limit
+    ))
+
+
+@finances_bp.route('/finances/import', methods=['POST', 'OPTIONS'])
+def import_finances():
+    """Importa um extrato CSV/OFX (``file``; ``?format=&batch_size=``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if 'file' not in request.files:
+        return jsonify({'message': 'Nenhum arquivo encontrado'}), 400
     
-    return jsonify([finance.to_dict() for finance in upcoming])
+    file = request.files['file']
+    try:
+        import_format, batch_size = parse_import_args(
+            request.args, file.filename
+        )
+        records = statement_records(
+            file.stream, import_format, request.args.get('encoding')
+        )
+        return jsonify(import_statement(
+            db.session, Finance, FinanceCategory, TableVersion,
+            FinanceMonthlyRollup, records, batch_size
+        ))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao importar extrato: {str(e)}'}), 500
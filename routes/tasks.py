@@ -1,29 +1,140 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from sqlalchemy import select
+from models.deleted_record import DeletedRecord
+from models.table_version import TableVersion
 from models.task import Task, TaskHistory
+from utils.boards import board_columns, parse_board_args
+from utils.dates import month_range, parse_year
+from utils.pagination import (
+    keyset_paginate, order_clauses, page_response, parse_limit,
+    wants_full_listing
+)
+from utils.serialization import (
+    TASK_FIELDS, json_bytes_response, project, row_serializer, rows_to_dicts,
+    wants_fast_path
+)
+from utils.streaming import stream_query, stream_select, wants_stream
+from utils.sync import changes_since, sync_response
+from utils.task_filters import (
+    apply_task_filters, parse_task_filters, task_sort_keys
+)
+from utils.versioning import make_conditional_get
 from __init__ import db
 
 tasks_bp = Blueprint('tasks', __name__)
+conditional_get = make_conditional_get(db, TableVersion)
+
+
+def _list_tasks(task_type=None):
+    """Responde uma listagem de tarefas filtrada e paginada por cursor
+
+    Os filtros da query string são validados antes de qualquer consulta.
+    Com ``?all=true`` devolve a lista completa (formato legado do kanban).
+    Com ``?fast=true`` lê só as colunas via ``select()``, sem hidratar
+    objetos do ORM. Com ``?stream=true`` envia a listagem completa em
+    lotes, sem montar a lista inteira em memória.
+    """
+    try:
+        spec = parse_task_filters(request.args, task_type)
+        keys = task_sort_keys(Task, spec)
+        fast = wants_fast_path(request.args)
+        base = select(*project(Task, TASK_FIELDS)) if fast else Task.query
+        query = apply_task_filters(base, Task, spec)
+
+        if wants_stream(request.args):
+            query = query.order_by(*order_clauses(keys))
+            if fast:
+                return stream_select(
+                    db.session, query, row_serializer(TASK_FIELDS)
+                )
+            return stream_query(query, Task.to_dict)
+
+        if wants_full_listing(request.args):
+            query = query.order_by(*order_clauses(keys))
+            if fast:
+                return json_bytes_response(
+                    rows_to_dicts(db.session.execute(query), TASK_FIELDS)
+                )
+            return jsonify([task.to_dict() for task in query.all()])
+
+        limit = parse_limit(request.args.get('limit'))
+        tasks, next_cursor = keyset_paginate(
+            query, keys, request.args.get('cursor'), limit,
+            session=db.session if fast else None
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if fast:
+        return json_bytes_response(page_response(
+            rows_to_dicts(tasks, TASK_FIELDS), next_cursor, limit
+        ))
+    return jsonify(page_response(
+        [task.to_dict() for task in tasks], next_cursor, limit
+    ))
 
 
 @tasks_bp.route('/tasks', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
 def get_tasks():
-    """Lista todas as tarefas"""
+    """Lista as tarefas (paginado por cursor)"""
     if request.method == 'OPTIONS':
         return '', 200
         
-    tasks = Task.query.all()
-    return jsonify([task.to_dict() for task in tasks])
+    return _list_tasks()
 
 
 @tasks_bp.route('/tasks/<task_type>', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
 def get_tasks_by_type(task_type):
     """Lista tarefas por tipo (university/work)"""
     if request.method == 'OPTIONS':
         return '', 200
         
-    tasks = Task.query.filter_by(type=task_type.upper()).all()
-    return jsonify([task.to_dict() for task in tasks])
+    return _list_tasks(task_type)
+
+
+@tasks_bp.route('/tasks/changes', methods=['GET', 'OPTIONS'])
+def get_task_changes():
+    """Tarefas criadas/alteradas e ids apagados desde o token ``since``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    query = Task.query
+    if request.args.get('type'):
+        query = query.filter_by(type=request.args['type'].upper())
+    
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        tasks, deleted, next_since, has_more = changes_since(
+            query, Task, DeletedRecord, request.args.get('since'), limit
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(sync_response(
+        [task.to_dict() for task in tasks], deleted, next_since, has_more
+    ))
+
+
+@tasks_bp.route('/boards/<task_type>', methods=['GET', 'OPTIONS'])
+@conditional_get('task')
+def get_board(task_type):
+    """Quadro kanban agrupado por status, limitado por coluna"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        spec, per_column = parse_board_args(request.args, task_type)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({
+        'type': task_type.upper(),
+        'per_column': per_column,
+        'columns': board_columns(db.session, Task, spec, per_column)
+    })
 
 
 @tasks_bp.route('/tasks', methods=['POST', 'OPTIONS'])
@@ -135,13 +246,19 @@ def delete_task(task_id):
 
 @tasks_bp.route('/tasks/month/<int:month>', methods=['GET', 'OPTIONS'])
 def get_tasks_by_month(month):
-    """Lista tarefas por mês"""
+    """Lista tarefas com prazo no mês (``?year=``, padrão: ano corrente)"""
     if request.method == 'OPTIONS':
         return '', 200
         
+    try:
+        start, end = month_range(parse_year(request.args.get('year')), month)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
     tasks = Task.query.filter(
-        db.extract('month', Task.due_date) == month
-    ).all()
+        Task.due_date >= start,
+        Task.due_date < end
+    ).order_by(Task.due_date).all()
     
     return jsonify([
         {
@@ -155,7 +272,7 @@ def get_tasks_by_month(month):
 
 @tasks_bp.route('/tasks/<int:task_id>/history', methods=['GET', 'OPTIONS'])
 def get_task_history(task_id):
-    """Retorna o histórico de uma tarefa"""
+    """Retorna o histórico de uma tarefa (``?stream=true`` em lotes)"""
     if request.method == 'OPTIONS':
         return '', 200
     
@@ -164,7 +281,8 @@ def get_task_history(task_id):
         TaskHistory.query
         .filter_by(task_id=task_id)
         .order_by(TaskHistory.changed_at.desc())
-        .all()
     )
+    if wants_stream(request.args):
+        return stream_query(histories, TaskHistory.to_dict)
     
     return jsonify([history.to_dict() for history in histories])
@@ -1,6 +1,22 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 from models.attachment import Attachment
+from models.attachment_blob import AttachmentBlob
+from models.upload_session import UploadSession
+from utils.attachment_pipeline import REJECTED
+from utils.blobs import (
+    blob_path, discard_temp, publish_blob, release_blob, remove_blob_file,
+    store_blob
+)
+from utils.downloads import (
+    DEFAULT_ACCEL_PREFIX, DEFAULT_SEND_MODE, send_attachment, wants_download
+)
+from utils.upload_sessions import (
+    DEFAULT_MAX_RESERVED_BYTES, DEFAULT_MAX_UPLOAD_SESSIONS,
+    UploadCapacityError, create_upload_session, discard_upload_session,
+    expire_upload_sessions, finalize_upload, parse_offset, parse_upload_size,
+    session_file, session_response, write_chunk
+)
 from __init__ import db
 import os
 
@@ -34,13 +50,18 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({'message': 'Tipo de arquivo não permitido'}), 400
 
+    temp_path = None
     try:
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        # Conteúdo deduplicado por SHA-256 (utils.blobs)
+        root = current_app.config['UPLOAD_FOLDER']
+        blob, temp_path = store_blob(
+            db.session, AttachmentBlob, file.stream, root
+        )
 
         new_attachment = Attachment(
-            file_path=file_path,
+            file_path=blob_path(root, blob.sha256),
+            filename=secure_filename(file.filename),
+            blob=blob,
             description=request.form.get('description', ''),
             task_id=(
                 request.form.get('task_id')
@@ -54,13 +75,17 @@ def upload_file():
         
         db.session.add(new_attachment)
         db.session.commit()
+        publish_blob(root, blob.sha256, temp_path)
 
-        return jsonify({
+        # MIME, checksum, texto e verificador rodam depois da resposta
+        pipeline = current_app.extensions['attachment_pipeline']
+        return pipeline.submit_after(jsonify({
             'message': 'Arquivo enviado com sucesso!',
             'attachment': new_attachment.to_dict()
-        })
+        }), new_attachment.id)
     except Exception as e:
         db.session.rollback()
+        discard_temp(temp_path)
         return jsonify({'message': f'Erro ao fazer upload: {str(e)}'}), 500
     
 
@@ -76,14 +101,219 @@ def delete_attachment(attachment_id):
     attachment = Attachment.query.get_or_404(attachment_id)
     
     try:
-        # Remove o arquivo do sistema de arquivos
-        if os.path.exists(attachment.file_path):
+        blob_id, released = attachment.blob_id, None
+        if blob_id is None and os.path.exists(attachment.file_path):
+            # Anexo anterior à deduplicação: arquivo próprio
             os.remove(attachment.file_path)
         
         db.session.delete(attachment)
+        db.session.flush()
+        if blob_id is not None:
+            released = release_blob(db.session, AttachmentBlob, blob_id)
         db.session.commit()
         
+        # Conteúdo sem outros anexos: apaga o arquivo só após o commit
+        if released is not None:
+            remove_blob_file(
+                db.session, AttachmentBlob,
+                current_app.config['UPLOAD_FOLDER'], released
+            )
+        
         return jsonify({'message': 'Anexo deletado com sucesso!'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro ao deletar anexo: {str(e)}'}), 500
+
+
+@uploads_bp.route('/attachments/<int:attachment_id>', methods=['GET', 'OPTIONS'])
+def get_attachment(attachment_id):
+    """Dados do anexo, com o estado do pós-processamento"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    attachment = Attachment.query.get_or_404(attachment_id)
+    return jsonify(attachment.to_dict())
+
+
+@uploads_bp.route(
+    '/attachments/<int:attachment_id>/content',
+    methods=['GET', 'OPTIONS']
+)
+def get_attachment_content(attachment_id):
+    """Conteúdo do anexo, com Range, ETag e Last-Modified (?download=true)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    attachment = Attachment.query.get_or_404(attachment_id)
+    if attachment.status == REJECTED:
+        return jsonify({
+            'message': 'Anexo reprovado no processamento',
+            'status_detail': attachment.status_detail
+        }), 403
+    
+    try:
+        return send_attachment(
+            attachment, current_app.config['UPLOAD_FOLDER'],
+            mode=current_app.config.get(
+                'ATTACHMENT_SEND_MODE', DEFAULT_SEND_MODE
+            ),
+            accel_prefix=current_app.config.get(
+                'ATTACHMENT_ACCEL_PREFIX', DEFAULT_ACCEL_PREFIX
+            ),
+            as_attachment=wants_download(request.args)
+        )
+    except FileNotFoundError:
+        return jsonify({'message': 'Arquivo do anexo não encontrado'}), 404
+    except Exception as e:
+        return jsonify({'message': f'Erro ao baixar anexo: {str(e)}'}), 500
+
+
+# Upload em partes: POST /uploads, PATCH /uploads/<id> (Upload-Offset),
+# POST /uploads/<id>/finalize; GET retoma do último offset confirmado
+
+@uploads_bp.route('/uploads', methods=['POST', 'OPTIONS'])
+def create_upload():
+    """Abre uma sessão de upload em partes (``filename`` e ``size``)"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    data = request.get_json() or {}
+    filename = data.get('filename') or ''
+    if not allowed_file(filename):
+        return jsonify({'message': 'Tipo de arquivo não permitido'}), 400
+    
+    try:
+        size = parse_upload_size(data.get('size'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    root = current_app.config['UPLOAD_FOLDER']
+    try:
+        expire_upload_sessions(db.session, UploadSession, root)
+        upload = create_upload_session(
+            db.session, UploadSession, root, secure_filename(filename), size,
+            max_sessions=current_app.config.get(
+                'UPLOAD_MAX_SESSIONS', DEFAULT_MAX_UPLOAD_SESSIONS
+            ),
+            max_reserved=current_app.config.get(
+                'UPLOAD_MAX_RESERVED_BYTES', DEFAULT_MAX_RESERVED_BYTES
+            ),
+            description=data.get('description', ''),
+            task_id=data.get('task_id') or None,
+            finance_id=data.get('finance_id') or None
+        )
+        db.session.commit()
+        return jsonify(session_response(upload)), 201
+    except UploadCapacityError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao iniciar upload: {str(e)}'}), 500
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['GET', 'OPTIONS'])
+def get_upload(upload_id):
+    """Estado da sessão: ``offset`` é de onde o envio deve continuar"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    return jsonify(session_response(upload))
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['PATCH', 'OPTIONS'])
+def patch_upload(upload_id):
+    """Grava um chunk (corpo cru) no offset de ``Upload-Offset``"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    
+    try:
+        offset = parse_offset(
+            request.headers.get('Upload-Offset', request.args.get('offset'))
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    if offset > upload.received:
+        return jsonify({
+            'message': 'Offset à frente do último byte confirmado',
+            'offset': upload.received
+        }), 409
+    
+    try:
+        write_chunk(
+            db.session, UploadSession, upload, request.stream, offset,
+            current_app.config['UPLOAD_FOLDER']
+        )
+        db.session.commit()
+        return jsonify(session_response(upload))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao gravar chunk: {str(e)}'}), 500
+
+
+@uploads_bp.route(
+    '/uploads/<upload_id>/finalize',
+    methods=['POST', 'OPTIONS']
+)
+def finalize_chunked_upload(upload_id):
+    """Conclui o upload completo e cria o anexo"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.received < upload.size:
+        return jsonify({
+            'message': 'Upload incompleto',
+            'offset': upload.received
+        }), 409
+    
+    try:
+        root = current_app.config['UPLOAD_FOLDER']
+        new_attachment = Attachment(
+            filename=upload.filename,
+            description=upload.description,
+            task_id=upload.task_id,
+            finance_id=upload.finance_id
+        )
+        blob = finalize_upload(db.session, AttachmentBlob, upload, root)
+        new_attachment.blob = blob
+        new_attachment.file_path = blob_path(root, blob.sha256)
+        
+        db.session.add(new_attachment)
+        db.session.commit()
+        publish_blob(root, blob.sha256, session_file(root, upload_id))
+        
+        pipeline = current_app.extensions['attachment_pipeline']
+        return pipeline.submit_after(jsonify({
+            'message': 'Arquivo enviado com sucesso!',
+            'attachment': new_attachment.to_dict()
+        }), new_attachment.id), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao concluir upload: {str(e)}'}), 500
+
+
+@uploads_bp.route('/uploads/<upload_id>', methods=['DELETE', 'OPTIONS'])
+def cancel_upload(upload_id):
+    """Cancela a sessão e descarta o que já foi enviado"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    
+    try:
+        discard_upload_session(
+            db.session, upload, current_app.config['UPLOAD_FOLDER']
+        )
+        db.session.commit()
+        return jsonify({'message': 'Upload cancelado'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro ao cancelar upload: {str(e)}'}), 500
@@ -11,11 +11,12 @@ if __name__ == '__main__':
     # Inicializar banco dentro do contexto da aplicação
     with app.app_context():
         from app import db, User
+        from utils.schema import upgrade_schema
         from werkzeug.security import generate_password_hash
         
         try:
-            # Criar tabelas se não existirem
-            db.create_all()
+            # Criar tabelas e índices se não existirem
+            upgrade_schema(db)
             print("✅ Tabelas verificadas/criadas")
             
             # Verificar usuário admin
@@ -108,93 +108,70 @@ function logout() {
 // Dashboard data loading
 async function loadDashboardData() {
   try {
-    await Promise.all([loadTasksSummary(), loadFinancesSummary(), loadRecentActivities(), loadUpcomingInstallments()])
+    await Promise.all([loadSummary(), loadRecentActivities(), loadUpcomingInstallments()])
   } catch (error) {
     console.error("Erro ao carregar dados do dashboard:", error)
   }
 }
 
-async function loadTasksSummary() {
+// Agregados calculados no servidor (/dashboard/summary)
+async function loadSummary() {
   try {
-    // Carregar tarefas da universidade
-    const universityResponse = await fetch(`${API_BASE}/tasks/university`, {
+    const response = await fetch(`${API_BASE}/dashboard/summary`, {
       credentials: "same-origin",
     })
 
-    // Carregar tarefas do trabalho
-    const workResponse = await fetch(`${API_BASE}/tasks/work`, {
-      credentials: "same-origin",
-    })
-
-    let universityTasks = []
-    let workTasks = []
-
-    if (universityResponse.ok) {
-      universityTasks = await universityResponse.json()
+    if (!response.ok) {
+      throw new Error(`Status ${response.status}`)
     }
 
-    if (workResponse.ok) {
-      workTasks = await workResponse.json()
-    }
+    const summary = await response.json()
+    renderTasksSummary(summary)
+    renderFinancesSummary(summary)
+  } catch (error) {
+    console.error("Erro ao carregar resumo do dashboard:", error)
+    // Usar dados mock em caso de erro
+    loadMockTasksSummary()
+    document.getElementById("recentFinances").innerHTML =
+      '<p style="color: #dc3545; text-align: center;">Erro ao carregar finanças</p>'
+  }
+}
 
-    // Estatísticas da universidade
-    const totalUniversityTasks = universityTasks.length
-    const pendingUniversityTasks = universityTasks.filter((t) => t.status !== "DONE").length
-    const completedUniversityTasks = universityTasks.filter((t) => t.status === "DONE").length
-
-    document.getElementById("universityTasks").textContent = totalUniversityTasks
-    document.getElementById("universityTasksSummary").textContent =
-      `${pendingUniversityTasks} pendentes, ${completedUniversityTasks} concluídas`
-
-    // Estatísticas do trabalho
-    const totalWorkTasks = workTasks.length
-    const pendingWorkTasks = workTasks.filter((t) => t.status !== "DONE").length
-    const completedWorkTasks = workTasks.filter((t) => t.status === "DONE").length
-
-    document.getElementById("workTasks").textContent = totalWorkTasks
-    document.getElementById("workTasksSummary").textContent =
-      `${pendingWorkTasks} pendentes, ${completedWorkTasks} concluídas`
-
-    // Calcular produtividade
-    const allTasks = [...universityTasks, ...workTasks]
-    const thisWeekTasks = allTasks.filter((task) => {
-      const taskDate = new Date(task.updated_at || task.created_at)
-      const weekAgo = new Date()
-      weekAgo.setDate(weekAgo.getDate() - 7)
-      return taskDate >= weekAgo
-    })
+function renderTasksSummary(summary) {
+  const emptyCounts = { total: 0, pending: 0, done: 0 }
+  const university = summary.tasks.UNIVERSITY || emptyCounts
+  const work = summary.tasks.WORK || emptyCounts
 
-    const completedThisWeek = thisWeekTasks.filter((t) => t.status === "DONE").length
-    const productivityScore =
-      thisWeekTasks.length > 0 ? Math.round((completedThisWeek / thisWeekTasks.length) * 100) : 0
+  // Estatísticas da universidade
+  document.getElementById("universityTasks").textContent = university.total
+  document.getElementById("universityTasksSummary").textContent =
+    `${university.pending} pendentes, ${university.done} concluídas`
 
-    document.getElementById("productivityScore").textContent = `${productivityScore}%`
+  // Estatísticas do trabalho
+  document.getElementById("workTasks").textContent = work.total
+  document.getElementById("workTasksSummary").textContent = `${work.pending} pendentes, ${work.done} concluídas`
 
-    // Carregar tarefas recentes (misturadas)
-    const recentTasks = allTasks.slice(-5).reverse()
-    const recentTasksContainer = document.getElementById("recentTasks")
-    recentTasksContainer.innerHTML = ""
+  document.getElementById("productivityScore").textContent = `${summary.productivity.score}%`
 
-    if (recentTasks.length === 0) {
-      recentTasksContainer.innerHTML = '<p style="color: #6c757d; text-align: center;">Nenhuma tarefa encontrada</p>'
-      return
-    }
+  // Tarefas recentes (misturadas)
+  const recentTasksContainer = document.getElementById("recentTasks")
+  recentTasksContainer.innerHTML = ""
 
-    recentTasks.forEach((task) => {
-      const taskElement = document.createElement("div")
-      taskElement.className = "activity-item"
-      const typeIcon = task.type === "UNIVERSITY" ? "🎓" : "💼"
-      taskElement.innerHTML = `
-        <h4>${typeIcon} ${task.title}</h4>
-        <p>Status: ${getStatusText(task.status)} | Prioridade: ${getPriorityText(task.priority)}</p>
-      `
-      recentTasksContainer.appendChild(taskElement)
-    })
-  } catch (error) {
-    console.error("Erro ao carregar resumo de tarefas:", error)
-    // Usar dados mock em caso de erro
-    loadMockTasksSummary()
+  if (summary.recent_tasks.length === 0) {
+    recentTasksContainer.innerHTML = '<p style="color: #6c757d; text-align: center;">Nenhuma tarefa encontrada</p>'
+    return
   }
+
+  summary.recent_tasks.forEach((task) => {
+    const taskElement = document.createElement("div")
+    taskElement.className = "activity-item"
+    const typeIcon = task.type === "UNIVERSITY" ? "🎓" : "💼"
+    taskElement.innerHTML = `
+      <h4>${typeIcon} ${task.title}</h4>
+      <p>Status: ${getStatusText(task.status)} | Prioridade: ${getPriorityText(task.priority)}</p>
+    `
+    recentTasksContainer.appendChild(taskElement)
+  })
 }
 
 function loadMockTasksSummary() {
@@ -217,58 +194,30 @@ function loadMockTasksSummary() {
   `
 }
 
-async function loadFinancesSummary() {
-  try {
-    const response = await fetch(`${API_BASE}/finances`, {
-      credentials: "same-origin",
-    })
-
-    if (!response.ok) {
-      console.error("Erro ao carregar finanças:", response.status)
-      return
-    }
-
-    const finances = await response.json()
-
-    const currentMonth = new Date().getMonth() + 1
-    const monthlyFinances = finances.filter((f) => {
-      const financeMonth = new Date(f.transaction_date).getMonth() + 1
-      return financeMonth === currentMonth
-    })
-
-    const income = monthlyFinances.filter((f) => f.value > 0).reduce((sum, f) => sum + f.value, 0)
-    const expense = Math.abs(monthlyFinances.filter((f) => f.value < 0).reduce((sum, f) => sum + f.value, 0))
-    const balance = income - expense
-
-    document.getElementById("monthlyIncome").textContent = formatCurrency(income)
-    document.getElementById("monthlyExpense").textContent = formatCurrency(expense)
-    document.getElementById("monthlyBalance").textContent = formatCurrency(balance)
-
-    // Load recent finances
-    const recentFinances = finances.slice(-5).reverse()
-    const recentFinancesContainer = document.getElementById("recentFinances")
-    recentFinancesContainer.innerHTML = ""
+function renderFinancesSummary(summary) {
+  document.getElementById("monthlyIncome").textContent = formatCurrency(summary.finances.income)
+  document.getElementById("monthlyExpense").textContent = formatCurrency(summary.finances.expense)
+  document.getElementById("monthlyBalance").textContent = formatCurrency(summary.finances.balance)
 
-    if (recentFinances.length === 0) {
-      recentFinancesContainer.innerHTML =
-        '<p style="color: #6c757d; text-align: center;">Nenhuma movimentação encontrada</p>'
-      return
-    }
+  // Movimentações recentes
+  const recentFinancesContainer = document.getElementById("recentFinances")
+  recentFinancesContainer.innerHTML = ""
 
-    recentFinances.forEach((finance) => {
-      const financeElement = document.createElement("div")
-      financeElement.className = "activity-item"
-      financeElement.innerHTML = `
-        <h4>${finance.title}</h4>
-        <p>${formatCurrency(finance.value)} | ${formatDate(finance.transaction_date)}</p>
-      `
-      recentFinancesContainer.appendChild(financeElement)
-    })
-  } catch (error) {
-    console.error("Erro ao carregar resumo financeiro:", error)
-    document.getElementById("recentFinances").innerHTML =
-      '<p style="color: #dc3545; text-align: center;">Erro ao carregar finanças</p>'
+  if (summary.recent_finances.length === 0) {
+    recentFinancesContainer.innerHTML =
+      '<p style="color: #6c757d; text-align: center;">Nenhuma movimentação encontrada</p>'
+    return
   }
+
+  summary.recent_finances.forEach((finance) => {
+    const financeElement = document.createElement("div")
+    financeElement.className = "activity-item"
+    financeElement.innerHTML = `
+      <h4>${finance.title}</h4>
+      <p>${formatCurrency(finance.value)} | ${formatDate(finance.transaction_date)}</p>
+    `
+    recentFinancesContainer.appendChild(financeElement)
+  })
 }
 
 async function loadRecentActivities() {
@@ -278,7 +227,7 @@ async function loadRecentActivities() {
 
 async function loadUpcomingInstallments() {
   try {
-    const response = await fetch(`${API_BASE}/finances/upcoming-installments`, {
+    const response = await fetch(`${API_BASE}/finances/upcoming-installments?limit=5`, {
       credentials: "same-origin",
     })
 
@@ -287,7 +236,7 @@ async function loadUpcomingInstallments() {
       return
     }
 
-    const installments = await response.json()
+    const { items: installments } = await response.json()
     const container = document.getElementById("upcomingInstallments")
     container.innerHTML = ""
 
@@ -296,7 +245,7 @@ async function loadUpcomingInstallments() {
       return
     }
 
-    installments.slice(0, 5).forEach((installment) => {
+    installments.forEach((installment) => {
       const installmentElement = document.createElement("div")
       installmentElement.className = "activity-item future-installment"
       installmentElement.innerHTML = `
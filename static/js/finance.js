@@ -139,7 +139,8 @@ async function filterByMonth() {
   }
 
   try {
-    const response = await fetch(`${API_BASE}/finances/month/${selectedMonth}`)
+    const year = new Date().getFullYear()
+    const response = await fetch(`${API_BASE}/finances/month/${selectedMonth}?year=${year}`)
     const finances = await response.json()
 
     renderFinanceList(finances)
@@ -199,9 +200,12 @@ function createFinanceElement(finance) {
 }
 
 function updateFinanceSummary(finances) {
-  const income = finances.filter((f) => f.value > 0).reduce((sum, f) => sum + f.value, 0)
-  const expense = Math.abs(finances.filter((f) => f.value < 0).reduce((sum, f) => sum + f.value, 0))
-  const balance = income - expense
+  // Soma em centavos inteiros (value_cents) para não acumular erro de float
+  const incomeCents = finances.filter((f) => f.value_cents > 0).reduce((sum, f) => sum + f.value_cents, 0)
+  const expenseCents = -finances.filter((f) => f.value_cents < 0).reduce((sum, f) => sum + f.value_cents, 0)
+  const income = incomeCents / 100
+  const expense = expenseCents / 100
+  const balance = (incomeCents - expenseCents) / 100
 
   document.getElementById("totalIncome").textContent = new Intl.NumberFormat("pt-BR", {
     style: "currency",
@@ -139,7 +139,7 @@ async function updateTaskStatus(taskId, newStatus) {
 // Data loading
 async function loadTasks() {
   try {
-    const response = await fetch(`${API_BASE}/tasks/${TASK_TYPE.toLowerCase()}`)
+    const response = await fetch(`${API_BASE}/tasks/${TASK_TYPE.toLowerCase()}?all=true`)
     const tasks = await response.json()
 
     renderKanbanBoard(tasks)
@@ -137,7 +137,7 @@ async function updateTaskStatus(taskId, newStatus) {
 // Data loading
 async function loadTasks() {
   try {
-    const response = await fetch(`${API_BASE}/tasks`)
+    const response = await fetch(`${API_BASE}/tasks?all=true`)
     const tasks = await response.json()
 
     renderKanbanBoard(tasks)
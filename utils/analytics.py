@@ -0,0 +1,308 @@
+import heapq
+import threading
+from bisect import bisect_left
+from datetime import date
+
+from sqlalchemy import select
+
+try:
+    import numpy as np  # opcional: agregações vetorizadas quando instalado
+except ImportError:
+    np = None
+
+from utils.dates import iter_months, month_index, month_range
+from utils.finance_reports import parse_series_range, totals_dict
+from utils.money import from_cents
+from utils.pagination import parse_limit
+from utils.recurrence import (
+    expand_schedules, occurrence_title, schedules_in_range
+)
+from utils.rollup import UNCATEGORIZED
+from utils.versioning import read_table_versions
+
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+# Datas viram dias inteiros desde 1970-01-01
+EPOCH = date(1970, 1, 1).toordinal()
+
+# (chave, colunas) do último snapshot lido; trocado de uma vez só
+_snapshot = [None]
+_snapshot_lock = threading.Lock()
+
+
+def parse_analytics_args(args):
+    """Meses (``?from=YYYY-MM&to=YYYY-MM`` ou ``?year=``) e ``?top=``"""
+    first, last = parse_series_range(args)
+    top = parse_limit(args.get('top'), DEFAULT_TOP, MAX_TOP, name='top')
+    return first, last, top
+
+
+def _columns(ids, days, cents, categories):
+    """Colunas compactas: arrays NumPy quando disponível, senão listas"""
+    columns = {
+        'id': ids,
+        'day': [day.toordinal() - EPOCH for day in days],
+        'month': [month_index(day.year, day.month) for day in days],
+        'cents': cents,
+        'category': [
+            UNCATEGORIZED if category is None else category
+            for category in categories
+        ],
+    }
+    if np is None:
+        return columns
+    return {
+        'id': np.array(columns['id'], dtype=np.int64),
+        'day': np.array(columns['day'], dtype=np.int32),
+        'month': np.array(columns['month'], dtype=np.int32),
+        'cents': np.array(columns['cents'], dtype=np.int64),
+        'category': np.array(columns['category'], dtype=np.int64),
+    }
+
+
+def load_columns(session, finance_model):
+    """Lê as movimentações gravadas uma vez, ordenadas por data
+
+    Só quatro colunas; agendas virtuais ficam de fora (são expandidas por
+    consulta, apenas no intervalo pedido).
+    """
+    table = finance_model.__table__
+    result = session.execute(
+        select(table.c.id, table.c.transaction_date, table.c.value_cents,
+               table.c.category_id)
+        .where(table.c.schedule_interval.is_(None))
+        .order_by(table.c.transaction_date, table.c.id)
+    )
+    ids, days, cents, categories = [], [], [], []
+    for row in result:
+        ids.append(row.id)
+        days.append(row.transaction_date)
+        cents.append(row.value_cents)
+        categories.append(row.category_id)
+    return _columns(ids, days, cents, categories)
+
+
+def finance_snapshot(session, finance_model, version_model):
+    """Snapshot colunar de ``finance``, reaproveitado entre requisições
+
+    A chave é a versão da tabela (``table_version``), incrementada em toda
+    escrita, inclusive nas escritas em lote: qualquer alteração invalida o
+    snapshot em todos os workers. A versão é lida antes das linhas, então
+    o snapshot nunca é mais antigo que a versão que o identifica.
+    """
+    table_name = finance_model.__tablename__
+    version = read_table_versions(session, version_model, [table_name])[0]
+    key = (str(session.get_bind().url), version)
+    cached = _snapshot[0]
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with _snapshot_lock:
+        cached = _snapshot[0]
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        columns = load_columns(session, finance_model)
+        _snapshot[0] = (key, columns)
+        return columns
+
+
+def _slice(columns, start, end):
+    """Linhas com data em ``[start, end)`` (colunas ordenadas por data)"""
+    low, high = start.toordinal() - EPOCH, end.toordinal() - EPOCH
+    days = columns['day']
+    if np is not None:
+        first, last = np.searchsorted(days, [low, high])
+    else:
+        first, last = bisect_left(days, low), bisect_left(days, high)
+    return {name: column[first:last] for name, column in columns.items()}
+
+
+def _concat(left, right):
+    if np is not None:
+        return {
+            name: np.concatenate([left[name], right[name]]) for name in left
+        }
+    return {name: left[name] + right[name] for name in left}
+
+
+def _group(keys, cents):
+    """``{chave: (receita, despesa, quantidade)}`` em centavos exatos"""
+    if np is None:
+        groups = {}
+        for key, value in zip(keys, cents):
+            entry = groups.setdefault(key, [0, 0, 0])
+            if value > 0:
+                entry[0] += value
+            else:
+                entry[1] -= value
+            entry[2] += 1
+        return {key: tuple(entry) for key, entry in groups.items()}
+
+    if not len(keys):
+        return {}
+    order = np.argsort(keys, kind='stable')
+    keys, cents = keys[order], cents[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    income = np.add.reduceat(np.where(cents > 0, cents, 0), starts)
+    expense = np.add.reduceat(np.where(cents < 0, -cents, 0), starts)
+    counts = np.diff(np.append(starts, len(keys)))
+    return {
+        int(key): (int(inc), int(exp), int(count))
+        for key, inc, exp, count in zip(keys[starts], income, expense, counts)
+    }
+
+
+def _pivot_keys(window, first_month, stride):
+    """Chave única por (mês, categoria) para agrupar numa passada só"""
+    if np is not None:
+        return (window['month'] - first_month) * stride + window['category']
+    return [
+        (month - first_month) * stride + category
+        for month, category in zip(window['month'], window['category'])
+    ]
+
+
+def _top_expenses(cents, days, top):
+    """Índices das ``top`` maiores despesas (valores mais negativos)
+
+    Empates são desfeitos pela data e depois pela posição, com o mesmo
+    resultado com ou sem NumPy.
+    """
+    count = min(top, len(cents))
+    if count == 0:
+        return []
+    if np is not None:
+        threshold = np.partition(cents, count - 1)[count - 1]
+        candidates = np.flatnonzero(cents <= threshold)
+        order = np.lexsort(
+            (candidates, days[candidates], cents[candidates])
+        )[:count]
+        indexes = candidates[order]
+    else:
+        indexes = heapq.nsmallest(
+            count, range(len(cents)),
+            key=lambda index: (cents[index], days[index], index)
+        )
+    return [int(index) for index in indexes if cents[index] < 0]
+
+
+def _average(cents, count):
+    return round(cents / count) if count else 0
+
+
+def _category_entry(category, names, income, expense, count):
+    average = _average(income - expense, count)
+    return {
+        'category_id': category or None,
+        'name': names.get(category),
+        **totals_dict(income, expense, count),
+        'average': from_cents(average),
+        'average_cents': average
+    }
+
+
+def finance_analytics(session, finance_model, category_model, version_model,
+                      first, last, top=DEFAULT_TOP):
+    """Totais por categoria, pivô mês × categoria, maiores despesas e médias
+
+    As movimentações gravadas vêm do snapshot colunar; as ocorrências das
+    agendas virtuais do intervalo são somadas a ele. Todas as somas são em
+    centavos inteiros.
+    """
+    start, end = month_range(*first)[0], month_range(*last)[1]
+    physical = _slice(
+        finance_snapshot(session, finance_model, version_model), start, end
+    )
+    schedules = schedules_in_range(
+        session.query(finance_model), finance_model, start, end
+    ).all()
+    occurrences = list(expand_schedules(schedules, start, end))
+    window = _concat(physical, _columns(
+        [finance.id for _, finance, _ in occurrences],
+        [day for day, _, _ in occurrences],
+        [finance.value_cents for _, finance, _ in occurrences],
+        [finance.category_id for _, finance, _ in occurrences],
+    ))
+
+    by_category = _group(window['category'], window['cents'])
+    categories = sorted(
+        by_category, key=lambda category: (-by_category[category][1], category)
+    )
+    first_month = month_index(*first)
+    stride = max(categories, default=0) + 1
+    by_cell = _group(_pivot_keys(window, first_month, stride), window['cents'])
+
+    names = dict(session.query(category_model.id, category_model.name))
+    income = sum(entry[0] for entry in by_category.values())
+    expense = sum(entry[1] for entry in by_category.values())
+    count = sum(entry[2] for entry in by_category.values())
+    months = month_index(*last) - first_month + 1
+
+    pivot = []
+    for offset, (year, month) in enumerate(iter_months(first, last)):
+        balances = []
+        for category in categories:
+            cell = by_cell.get(offset * stride + category, (0, 0, 0))
+            balances.append(cell[0] - cell[1])
+        pivot.append({
+            'year': year,
+            'month': month,
+            'balance': [from_cents(cents) for cents in balances],
+            'balance_cents': balances
+        })
+
+    return {
+        'from': f'{first[0]:04d}-{first[1]:02d}',
+        'to': f'{last[0]:04d}-{last[1]:02d}',
+        'total': totals_dict(income, expense, count),
+        'monthly_average': totals_dict(
+            _average(income, months), _average(expense, months),
+            _average(count, months)
+        ),
+        'categories': [
+            _category_entry(category, names, *by_category[category])
+            for category in categories
+        ],
+        'pivot': {
+            'category_ids': [category or None for category in categories],
+            'months': pivot
+        },
+        'top_expenses': _describe(
+            session, finance_model, physical, occurrences,
+            _top_expenses(window['cents'], window['day'], top)
+        )
+    }
+
+
+def _describe(session, finance_model, physical, occurrences, indexes):
+    """Dados das maiores despesas; índices além das gravadas são ocorrências"""
+    stored = len(physical['id'])
+    ids = [int(physical['id'][index]) for index in indexes if index < stored]
+    titles = dict(
+        session.query(finance_model.id, finance_model.title)
+        .filter(finance_model.id.in_(ids))
+    ) if ids else {}
+
+    expenses = []
+    for index in indexes:
+        if index < stored:
+            finance_id = int(physical['id'][index])
+            cents = int(physical['cents'][index])
+            day = date.fromordinal(int(physical['day'][index]) + EPOCH)
+            category = int(physical['category'][index])
+            title, virtual = titles.get(finance_id), False
+        else:
+            day, finance, number = occurrences[index - stored]
+            finance_id, cents = finance.id, finance.value_cents
+            category = finance.category_id or UNCATEGORIZED
+            title, virtual = occurrence_title(finance, number), True
+        expenses.append({
+            'id': finance_id,
+            'title': title,
+            'value': from_cents(cents),
+            'value_cents': cents,
+            'transaction_date': day.isoformat(),
+            'category_id': category or None,
+            'virtual': virtual
+        })
+    return expenses
@@ -0,0 +1,370 @@
+import codecs
+import importlib
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from utils.blobs import hash_file
+
+try:
+    from pypdf import PdfReader  # opcional: texto de PDFs quando instalado
+except ImportError:
+    PdfReader = None
+
+# Estados do pós-processamento (``Attachment.status``)
+PENDING = 'pending'
+PROCESSING = 'processing'
+READY = 'ready'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+DEFAULT_WORKERS = 2
+# Anexos aguardando uma thread livre; acima disso ficam ``pending`` no
+# banco e entram na próxima recuperação
+MAX_QUEUED = 100
+# ``processing`` há mais tempo que isso: o worker morreu no meio
+PROCESSING_TIMEOUT = timedelta(minutes=15)
+RECOVER_BATCH_SIZE = 500
+
+SNIFF_SIZE = 8192
+MAX_TEXT_LENGTH = 200_000
+MAX_PDF_PAGES = 200
+
+OLE2 = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP = b'PK\x03\x04'
+# Extensão → (tipo MIME, assinaturas aceitas no início do arquivo)
+SIGNATURES = {
+    'pdf': ('application/pdf', (b'%PDF-',)),
+    'png': ('image/png', (b'\x89PNG\r\n\x1a\n',)),
+    'jpg': ('image/jpeg', (b'\xff\xd8\xff',)),
+    'jpeg': ('image/jpeg', (b'\xff\xd8\xff',)),
+    'gif': ('image/gif', (b'GIF87a', b'GIF89a')),
+    'doc': ('application/msword', (OLE2,)),
+    'xls': ('application/vnd.ms-excel', (OLE2,)),
+    'docx': (
+        'application/vnd.openxmlformats-officedocument'
+        '.wordprocessingml.document', (ZIP,)
+    ),
+    'xlsx': (
+        'application/vnd.openxmlformats-officedocument'
+        '.spreadsheetml.sheet', (ZIP,)
+    ),
+    'txt': ('text/plain', ()),
+}
+# Parte obrigatória de cada formato Office Open XML (todos são ZIP)
+OOXML_PARTS = {'docx': 'word/document.xml', 'xlsx': 'xl/workbook.xml'}
+# Assinaturas compartilhadas por mais de um formato
+CONTAINERS = {ZIP: 'application/zip', OLE2: 'application/x-ole-storage'}
+
+
+def load_scanner(spec):
+    """Verificador de conteúdo a partir de ``'modulo:funcao'`` (ou função)
+
+    O verificador recebe ``(caminho, anexo)`` e retorna ``None`` para
+    conteúdo limpo ou o motivo da reprovação. ``None`` desliga a etapa.
+    """
+    if not spec or callable(spec):
+        return spec or None
+    module_name, _, name = spec.partition(':')
+    if not name:
+        raise ValueError('Verificador deve estar no formato modulo:funcao')
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _extension(attachment):
+    name = attachment.filename or os.path.basename(attachment.file_path)
+    return name.rsplit('.', 1)[1].lower() if '.' in name else ''
+
+
+def _detect(head):
+    """Tipo MIME pela assinatura do conteúdo (``None`` se desconhecida)"""
+    for prefix, mime in CONTAINERS.items():
+        if head.startswith(prefix):
+            return mime
+    for mime, prefixes in SIGNATURES.values():
+        if any(head.startswith(prefix) for prefix in prefixes):
+            return mime
+    return None
+
+
+def sniff_mime(path, extension, allowed_extensions):
+    """Confere o conteúdo com a extensão e retorna o tipo MIME
+
+    A extensão precisa estar em ``allowed_extensions`` e o início do
+    arquivo precisa ter a assinatura do formato (ZIPs do Office também
+    precisam ter a parte principal do formato). Texto é aceito se não
+    tiver bytes nulos nem assinatura de formato binário. Levanta
+    ``ValueError`` quando o conteúdo não confere.
+    """
+    if extension not in allowed_extensions or extension not in SIGNATURES:
+        raise ValueError(f'Extensão não permitida: .{extension}')
+    with open(path, 'rb') as source:
+        head = source.read(SNIFF_SIZE)
+
+    mime, prefixes = SIGNATURES[extension]
+    detected = _detect(head)
+    if prefixes:
+        matches = any(head.startswith(prefix) for prefix in prefixes)
+        if matches and extension in OOXML_PARTS:
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    matches = OOXML_PARTS[extension] in archive.namelist()
+            except zipfile.BadZipFile:
+                matches = False
+    else:
+        matches = detected is None and b'\x00' not in head
+
+    if not matches:
+        raise ValueError(
+            f'Conteúdo não corresponde à extensão .{extension} '
+            f'(detectado: {detected or "desconhecido"})'
+        )
+    return mime
+
+
+def _decode_text(data):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        # final=False: o corte no limite pode partir um caractere
+        return decoder.decode(data)
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+def extract_text(path, mime):
+    """Texto para busca de anexos txt e pdf (limitado a ``MAX_TEXT_LENGTH``)
+
+    PDFs dependem do ``pypdf``; sem ele (ou para outros tipos) retorna
+    ``None``.
+    """
+    if mime == 'text/plain':
+        with open(path, 'rb') as source:
+            text = _decode_text(source.read(MAX_TEXT_LENGTH * 4))
+    elif mime == 'application/pdf' and PdfReader is not None:
+        parts, length = [], 0
+        for page in PdfReader(path).pages[:MAX_PDF_PAGES]:
+            part = page.extract_text() or ''
+            parts.append(part)
+            length += len(part)
+            if length >= MAX_TEXT_LENGTH:
+                break
+        text = '\n'.join(parts)
+    else:
+        return None
+    text = text.replace('\x00', '').strip()[:MAX_TEXT_LENGTH]
+    return text or None
+
+
+def verify_checksum(path, attachment):
+    """Relê o arquivo e confere SHA-256 e tamanho com os do blob"""
+    digest, size = hash_file(path)
+    blob = attachment.blob
+    if blob is not None and (digest != blob.sha256 or size != blob.size):
+        raise OSError('Conteúdo em disco difere do SHA-256 registrado')
+    return digest, size
+
+
+def claim_attachment(session, model, attachment_id, now=None):
+    """Marca o anexo como ``processing`` se ninguém o estiver processando
+
+    Um UPDATE condicional: só um worker (de qualquer processo) consegue
+    o anexo. ``processing`` antigo demais é retomado. Faz o commit.
+    """
+    now = now or datetime.utcnow()
+    table = model.__table__
+    result = session.execute(
+        table.update()
+        .where(
+            table.c.id == attachment_id,
+            or_(
+                table.c.status == PENDING,
+                and_(
+                    table.c.status == PROCESSING,
+                    table.c.status_changed_at < now - PROCESSING_TIMEOUT
+                )
+            )
+        )
+        .values(status=PROCESSING, status_changed_at=now)
+    )
+    session.commit()
+    return result.rowcount == 1
+
+
+def _processed_twin(session, model, attachment, mime):
+    """Outro anexo pronto do mesmo blob e tipo: conteúdo já verificado"""
+    if attachment.blob_id is None:
+        return None
+    return session.query(model).filter(
+        model.blob_id == attachment.blob_id,
+        model.id != attachment.id,
+        model.status == READY,
+        model.mime_type == mime
+    ).first()
+
+
+def process_attachment(session, model, attachment_id, allowed_extensions,
+                       scanner=None):
+    """Pós-processa um anexo e grava o resultado na própria linha
+
+    Etapas: tipo MIME pelo conteúdo, SHA-256/tamanho conferidos com o
+    blob, texto para busca e verificador externo. Conteúdo já processado
+    em outro anexo do mesmo blob não é lido de novo. Conteúdo inválido
+    deixa o anexo ``rejected``; erro de leitura ou do verificador,
+    ``failed``. Retorna o estado final, ou ``None`` se o anexo não estava
+    disponível para processamento.
+    """
+    if not claim_attachment(session, model, attachment_id):
+        return None
+    attachment = session.get(model, attachment_id)
+    path = attachment.file_path
+    status, detail, mime, text = READY, None, None, None
+
+    try:
+        mime = sniff_mime(path, _extension(attachment), allowed_extensions)
+        twin = _processed_twin(session, model, attachment, mime)
+        if twin is not None:
+            text = twin.text_content
+        else:
+            verify_checksum(path, attachment)
+            try:
+                text = extract_text(path, mime)
+            except Exception as e:
+                # PDF que o pypdf não lê continua válido, só sem texto
+                detail = f'Texto não extraído: {e}'
+            reason = scanner(path, attachment) if scanner else None
+            if reason:
+                raise ValueError(f'Reprovado pelo verificador: {reason}')
+    except ValueError as e:
+        status, detail = REJECTED, str(e)
+    except Exception as e:
+        status, detail = FAILED, f'Erro ao processar anexo: {e}'
+
+    attachment.status = status
+    attachment.status_detail = detail
+    attachment.mime_type = mime
+    attachment.text_content = text if status == READY else None
+    attachment.status_changed_at = datetime.utcnow()
+    session.commit()
+    return status
+
+
+def pending_query(session, model, now=None):
+    """Anexos ``pending`` e ``processing`` abandonados (``ix_attachment_status``)"""
+    now = now or datetime.utcnow()
+    return session.query(model.id).filter(
+        or_(
+            model.status == PENDING,
+            and_(
+                model.status == PROCESSING,
+                model.status_changed_at < now - PROCESSING_TIMEOUT
+            )
+        )
+    )
+
+
+def pending_attachments(session, model, now=None, limit=RECOVER_BATCH_SIZE):
+    """Ids dos anexos a processar, dos mais antigos"""
+    query = pending_query(session, model, now)
+    return [
+        attachment_id for attachment_id, in query.order_by(
+            model.status_changed_at, model.id
+        ).limit(limit)
+    ]
+
+
+class AttachmentPipeline:
+    """Pool limitado de threads que pós-processa anexos fora da requisição
+
+    O estado fica no banco (``Attachment.status``), então a fila em
+    memória pode ser perdida: anexos que não couberam nela ou que estavam
+    nela quando o processo parou continuam ``pending`` e são retomados
+    por ``recover`` (no primeiro envio de cada processo, depois de uma
+    fila cheia e pelo script ``process_attachments.py``).
+    """
+
+    def __init__(self, app, db, model, allowed_extensions,
+                 workers=DEFAULT_WORKERS, max_queued=MAX_QUEUED,
+                 scanner=None):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.allowed_extensions = allowed_extensions
+        self.scanner = scanner
+        # Threads criadas sob demanda (depois do fork dos workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='attachment'
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queued)
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._needs_recover = True
+
+    def submit(self, attachment_id):
+        """Enfileira o anexo; ``False`` se a fila estiver cheia"""
+        with self._lock:
+            if attachment_id in self._queued:
+                return True
+            if not self._slots.acquire(blocking=False):
+                self._needs_recover = True
+                return False
+            self._queued.add(attachment_id)
+        self._executor.submit(self._run, attachment_id)
+        return True
+
+    def submit_after(self, response, attachment_id):
+        """Enfileira o anexo só depois que ``response`` foi enviada"""
+        def enqueue():
+            self.submit(attachment_id)
+            with self._lock:
+                recover, self._needs_recover = self._needs_recover, False
+            if recover:
+                self._executor.submit(self._recover)
+
+        response.call_on_close(enqueue)
+        return response
+
+    def _run(self, attachment_id):
+        try:
+            with self.app.app_context():
+                process_attachment(
+                    self.db.session, self.model, attachment_id,
+                    self.allowed_extensions, self.scanner
+                )
+        except Exception:
+            self.app.logger.exception(
+                'Falha no pós-processamento do anexo %s', attachment_id
+            )
+        finally:
+            with self._lock:
+                self._queued.discard(attachment_id)
+            self._slots.release()
+
+    def _recover(self):
+        try:
+            self.recover()
+        except Exception:
+            self.app.logger.exception('Falha ao retomar anexos pendentes')
+
+    def recover(self):
+        """Enfileira anexos pendentes do banco; retorna quantos entraram"""
+        with self.app.app_context():
+            ids = pending_attachments(self.db.session, self.model)
+        return sum(1 for attachment_id in ids if self.submit(attachment_id))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def init_attachment_pipeline(app, db, model, allowed_extensions):
+    """Cria o pool com ``ATTACHMENT_WORKERS`` e ``ATTACHMENT_SCANNER``"""
+    pipeline = AttachmentPipeline(
+        app, db, model, allowed_extensions,
+        workers=int(app.config.get('ATTACHMENT_WORKERS', DEFAULT_WORKERS)),
+        scanner=load_scanner(app.config.get('ATTACHMENT_SCANNER'))
+    )
+    app.extensions['attachment_pipeline'] = pipeline
+    return pipeline
@@ -0,0 +1,158 @@
+import os
+from collections import Counter
+
+from utils.blobs import (
+    BLOBS_DIR, acquire_blob, blob_path, flat_blob_path, hash_file, link_file
+)
+
+DEFAULT_MIGRATION_BATCH_SIZE = 500
+
+
+def legacy_references(session, attachment_model):
+    """Quantos anexos sem blob apontam para cada arquivo
+
+    Uploads antigos com o mesmo nome gravavam no mesmo arquivo; ele só
+    pode ser apagado quando o último desses anexos for migrado.
+    """
+    return Counter(
+        file_path for file_path, in session.query(attachment_model.file_path)
+        .filter(attachment_model.blob_id.is_(None))
+    )
+
+
+def migrate_batch(session, attachment_model, blob_model, root, after_id,
+                  references, batch_size=DEFAULT_MIGRATION_BATCH_SIZE,
+                  stats=None):
+    """Migra os anexos com ``id > after_id``; retorna o último id ou ``None``
+
+    Os arquivos são ligados no caminho novo antes do commit; as linhas do
+    lote são atualizadas numa transação e os caminhos antigos só são
+    apagados depois dela. Anexos de blob mudam todos juntos (pelo
+    ``blob_id``); anexos antigos, sem blob, viram blobs deduplicados.
+    """
+    stats = stats if stats is not None else Counter()
+    rows = (
+        session.query(attachment_model, blob_model.sha256)
+        .outerjoin(blob_model, attachment_model.blob_id == blob_model.id)
+        .filter(attachment_model.id > after_id)
+        .order_by(attachment_model.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        return None
+
+    moved, digests, released = {}, {}, []
+    for attachment, sha256 in rows:
+        old = attachment.file_path
+        if sha256 is not None:
+            new = blob_path(root, sha256)
+            if old == new:
+                stats['already'] += 1
+                continue
+            if attachment.blob_id in moved:
+                continue
+            if not os.path.exists(new):
+                if not os.path.exists(old):
+                    stats['missing'] += 1
+                    continue
+                link_file(old, new)
+            moved[attachment.blob_id] = (old, new)
+            continue
+
+        if old not in digests:
+            if not os.path.isfile(old):
+                stats['missing'] += 1
+                continue
+            digests[old] = hash_file(old)
+        digest, size = digests[old]
+        new = blob_path(root, digest)
+        if not os.path.exists(new):
+            link_file(old, new)
+        attachment.blob = acquire_blob(session, blob_model, digest, size)
+        attachment.file_path = new
+        references[old] -= 1
+        if references[old] <= 0:
+            released.append(old)
+        stats['adopted'] += 1
+
+    table = attachment_model.__table__
+    for blob_id, (old, new) in moved.items():
+        # Pelo ix_attachment_blob_id: os anexos do blob em outros lotes
+        # já saem migrados (e não são contados de novo quando o lote
+        # deles os encontrar no caminho novo)
+        result = session.execute(
+            table.update()
+            .where(table.c.blob_id == blob_id, table.c.file_path != new)
+            .values(file_path=new)
+        )
+        stats['moved'] += result.rowcount
+    session.commit()
+
+    for old, new in list(moved.values()) + [
+        (old, blob_path(root, digests[old][0])) for old in released
+    ]:
+        if old != new and os.path.exists(old):
+            os.remove(old)
+            stats['removed'] += 1
+    stats['batches'] += 1
+    return rows[-1][0].id
+
+
+def remove_flat_leftovers(session, attachment_model, blob_model, root,
+                          stats=None):
+    """Apaga arquivos soltos em ``blobs/`` que já existem no caminho novo
+
+    Cobre uma interrupção entre o commit de um lote e a remoção dos
+    caminhos antigos. Um arquivo ainda usado por algum anexo (pulado com
+    ``after_id``) fica.
+    """
+    stats = stats if stats is not None else Counter()
+    directory = os.path.join(root, BLOBS_DIR)
+    if not os.path.isdir(directory):
+        return stats
+    for entry in os.scandir(directory):
+        # Só os arquivos com nome de SHA-256; os subdiretórios são o novo
+        if not entry.is_file() or len(entry.name) != 64:
+            continue
+        flat = flat_blob_path(root, entry.name)
+        if not os.path.exists(blob_path(root, entry.name)):
+            continue
+        in_use = (
+            session.query(attachment_model.id)
+            .join(blob_model, attachment_model.blob_id == blob_model.id)
+            .filter(
+                blob_model.sha256 == entry.name,
+                attachment_model.file_path == flat
+            )
+            .first()
+        )
+        if in_use is None:
+            os.remove(flat)
+            stats['removed'] += 1
+    return stats
+
+
+def migrate_upload_layout(session, attachment_model, blob_model, root,
+                          after_id=0, batch_size=DEFAULT_MIGRATION_BATCH_SIZE,
+                          progress=None):
+    """Move todos os anexos para ``blob_path`` (subdiretórios por hash)
+
+    Retomável: anexos já no caminho novo são pulados, então basta rodar
+    de novo após uma interrupção (``after_id`` evita reler o início).
+    ``progress`` recebe ``(último_id, estatísticas)`` a cada lote.
+    """
+    stats = Counter()
+    references = legacy_references(session, attachment_model)
+    while True:
+        last_id = migrate_batch(
+            session, attachment_model, blob_model, root, after_id,
+            references, batch_size, stats
+        )
+        if last_id is None:
+            break
+        after_id = last_id
+        if progress is not None:
+            progress(after_id, stats)
+    remove_flat_leftovers(session, attachment_model, blob_model, root, stats)
+    return stats
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy.exc import IntegrityError
+
+try:
+    import fcntl  # travas entre processos; ausente no Windows
+except ImportError:
+    fcntl = None
+
+# Bloco lido/gravado por vez ao receber um arquivo
+BLOB_CHUNK_SIZE = 64 * 1024
+BLOBS_DIR = 'blobs'
+# Níveis de subdiretório (2 caracteres do hash cada): blobs/ab/cd/<sha256>
+SHARD_LEVELS = 2
+# Arquivos em recebimento; no mesmo sistema de arquivos dos blobs para que
+# a publicação seja um hard link (sem copiar bytes)
+TMP_DIR = 'tmp'
+# Travas por conteúdo (``blob_lock``): um arquivo por prefixo de 2
+# caracteres do hash, no máximo 256, nunca apagados
+LOCKS_DIR = 'locks'
+
+
+def blob_path(root, digest):
+    """Caminho do conteúdo de SHA-256 ``digest`` dentro de ``root``
+
+    Dois níveis de diretório pelos primeiros caracteres do hash
+    (``blobs/ab/cd/abcd...``): no máximo 256 entradas por nível, em vez
+    de todos os arquivos num diretório só.
+    """
+    shards = [digest[2 * level:2 * level + 2] for level in range(SHARD_LEVELS)]
+    return os.path.join(root, BLOBS_DIR, *shards, digest)
+
+
+def flat_blob_path(root, digest):
+    """Caminho antigo, sem subdiretórios (antes de ``migrate_uploads.py``)"""
+    return os.path.join(root, BLOBS_DIR, digest)
+
+
+def spool_upload(stream, root, chunk_size=BLOB_CHUNK_SIZE):
+    """Grava ``stream`` num arquivo temporário calculando o SHA-256
+
+    Uma única passada pelos bytes: cada bloco lido é somado ao hash e
+    gravado. Retorna ``(caminho_temporário, sha256, tamanho)``; em caso
+    de erro o temporário é removido.
+    """
+    directory = os.path.join(root, TMP_DIR)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    digest, size = hashlib.sha256(), 0
+    try:
+        with os.fdopen(descriptor, 'wb') as target:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+            target.flush()
+            os.fsync(target.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def discard_temp(path):
+    """Apaga um temporário de ``root/tmp`` se ele ainda existir"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+@contextmanager
+def blob_lock(root, digest):
+    """Trava exclusiva (entre processos e threads) do conteúdo ``digest``
+
+    Serializa a remoção do arquivo de um blob liberado com a publicação
+    do mesmo conteúdo por outro upload. Sem ``fcntl`` não trava.
+    """
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.join(root, LOCKS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{digest[:2]}.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def link_file(source, target):
+    """Cria ``target`` com o conteúdo de ``source`` sem apagar a origem
+
+    Hard link quando possível (mesmo sistema de arquivos, sem copiar
+    bytes); senão cópia num temporário renomeado no fim. Até o commit os
+    dois caminhos são válidos, então uma interrupção não perde arquivos.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        temp = f'{target}.part'
+        shutil.copy2(source, temp)
+        os.replace(temp, target)
+
+
+def _acquire(session, blob_model, digest):
+    """+1 referência no blob existente; ``None`` se ainda não existe"""
+    table = blob_model.__table__
+    result = session.execute(
+        table.update()
+        .where(table.c.sha256 == digest)
+        .values(refcount=table.c.refcount + 1)
+    )
+    if result.rowcount == 0:
+        return None
+    return (
+        session.query(blob_model).populate_existing()
+        .filter_by(sha256=digest).one()
+    )
+
+
+def hash_file(path, chunk_size=BLOB_CHUNK_SIZE):
+    """``(sha256, tamanho)`` de um arquivo já gravado"""
+    digest, size = hashlib.sha256(), 0
+    with open(path, 'rb') as source:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def store_blob(session, blob_model, stream, root):
+    """Grava o conteúdo de ``stream`` deduplicado; ``(blob, temporário)``
+
+    O hash sai da mesma passada que grava o temporário; a busca pelo
+    conteúdo é pelo índice único de ``sha256``. Roda na transação da
+    sessão (sem commit); depois dele o chamador usa ``publish_blob``.
+    """
+    temp_path, digest, size = spool_upload(stream, root)
+    blob = store_spooled(session, blob_model, temp_path, digest, size, root)
+    return blob, temp_path
+
+
+def acquire_blob(session, blob_model, digest, size):
+    """+1 referência no blob de ``digest``, criando o registro se preciso"""
+    blob = _acquire(session, blob_model, digest)
+    if blob is None:
+        try:
+            with session.begin_nested():
+                blob = blob_model(sha256=digest, size=size, refcount=1)
+                session.add(blob)
+        except IntegrityError:
+            # Outro upload do mesmo conteúdo gravou o blob antes
+            blob = _acquire(session, blob_model, digest)
+    return blob
+
+
+def store_spooled(session, blob_model, temp_path, digest, size, root):
+    """Registra um temporário de ``root/tmp`` como blob (sem commit)
+
+    Conteúdo repetido só incrementa ``refcount``; conteúdo novo é ligado
+    em ``blob_path``. O temporário fica até ``publish_blob``, depois do
+    commit; se o registro falhar ele é apagado aqui.
+    """
+    try:
+        blob = acquire_blob(session, blob_model, digest, size)
+        path = blob_path(root, digest)
+        if not os.path.exists(path):
+            link_file(temp_path, path)
+    except BaseException:
+        discard_temp(temp_path)
+        raise
+    return blob
+
+
+def publish_blob(root, digest, source):
+    """Depois do commit: garante o arquivo do blob e apaga ``source``
+
+    Uma remoção concorrente (``remove_blob_file``) que ainda não via o
+    registro novo pode ter apagado o arquivo antes do commit; sob a trava
+    do conteúdo ele é refeito a partir de ``source``. Depois disso o
+    registro já está visível e nenhuma remoção apaga o arquivo.
+    """
+    with blob_lock(root, digest):
+        path = blob_path(root, digest)
+        if not os.path.exists(path):
+            link_file(source, path)
+    discard_temp(source)
+
+
+def release_blob(session, blob_model, blob_id):
+    """-1 referência; retorna o ``sha256`` se o blob ficou sem anexos
+
+    O registro é apagado na transação da sessão; o arquivo só deve ser
+    removido depois do commit (``remove_blob_file``).
+    """
+    table = blob_model.__table__
+    session.execute(
+        table.update()
+        .where(table.c.id == blob_id)
+        .values(refcount=table.c.refcount - 1)
+    )
+    digest = session.execute(
+        table.select().with_only_columns(table.c.sha256)
+        .where(table.c.id == blob_id, table.c.refcount <= 0)
+    ).scalar()
+    if digest is not None:
+        session.execute(table.delete().where(table.c.id == blob_id))
+    return digest
+
+
+def remove_blob_file(session, blob_model, root, digest):
+    """Apaga o arquivo de um blob liberado, se nenhum upload o recriou
+
+    Verificação e remoção acontecem sob ``blob_lock``, a mesma trava de
+    ``publish_blob``.
+    """
+    with blob_lock(root, digest):
+        if session.query(blob_model.id).filter_by(sha256=digest).first():
+            return False
+        for path in (blob_path(root, digest), flat_blob_path(root, digest)):
+            if os.path.exists(path):
+                os.remove(path)
+    return True
@@ -0,0 +1,79 @@
+from sqlalchemy import func, select
+
+from utils.pagination import encode_cursor, order_clauses, parse_limit
+from utils.serialization import TASK_FIELDS, project
+from utils.task_filters import (
+    TASK_STATUSES, apply_task_filters, parse_task_filters, task_sort_keys
+)
+
+DEFAULT_COLUMN_LIMIT = 20
+MAX_COLUMN_LIMIT = 200
+
+# Parâmetros de listagem que não fazem sentido no quadro agrupado
+UNSUPPORTED_PARAMS = ('all', 'cursor', 'limit', 'stream', 'fast')
+
+
+def parse_board_args(args, task_type):
+    """Valida os parâmetros de ``/boards/<task_type>``
+
+    Aceita os mesmos filtros e ``sort`` de ``/tasks`` mais ``per_column``.
+    """
+    args = args.copy()
+    per_column = parse_limit(
+        args.pop('per_column', None),
+        DEFAULT_COLUMN_LIMIT, MAX_COLUMN_LIMIT, name='per_column'
+    )
+    unsupported = [name for name in args if name in UNSUPPORTED_PARAMS]
+    if unsupported:
+        raise ValueError(
+            f'Parâmetros não suportados no quadro: {", ".join(unsupported)} '
+            '(use per_column e o next_cursor de cada coluna em /tasks)'
+        )
+    return parse_task_filters(args, task_type), per_column
+
+
+def board_statement(model, spec, per_column):
+    """SELECT com os ``per_column`` primeiros cartões de cada status"""
+    ranked = apply_task_filters(
+        select(
+            *project(model, TASK_FIELDS),
+            func.row_number().over(
+                partition_by=model.status,
+                order_by=order_clauses(task_sort_keys(model, spec))
+            ).label('position'),
+            func.count().over(partition_by=model.status).label('column_total')
+        ),
+        model, spec
+    ).subquery()
+    return (
+        select(ranked)
+        .where(ranked.c.position <= per_column)
+        .order_by(ranked.c.status, ranked.c.position)
+    )
+
+
+def board_columns(session, model, spec, per_column):
+    """Cartões agrupados por status a partir de uma única consulta
+
+    ``ROW_NUMBER() OVER (PARTITION BY status)`` numera os cartões de cada
+    coluna na ordem pedida e ``COUNT(*) OVER (PARTITION BY status)`` traz
+    o total da coluna, então só os ``per_column`` primeiros de cada
+    coluna saem do banco. O ``next_cursor`` de cada coluna continua a
+    listagem em ``/tasks/<type>?status=<status>`` com o mesmo ``sort``.
+    """
+    keys = task_sort_keys(model, spec)
+    rows = session.execute(board_statement(model, spec, per_column)).all()
+
+    columns = {
+        status: {'status': status, 'total': 0, 'cards': [], 'next_cursor': None}
+        for status in spec.get('status', TASK_STATUSES)
+    }
+    for row in rows:
+        column = columns.setdefault(row.status, {
+            'status': row.status, 'total': 0, 'cards': [], 'next_cursor': None
+        })
+        column['total'] = row.column_total
+        column['cards'].append({field: getattr(row, field) for field in TASK_FIELDS})
+        if row.position == per_column and row.column_total > per_column:
+            column['next_cursor'] = encode_cursor(keys, row)
+    return list(columns.values())
@@ -0,0 +1,213 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, tuple_
+
+from utils.dates import add_months, month_index
+from utils.money import from_cents
+from utils.recurrence import expand_schedules, iter_occurrences, schedules_in_range
+
+GRANULARITIES = ('day', 'month')
+# Pontos por requisição; séries maiores saem cortadas e continuam a partir
+# de next_from
+MAX_POINTS = 1000
+# Sem ``to``, a projeção vai até o fim do mês daqui a 12 meses
+DEFAULT_PROJECTION_MONTHS = 12
+
+
+def _parse_day(raw, name):
+    try:
+        return datetime.strptime(raw, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'Parâmetro {name} deve estar no formato YYYY-MM-DD')
+
+
+def _first_of_month(day):
+    return date(day.year, day.month, 1)
+
+
+def parse_cashflow_args(args, session, finance_model, today=None):
+    """Granularidade, intervalo ``[start, end)`` e ``next_from``
+
+    ``from`` padrão: a movimentação mais antiga. ``to`` (inclusivo) padrão:
+    fim do mês daqui a ``DEFAULT_PROJECTION_MONTHS`` meses. Com
+    ``granularity=month`` o intervalo é estendido para meses inteiros.
+    Intervalos com mais de ``MAX_POINTS`` dias (ou meses) são cortados;
+    ``next_from`` é onde o restante começa (``None`` se não houve corte).
+    """
+    today = today or date.today()
+    granularity = (args.get('granularity') or 'month').lower()
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f'Parâmetro granularity deve ser um de: {", ".join(GRANULARITIES)}'
+        )
+
+    if args.get('from'):
+        start = _parse_day(args['from'], 'from')
+    else:
+        start = session.query(
+            func.min(finance_model.transaction_date)
+        ).scalar() or today
+    if args.get('to'):
+        end = _parse_day(args['to'], 'to') + timedelta(days=1)
+    else:
+        end = add_months(_first_of_month(today), DEFAULT_PROJECTION_MONTHS + 1)
+
+    if granularity == 'month':
+        start = _first_of_month(start)
+        if end.day != 1:
+            end = add_months(_first_of_month(end), 1)
+        points = (month_index(end.year, end.month)
+                  - month_index(start.year, start.month))
+    else:
+        points = (end - start).days
+    if points < 1:
+        raise ValueError('Parâmetro from deve ser anterior ou igual a to')
+    next_from = None
+    if points > MAX_POINTS:
+        if granularity == 'month':
+            end = add_months(start, MAX_POINTS)
+        else:
+            end = start + timedelta(days=MAX_POINTS)
+        next_from = end
+    return granularity, start, end, next_from
+
+
+def opening_balance_cents(session, finance_model, rollup_model, start):
+    """Saldo acumulado antes de ``start``, sem percorrer o histórico
+
+    Os meses inteiros anteriores vêm do rollup mensal, que funciona como
+    cache das somas por mês: a soma de prefixo custa O(meses). Só os dias
+    do mês de ``start`` antes dele são lidos de ``finance`` (pelo índice
+    de data), mais as ocorrências de agendas virtuais anteriores.
+    """
+    month_start = _first_of_month(start)
+    period = tuple_(rollup_model.year, rollup_model.month)
+    before_month = session.query(func.coalesce(func.sum(
+        rollup_model.income_cents - rollup_model.expense_cents
+    ), 0)).filter(period < tuple_(month_start.year, month_start.month)).scalar()
+
+    same_month = session.query(
+        func.coalesce(func.sum(finance_model.value_cents), 0)
+    ).filter(
+        finance_model.transaction_date >= month_start,
+        finance_model.transaction_date < start,
+        finance_model.schedule_interval.is_(None)
+    ).scalar()
+
+    schedules = schedules_in_range(
+        session.query(finance_model), finance_model, end=start
+    )
+    virtual = sum(
+        finance.value_cents * sum(1 for _ in iter_occurrences(finance, end=start))
+        for finance in schedules
+    )
+    return before_month + same_month + virtual
+
+
+def running_by_day_query(session, finance_model, start, end):
+    """Saldo corrido por dia com ``SUM(...) OVER (ORDER BY transaction_date)``"""
+    day = finance_model.transaction_date
+    net = func.sum(finance_model.value_cents)
+    return session.query(
+        day.label('day'),
+        net.label('net_cents'),
+        func.sum(net).over(order_by=day).label('running_cents')
+    ).filter(
+        day >= start, day < end, finance_model.schedule_interval.is_(None)
+    ).group_by(day).order_by(day)
+
+
+def running_by_month_query(session, rollup_model, start, end):
+    """Saldo corrido por mês sobre o rollup, com ``SUM(...) OVER``"""
+    period = tuple_(rollup_model.year, rollup_model.month)
+    net = func.sum(rollup_model.income_cents - rollup_model.expense_cents)
+    return session.query(
+        rollup_model.year,
+        rollup_model.month,
+        net.label('net_cents'),
+        func.sum(net).over(
+            order_by=(rollup_model.year, rollup_model.month)
+        ).label('running_cents')
+    ).filter(
+        period >= tuple_(start.year, start.month),
+        period < tuple_(end.year, end.month)
+    ).group_by(rollup_model.year, rollup_model.month).order_by(
+        rollup_model.year, rollup_model.month
+    )
+
+
+def _month_keys(start, end):
+    for index in range(month_index(start.year, start.month),
+                       month_index(end.year, end.month)):
+        year, month = divmod(index, 12)
+        yield date(year, month + 1, 1)
+
+
+def cashflow(session, finance_model, rollup_model, granularity, start, end,
+             next_from=None, today=None):
+    """Série do saldo corrido em ``[start, end)``
+
+    O banco calcula o acumulado com função de janela; as ocorrências das
+    agendas virtuais (projeção) são somadas por cima. Mensal: todos os
+    meses do intervalo. Diária: só os dias com movimentação.
+    """
+    today = today or date.today()
+    opening = opening_balance_cents(session, finance_model, rollup_model, start)
+
+    if granularity == 'month':
+        rows = {
+            date(row.year, row.month, 1): row
+            for row in running_by_month_query(session, rollup_model, start, end)
+        }
+        bucket = _first_of_month
+        keys = list(_month_keys(start, end))
+    else:
+        rows = {
+            row.day: row
+            for row in running_by_day_query(session, finance_model, start, end)
+        }
+        bucket = None
+        keys = None
+
+    schedules = schedules_in_range(
+        session.query(finance_model), finance_model, start, end
+    ).all()
+    virtual = {}
+    for day, finance, _ in expand_schedules(schedules, start, end):
+        key = bucket(day) if bucket else day
+        virtual[key] = virtual.get(key, 0) + finance.value_cents
+    if keys is None:
+        keys = sorted(rows.keys() | virtual.keys())
+
+    points = []
+    running = virtual_running = 0
+    for key in keys:
+        row = rows.get(key)
+        if row is not None:
+            running = row.running_cents
+        virtual_running += virtual.get(key, 0)
+        net = (row.net_cents if row is not None else 0) + virtual.get(key, 0)
+        balance = opening + running + virtual_running
+        # Um mês é projetado se ainda tem dias pela frente (inclui o corrente)
+        last_day = (
+            add_months(key, 1) - timedelta(days=1)
+            if granularity == 'month' else key
+        )
+        points.append({
+            'period': key.strftime('%Y-%m' if granularity == 'month' else '%Y-%m-%d'),
+            'net': from_cents(net),
+            'net_cents': net,
+            'balance': from_cents(balance),
+            'balance_cents': balance,
+            'projected': last_day > today
+        })
+
+    return {
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': (end - timedelta(days=1)).isoformat(),
+        'next_from': next_from.isoformat() if next_from else None,
+        'opening_balance': from_cents(opening),
+        'opening_balance_cents': opening,
+        'points': points
+    }
@@ -0,0 +1,79 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, func
+
+from utils.finance_reports import month_totals
+
+RECENT_ITEMS = 5
+
+
+def task_counts(session, task_model):
+    """Contagem de tarefas por tipo e status (um único GROUP BY)"""
+    rows = session.query(
+        task_model.type, task_model.status, func.count()
+    ).group_by(task_model.type, task_model.status).all()
+
+    counts = {}
+    for task_type, status, count in rows:
+        entry = counts.setdefault(
+            task_type, {'total': 0, 'pending': 0, 'done': 0, 'by_status': {}}
+        )
+        entry['total'] += count
+        entry['by_status'][status] = count
+        entry['done' if status == 'DONE' else 'pending'] += count
+    return counts
+
+
+def weekly_productivity(session, task_model, today=None):
+    """Percentual de tarefas movimentadas nos últimos 7 dias já concluídas
+
+    A janela começa à meia-noite de 7 dias atrás (dias inteiros): o
+    resultado só muda com o dia ou com as tarefas, como o ETag da rota.
+    """
+    week_ago = datetime.combine(
+        (today or date.today()) - timedelta(days=7), time.min
+    )
+    touched, completed = session.query(
+        func.count(),
+        func.coalesce(
+            func.sum(case((task_model.status == 'DONE', 1), else_=0)), 0
+        )
+    ).filter(task_model.updated_at >= week_ago).one()
+    return {
+        'updated_this_week': touched,
+        'completed_this_week': completed,
+        'score': round(completed * 100 / touched) if touched else 0
+    }
+
+
+def dashboard_summary(session, task_model, finance_model, rollup_model,
+                      today=None):
+    """Documento único com os agregados exibidos no dashboard"""
+    today = today or date.today()
+
+    recent_tasks = session.query(
+        task_model.id, task_model.title, task_model.type,
+        task_model.status, task_model.priority
+    ).order_by(task_model.id.desc()).limit(RECENT_ITEMS).all()
+    recent_finances = session.query(
+        finance_model.id, finance_model.title, finance_model.value,
+        finance_model.transaction_date
+    ).order_by(finance_model.id.desc()).limit(RECENT_ITEMS).all()
+
+    return {
+        'tasks': task_counts(session, task_model),
+        'productivity': weekly_productivity(session, task_model, today),
+        'finances': {
+            'year': today.year,
+            'month': today.month,
+            **month_totals(
+                session, rollup_model, finance_model,
+                today.year, today.month
+            )
+        },
+        'recent_tasks': [row._asdict() for row in recent_tasks],
+        'recent_finances': [
+            {**row._asdict(), 'transaction_date': row.transaction_date.isoformat()}
+            for row in recent_finances
+        ]
+    }
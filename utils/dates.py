@@ -0,0 +1,63 @@
+import calendar
+from datetime import date
+
+
+def month_range(year, month):
+    """Intervalo semiaberto ``[início, fim)`` de um mês
+
+    Usado como ``coluna >= início AND coluna < fim``, que o índice da
+    coluna de data consegue servir (ao contrário de ``extract``).
+    """
+    if not 1 <= month <= 12:
+        raise ValueError('Mês deve estar entre 1 e 12')
+    start = date(year, month, 1)
+    if month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def add_months(day, months):
+    """Soma meses a uma data, limitando ao último dia do mês de destino
+
+    Ex.: 31/01 + 1 mês = 28/02 (ou 29/02 em ano bissexto).
+    """
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    month += 1
+    return date(
+        year, month, min(day.day, calendar.monthrange(year, month)[1])
+    )
+
+
+def parse_year(raw, default=None):
+    """Converte o parâmetro ``year``; sem valor, usa o ano corrente"""
+    if raw in (None, ''):
+        return default if default is not None else date.today().year
+    try:
+        year = int(raw)
+    except ValueError:
+        raise ValueError('Parâmetro year deve ser um número inteiro')
+    if not 1 <= year <= 9999:
+        raise ValueError('Parâmetro year fora do intervalo válido')
+    return year
+
+
+def parse_year_month(raw, name):
+    """Converte um parâmetro ``YYYY-MM`` em ``(ano, mês)``"""
+    try:
+        year, month = (int(part) for part in raw.split('-'))
+        date(year, month, 1)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f'Parâmetro {name} deve estar no formato YYYY-MM')
+    return year, month
+
+
+def month_index(year, month):
+    """Número sequencial do mês, para contar e percorrer intervalos"""
+    return year * 12 + month - 1
+
+
+def iter_months(first, last):
+    """``(ano, mês)`` de ``first`` até ``last``, inclusive"""
+    for index in range(month_index(*first), month_index(*last) + 1):
+        year, month = divmod(index, 12)
+        yield year, month + 1
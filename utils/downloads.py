@@ -0,0 +1,106 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.utils import send_file
+
+# Quem envia os bytes do anexo:
+#   direct            o worker, com sendfile (zero-copy) via wsgi.file_wrapper
+#   x-accel-redirect  o nginx, por uma location interna (ATTACHMENT_ACCEL_PREFIX)
+#   x-sendfile        o Apache (mod_xsendfile) ou lighttpd, pelo caminho absoluto
+SEND_MODES = ('direct', 'x-accel-redirect', 'x-sendfile')
+DEFAULT_SEND_MODE = 'direct'
+# Location do nginx apontando para UPLOAD_FOLDER:
+#   location /protected-uploads/ { internal; alias /caminho/do/uploads/; }
+DEFAULT_ACCEL_PREFIX = '/protected-uploads/'
+
+
+def wants_download(args):
+    """``?download=true`` envia como anexo em vez de exibir no navegador"""
+    return args.get('download', '').lower() in ('1', 'true', 'yes')
+
+
+def attachment_etag(attachment):
+    """ETag forte: o SHA-256 do conteúdo, quando o anexo está num blob
+
+    Anexos anteriores à deduplicação ficam com o ETag gerado pelo werkzeug
+    (data de modificação, tamanho e caminho do arquivo).
+    """
+    blob = attachment.blob
+    return blob.sha256 if blob is not None else True
+
+
+def _offload_response(header, target, path, mimetype, disposition,
+                      filename, etag):
+    """Resposta vazia com ``header``; o servidor na frente envia o arquivo
+
+    As condicionais são respondidas aqui (304 sem acionar o servidor);
+    Range e o envio dos bytes ficam com ele.
+    """
+    stat = os.stat(path)
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers[header] = target
+    response.headers.set('Content-Disposition', disposition, filename=filename)
+    response.set_etag(
+        etag if isinstance(etag, str)
+        else f'{stat.st_mtime}-{stat.st_size}'
+    )
+    response.last_modified = int(stat.st_mtime)
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        del response.headers[header]
+    return response
+
+
+def send_attachment(attachment, root, mode=DEFAULT_SEND_MODE,
+                    accel_prefix=DEFAULT_ACCEL_PREFIX, as_attachment=False):
+    """Resposta com o conteúdo de ``attachment`` no modo configurado
+
+    Sempre condicional: ``If-None-Match``/``If-Modified-Since`` viram 304
+    e, no modo ``direct``, ``Range``/``If-Range`` viram 206 (ou 416) com
+    só o trecho pedido. Arquivos fora de ``root`` não têm location no
+    nginx e saem em modo ``direct``. Levanta ``FileNotFoundError`` se o
+    arquivo sumiu.
+    """
+    if mode not in SEND_MODES:
+        raise ValueError(f'Modo de envio deve ser um de: {", ".join(SEND_MODES)}')
+
+    path = os.path.abspath(attachment.file_path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(attachment.file_path)
+
+    filename = attachment.filename or os.path.basename(path)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    etag = attachment_etag(attachment)
+
+    disposition = 'attachment' if as_attachment else 'inline'
+    root = os.path.abspath(root)
+    if mode == 'x-accel-redirect' and os.path.commonpath([path, root]) == root:
+        relative = os.path.relpath(path, root).replace(os.sep, '/')
+        return _offload_response(
+            'X-Accel-Redirect', accel_prefix.rstrip('/') + '/' + quote(relative),
+            path, mimetype, disposition, filename, etag
+        )
+    if mode == 'x-sendfile':
+        return _offload_response(
+            'X-Sendfile', path, path, mimetype, disposition, filename, etag
+        )
+
+    try:
+        response = send_file(
+            path, request.environ,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=filename,
+            conditional=True,
+            etag=etag,
+            max_age=current_app.get_send_file_max_age(filename),
+            response_class=current_app.response_class
+        )
+    except RequestedRangeNotSatisfiable as e:
+        # 416 com ``Content-Range: bytes */tamanho``
+        return e.get_response()
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    return response
@@ -0,0 +1,132 @@
+from sqlalchemy import func, tuple_
+
+from utils.dates import (
+    iter_months, month_index, month_range, parse_year, parse_year_month
+)
+from utils.money import from_cents
+from utils.recurrence import expand_schedules, schedules_in_range
+
+# Limite de meses por consulta da série mensal (10 anos)
+MAX_SERIES_MONTHS = 120
+
+
+def totals_dict(income_cents, expense_cents, count):
+    """Totais em reais e em centavos exatos (somas feitas em centavos)"""
+    balance_cents = income_cents - expense_cents
+    return {
+        'income': from_cents(income_cents),
+        'expense': from_cents(expense_cents),
+        'balance': from_cents(balance_cents),
+        'income_cents': income_cents,
+        'expense_cents': expense_cents,
+        'balance_cents': balance_cents,
+        'transactions_count': count
+    }
+
+
+def parse_series_range(args):
+    """Intervalo de meses de ``?from=YYYY-MM&to=YYYY-MM`` ou ``?year=``
+
+    Sem parâmetros, usa os 12 meses do ano corrente.
+    """
+    if args.get('from') or args.get('to'):
+        if args.get('year'):
+            raise ValueError('Use year ou from/to, não ambos')
+        if not (args.get('from') and args.get('to')):
+            raise ValueError('Parâmetros from e to devem ser informados juntos')
+        first = parse_year_month(args['from'], 'from')
+        last = parse_year_month(args['to'], 'to')
+    else:
+        year = parse_year(args.get('year'))
+        first, last = (year, 1), (year, 12)
+
+    months = month_index(*last) - month_index(*first) + 1
+    if months < 1:
+        raise ValueError('Parâmetro from deve ser anterior ou igual a to')
+    if months > MAX_SERIES_MONTHS:
+        raise ValueError(
+            f'Intervalo máximo de {MAX_SERIES_MONTHS} meses por consulta'
+        )
+    return first, last
+
+
+def monthly_totals_query(session, rollup_model, first, last):
+    """Totais por ano/mês lidos do rollup, somando as categorias
+
+    Lê O(meses × categorias) linhas pela chave primária do rollup, em vez
+    de percorrer as movimentações do período.
+    """
+    period = tuple_(rollup_model.year, rollup_model.month)
+    return session.query(
+        rollup_model.year,
+        rollup_model.month,
+        func.sum(rollup_model.income_cents).label('income_cents'),
+        func.sum(rollup_model.expense_cents).label('expense_cents'),
+        func.sum(rollup_model.transactions_count).label('transactions_count')
+    ).filter(
+        period >= tuple_(*first), period <= tuple_(*last)
+    ).group_by(rollup_model.year, rollup_model.month)
+
+
+def schedule_month_totals(session, finance_model, first, last):
+    """Totais por ano/mês das ocorrências de agendas virtuais
+
+    Só as ocorrências dentro do intervalo são geradas.
+    """
+    start, end = month_range(*first)[0], month_range(*last)[1]
+    schedules = schedules_in_range(
+        session.query(finance_model), finance_model, start, end
+    ).all()
+    totals = {}
+    for day, finance, _ in expand_schedules(schedules, start, end):
+        entry = totals.setdefault((day.year, day.month), [0, 0, 0])
+        entry[0] += max(finance.value_cents, 0)
+        entry[1] += max(-finance.value_cents, 0)
+        entry[2] += 1
+    return totals
+
+
+def monthly_series(session, rollup_model, finance_model, first, last):
+    """Totais mês a mês de ``first`` a ``last`` (``(ano, mês)``)
+
+    Soma o rollup das movimentações com as ocorrências das agendas
+    virtuais. Meses sem movimentação entram na série com zeros.
+    """
+    totals = schedule_month_totals(session, finance_model, first, last)
+    for row in monthly_totals_query(session, rollup_model, first, last):
+        entry = totals.setdefault((row.year, row.month), [0, 0, 0])
+        entry[0] += row.income_cents
+        entry[1] += row.expense_cents
+        entry[2] += row.transactions_count
+    return [
+        {
+            'year': year_month[0],
+            'month': year_month[1],
+            **totals_dict(*totals.get(year_month, (0, 0, 0)))
+        }
+        for year_month in iter_months(first, last)
+    ]
+
+
+def month_totals(session, rollup_model, finance_model, year, month):
+    """Receitas, despesas e quantidade de um mês"""
+    month_range(year, month)  # valida o mês
+    entry = monthly_series(
+        session, rollup_model, finance_model, (year, month), (year, month)
+    )[0]
+    del entry['year'], entry['month']
+    return entry
+
+
+def series_response(first, last, series):
+    """Resposta de ``/finances/summary`` com a série e o total do período"""
+    return {
+        'from': f'{first[0]:04d}-{first[1]:02d}',
+        'to': f'{last[0]:04d}-{last[1]:02d}',
+        'months': series,
+        'total': totals_dict(
+            sum(entry['income_cents'] for entry in series),
+            sum(entry['expense_cents'] for entry in series),
+            sum(entry['transactions_count'] for entry in series)
+        )
+    }
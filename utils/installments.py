@@ -0,0 +1,213 @@
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import aliased
+
+from utils.dates import add_months
+from utils.money import from_cents
+from utils.pagination import (
+    after_cursor, decode_cursor, encode_cursor, order_clauses, page_response,
+    parse_limit
+)
+from utils.recurrence import (
+    expand_schedules, occurrence_dict, schedules_in_range
+)
+from utils.rollup import apply_rollup_rows
+from utils.versioning import bump_table_version
+
+DEFAULT_UPCOMING_LIMIT = 10
+MAX_UPCOMING_LIMIT = 100
+
+
+def installment_schedule(first_date, total):
+    """``(número, data)`` das parcelas 2..total, mês a mês a partir da 1ª"""
+    return [
+        (number, add_months(first_date, number - 1))
+        for number in range(2, total + 1)
+    ]
+
+
+def installment_rows(parent, now=None):
+    """Valores das parcelas futuras de ``parent``, prontos para o INSERT"""
+    now = now or datetime.utcnow()
+    total = int(parent.installments_total)
+    return [
+        {
+            'title': f"{parent.title} - Parcela {number}/{total}",
+            'description': parent.description,
+            'value': parent.value,
+            'value_cents': parent.value_cents,
+            'transaction_date': transaction_date,
+            'created_at': now,
+            'updated_at': now,
+            'recurrence': 'INSTALLMENT',
+            'installments_total': total,
+            'installment_current': number,
+            'parent_finance_id': parent.id,
+            'category_id': parent.category_id,
+        }
+        for number, transaction_date in installment_schedule(
+            parent.transaction_date, total
+        )
+    ]
+
+
+def insert_installments(session, parent, version_model, rollup_model):
+    """Insere as parcelas futuras de ``parent`` em um único executemany
+
+    Roda na transação da sessão (sem commit): o chamador grava o pai e as
+    parcelas com um só commit, e uma falha desfaz o plano inteiro. O INSERT
+    pelo Core não dispara os eventos do mapper, então a versão da tabela
+    e o rollup mensal são atualizados aqui. Agendas virtuais
+    (``utils.recurrence``) não geram linhas.
+    """
+    if (
+        int(parent.installments_total or 1) <= 1
+        or parent.schedule_interval is not None
+    ):
+        return []
+
+    session.flush()  # garante parent.id
+    rows = installment_rows(parent)
+    table = type(parent).__table__
+    connection = session.connection()
+    connection.execute(table.insert(), rows)
+    bump_table_version(connection, version_model, table.name)
+    apply_rollup_rows(connection, rollup_model, rows)
+    return rows
+
+
+def upcoming_keys(model):
+    """Ordenação do feed de próximas parcelas: data e ``id`` (desempate)"""
+    return [(model.transaction_date, False), (model.id, False)]
+
+
+def parse_upcoming_args(args, model, today=None):
+    """``?limit=``, ``?cursor=`` e ``?horizon=YYYY-MM-DD`` (inclusivo)
+
+    Retorna ``(start, end, limit, cursor)``; ``end`` é exclusivo e
+    ``None`` sem horizonte.
+    """
+    today = today or date.today()
+    limit = parse_limit(
+        args.get('limit'), DEFAULT_UPCOMING_LIMIT, MAX_UPCOMING_LIMIT
+    )
+    end = None
+    if args.get('horizon'):
+        try:
+            horizon = datetime.strptime(args['horizon'], '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Parâmetro horizon deve estar no formato YYYY-MM-DD')
+        if horizon < today:
+            raise ValueError('Parâmetro horizon não pode ser anterior a hoje')
+        end = horizon + timedelta(days=1)
+    cursor = None
+    if args.get('cursor'):
+        cursor = decode_cursor(upcoming_keys(model), args['cursor'])
+    return today, end, limit, cursor
+
+
+def remaining_cents(model):
+    """Total do plano desta parcela em diante, na própria consulta
+
+    Subconsulta correlacionada pelas parcelas filhas do mesmo pai
+    (``ix_finance_parent_finance_id``) mais o próprio pai quando a linha é
+    a 1ª parcela, sem carregar ``parent_finance`` linha a linha.
+    """
+    child = aliased(model)
+    later = select(func.coalesce(func.sum(child.value_cents), 0)).where(
+        child.parent_finance_id == func.coalesce(
+            model.parent_finance_id, model.id
+        ),
+        child.installment_current >= model.installment_current
+    ).scalar_subquery()
+    return later + case(
+        (model.parent_finance_id.is_(None), model.value_cents), else_=0
+    )
+
+
+def upcoming_query(session, model, start, end=None, cursor=None):
+    """Parcelas gravadas a partir de ``start``, com o restante do plano
+
+    Servida por ``ix_finance_recurrence_transaction_date``: igualdade em
+    ``recurrence`` e faixa em ``transaction_date``, já na ordem do feed.
+    """
+    keys = upcoming_keys(model)
+    query = session.query(
+        model, remaining_cents(model).label('remaining_cents')
+    ).filter(
+        model.recurrence == 'INSTALLMENT',
+        model.transaction_date >= start,
+        model.schedule_interval.is_(None)
+    )
+    if end is not None:
+        query = query.filter(model.transaction_date < end)
+    if cursor is not None:
+        query = query.filter(after_cursor(keys, cursor))
+    return query.order_by(*order_clauses(keys))
+
+
+def _progress(finance, number, remaining):
+    current = number or finance.installment_current
+    total = finance.installments_total or 1
+    return {
+        'current': current,
+        'total': total,
+        'remaining_count': total - current + 1,
+        'remaining': from_cents(remaining),
+        'remaining_cents': remaining
+    }
+
+
+def upcoming_installments(session, model, start, end=None, cursor=None,
+                          limit=DEFAULT_UPCOMING_LIMIT):
+    """Página do feed de próximas parcelas, gravadas e virtuais
+
+    Cada item traz ``plan`` com o progresso (parcela k de n e total
+    restante). O cursor ``(data, id)`` vale para as duas origens: uma
+    agenda tem no máximo uma ocorrência por data. Um cursor emitido num
+    dia anterior não traz ocorrências antes de ``start``, como a consulta
+    das gravadas.
+    """
+    first = max(start, cursor[0]) if cursor else start
+    stored = (
+        (finance.transaction_date, finance.id, finance, None, remaining)
+        for finance, remaining in upcoming_query(
+            session, model, start, end, cursor
+        ).limit(limit + 1)
+    )
+    schedules = schedules_in_range(
+        session.query(model).filter(model.recurrence == 'INSTALLMENT'),
+        model, first, end
+    ).all()
+    virtual = (
+        (day, finance.id, finance, number,
+         finance.value_cents * (finance.installments_total - number + 1))
+        for day, finance, number in expand_schedules(
+            schedules, first, end
+        )
+        if cursor is None or (day, finance.id) > tuple(cursor)
+    )
+    page = list(islice(
+        heapq.merge(stored, virtual, key=lambda item: item[:2]), limit + 1
+    ))
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        day, finance_id = page[-1][:2]
+        next_cursor = encode_cursor(
+            upcoming_keys(model),
+            SimpleNamespace(transaction_date=day, id=finance_id)
+        )
+    items = [
+        dict(
+            occurrence_dict(finance, number, day),
+            plan=_progress(finance, number, remaining)
+        )
+        for day, _, finance, number, remaining in page
+    ]
+    return page_response(items, next_cursor, limit)
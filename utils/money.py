@@ -0,0 +1,49 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from sqlalchemy import event
+
+
+def to_cents(raw):
+    """Converte um valor em reais (número ou texto) para centavos inteiros
+
+    A conversão passa por ``Decimal`` do texto do valor, então ``10.1``
+    vira 1010 (e não 1009 como ``int(10.1 * 100)``). Frações de centavo
+    são arredondadas meio para cima.
+    """
+    if isinstance(raw, bool):
+        raise ValueError('Valor deve ser numérico')
+    try:
+        amount = Decimal(str(raw).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError('Valor deve ser numérico')
+    if not amount.is_finite():
+        raise ValueError('Valor deve ser numérico')
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Centavos inteiros para o número exibido pela API
+
+    ``cents / 100`` é o float mais próximo do decimal exato, e o JSON o
+    escreve com no máximo duas casas (1010 → 10.1).
+    """
+    return cents / 100
+
+
+def parse_money(raw):
+    """Valor recebido pela API, já arredondado para centavos"""
+    return from_cents(to_cents(raw))
+
+
+def track_cents(model):
+    """Mantém ``value_cents`` a partir de ``value`` a cada INSERT/UPDATE
+
+    ``value_cents`` é a coluna usada nas somas; ``value`` continua como
+    espelho em reais para os clientes existentes. Escritas em lote pelo
+    Core devem preencher as duas colunas.
+    """
+    def _sync(mapper, connection, target):
+        target.value_cents = to_cents(target.value)
+
+    event.listen(model, 'before_insert', _sync)
+    event.listen(model, 'before_update', _sync)
@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, tuple_
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+def wants_full_listing(args):
+    """Indica se o cliente pediu a listagem completa (sem paginação)
+
+    Mantido para o JS do kanban enquanto ele não consome páginas.
+    """
+    return args.get('all', '').lower() in ('1', 'true', 'yes')
+
+
+def parse_limit(raw, default=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT,
+                name='limit'):
+    """Converte o parâmetro ``limit`` em inteiro dentro dos limites"""
+    if raw in (None, ''):
+        return default
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f'Parâmetro {name} deve ser um número inteiro')
+    if limit < 1 or limit > maximum:
+        raise ValueError(f'Parâmetro {name} deve estar entre 1 e {maximum}')
+    return limit
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_token(payload):
+    """Serializa um dict como token opaco (base64 url-safe)"""
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Inverso de ``encode_token``; levanta ``ValueError`` se inválido"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+    if not isinstance(payload, dict):
+        raise ValueError('Cursor inválido')
+    return payload
+
+
+def encode_cursor(keys, row):
+    """Gera um cursor opaco a partir das colunas de ordenação da última linha"""
+    return encode_token({
+        'k': [column.key for column, _ in keys],
+        'v': [_encode_value(getattr(row, column.key)) for column, _ in keys],
+    })
+
+
+def decode_cursor(keys, token):
+    """Decodifica um cursor e valida que ele pertence à mesma ordenação"""
+    payload = decode_token(token)
+    try:
+        names, values = payload['k'], payload['v']
+    except KeyError:
+        raise ValueError('Cursor inválido')
+
+    if names != [column.key for column, _ in keys] or len(values) != len(keys):
+        raise ValueError('Cursor não corresponde à ordenação solicitada')
+
+    try:
+        return [
+            _decode_value(column, value)
+            for (column, _), value in zip(keys, values)
+        ]
+    except (TypeError, ValueError):
+        raise ValueError('Cursor inválido')
+
+
+def after_cursor(keys, values):
+    """Monta o predicado "linha vem depois do cursor" para a ordenação
+
+    Com todas as colunas na mesma direção usa row values
+    (``(a, b) > (x, y)``), que o SQLite resolve como uma faixa do índice
+    composto. Com direções mistas expande para
+    ``a > x OR (a = x AND b > y)``.
+    """
+    directions = {descending for _, descending in keys}
+    if len(keys) > 1 and len(directions) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        bound = tuple_(*values)
+        return columns < bound if directions.pop() else columns > bound
+
+    clauses = []
+    for position, (column, descending) in enumerate(keys):
+        value = values[position]
+        step = column < value if descending else column > value
+        equals = [
+            keys[i][0] == values[i] for i in range(position)
+        ]
+        clauses.append(and_(*equals, step) if equals else step)
+    return or_(*clauses)
+
+
+def order_clauses(keys):
+    """Converte ``(coluna, descendente)`` em cláusulas ORDER BY"""
+    return [
+        column.desc() if descending else column.asc()
+        for column, descending in keys
+    ]
+
+
+def keyset_paginate(query, keys, cursor=None, limit=DEFAULT_PAGE_LIMIT,
+                    session=None):
+    """Pagina uma consulta por keyset (cursor) em vez de OFFSET
+
+    ``keys`` é uma lista de ``(coluna, descendente)`` que precisa terminar
+    numa coluna única (normalmente o ``id``). O custo de cada página é
+    proporcional ao ``limit``, independentemente da profundidade.
+
+    ``query`` pode ser uma ``Query`` do ORM ou, informando ``session``,
+    um ``select()`` projetado do Core (linhas em vez de objetos).
+
+    Retorna ``(itens, next_cursor)``; ``next_cursor`` é ``None`` na
+    última página.
+    """
+    if cursor:
+        query = query.filter(after_cursor(keys, decode_cursor(keys, cursor)))
+
+    query = query.order_by(*order_clauses(keys)).limit(limit + 1)
+    rows = session.execute(query).all() if session else query.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(keys, rows[-1])
+    return rows, next_cursor
+
+
+def page_response(items, next_cursor, limit):
+    """Formato padrão de resposta paginada"""
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'limit': limit
+    }
@@ -0,0 +1,143 @@
+from datetime import datetime
+
+from sqlalchemy import String, case, cast, func, insert, literal, or_, select
+
+from utils.money import parse_money, to_cents
+from utils.rollup import rebuild_rollup
+from utils.versioning import bump_table_version
+
+# Campos que podem ser alterados no plano inteiro de uma vez
+PLAN_FIELDS = ('title', 'description', 'value', 'category_id')
+PLAN_SCOPES = ('all', 'onward')
+
+
+def parse_plan_scope(raw):
+    """``?scope=all`` (plano inteiro, padrão) ou ``onward`` (desta em diante)"""
+    scope = (raw or 'all').lower()
+    if scope not in PLAN_SCOPES:
+        raise ValueError(
+            f'Parâmetro scope deve ser um de: {", ".join(PLAN_SCOPES)}'
+        )
+    return scope
+
+
+def parse_plan_changes(data):
+    """Valida o corpo de ``PUT /finances/<id>/plan``"""
+    data = data or {}
+    if not isinstance(data, dict):
+        raise ValueError('Corpo da requisição deve ser um objeto JSON')
+    unknown = sorted(set(data) - set(PLAN_FIELDS))
+    if unknown:
+        raise ValueError(
+            f'Campos não suportados no plano: {", ".join(unknown)} '
+            f'(permitidos: {", ".join(PLAN_FIELDS)})'
+        )
+    changes = {name: data[name] for name in PLAN_FIELDS if name in data}
+    if not changes:
+        raise ValueError('Informe ao menos um campo para alterar')
+    if 'title' in changes and not changes['title']:
+        raise ValueError('Título não pode ser vazio')
+    if 'value' in changes:
+        changes['value'] = parse_money(changes['value'])
+    return changes
+
+
+def plan_filter(table, finance, scope):
+    """WHERE das parcelas do plano de ``finance`` (pai + filhas)
+
+    Servido pela chave primária (pai) e por ``ix_finance_parent_finance_id``
+    (parcelas).
+    """
+    root_id = finance.parent_finance_id or finance.id
+    condition = or_(table.c.id == root_id, table.c.parent_finance_id == root_id)
+    if scope == 'onward':
+        return condition & (
+            table.c.installment_current >= finance.installment_current
+        )
+    return condition
+
+
+def _check_scope(finance, scope):
+    if scope == 'onward' and finance.schedule_interval is not None:
+        raise ValueError(
+            'Agenda virtual não tem parcelas gravadas: altere a agenda com '
+            'PUT /finances/<id> (ex.: schedule_end)'
+        )
+
+
+def _affected_months(connection, table, where):
+    """Primeiro e último ``(ano, mês)`` das linhas afetadas"""
+    first, last = connection.execute(
+        select(func.min(table.c.transaction_date),
+               func.max(table.c.transaction_date)).where(where)
+    ).one()
+    if first is None:
+        return None
+    return (first.year, first.month), (last.year, last.month)
+
+
+def _refresh_rollup(connection, table, rollup_model, months):
+    if months is not None:
+        rebuild_rollup(connection, table, rollup_model.__table__, *months)
+
+
+def update_plan(session, finance, changes, scope, version_model, rollup_model):
+    """Aplica ``changes`` às parcelas do plano com um único UPDATE
+
+    O título mantém o sufixo " - Parcela i/N" de cada parcela. Roda na
+    transação da sessão (sem commit). O UPDATE pelo Core não dispara os
+    eventos do mapper, então versão da tabela e rollup mensal (meses
+    afetados) são atualizados aqui.
+    """
+    _check_scope(finance, scope)
+    table = type(finance).__table__
+    where = plan_filter(table, finance, scope)
+    values = dict(changes, updated_at=datetime.utcnow())
+    if 'value' in changes:
+        values['value_cents'] = to_cents(changes['value'])
+    if 'title' in changes:
+        suffix = (
+            ' - Parcela ' + cast(table.c.installment_current, String)
+            + '/' + cast(table.c.installments_total, String)
+        )
+        values['title'] = case(
+            (table.c.installment_current > 1,
+             literal(changes['title']) + suffix),
+            else_=changes['title']
+        )
+
+    connection = session.connection()
+    months = _affected_months(connection, table, where)
+    count = connection.execute(
+        table.update().where(where).values(values)
+    ).rowcount
+    bump_table_version(connection, version_model, table.name)
+    if 'value' in changes or 'category_id' in changes:
+        _refresh_rollup(connection, table, rollup_model, months)
+    session.expire_all()
+    return count
+
+
+def delete_plan(session, finance, scope, version_model, rollup_model, log_model):
+    """Apaga as parcelas do plano com um único DELETE
+
+    Os tombstones de ``/finances/changes`` entram antes, com um
+    ``INSERT ... SELECT`` sobre o mesmo filtro; versão da tabela e rollup
+    mensal são atualizados na mesma transação (sem commit).
+    """
+    _check_scope(finance, scope)
+    table = type(finance).__table__
+    where = plan_filter(table, finance, scope)
+
+    connection = session.connection()
+    months = _affected_months(connection, table, where)
+    connection.execute(insert(log_model.__table__).from_select(
+        ['table_name', 'record_id', 'deleted_at'],
+        select(literal(table.name), table.c.id, literal(datetime.utcnow()))
+        .where(where)
+    ))
+    count = connection.execute(table.delete().where(where)).rowcount
+    bump_table_version(connection, version_model, table.name)
+    _refresh_rollup(connection, table, rollup_model, months)
+    session.expire_all()
+    return count
@@ -0,0 +1,133 @@
+import heapq
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from utils.dates import add_months, month_index
+
+# Meses entre ocorrências de cada tipo de recorrência agendada
+SCHEDULE_INTERVALS = {
+    'MONTHLY': 1,
+    'YEARLY': 12,
+    'INSTALLMENT': 1,
+}
+
+
+def wants_virtual(data):
+    """``"virtual": true`` no corpo: grava a recorrência como agenda"""
+    return str(data.get('virtual', '')).lower() in ('1', 'true', 'yes')
+
+
+def configure_schedule(finance, end=None):
+    """Transforma ``finance`` em agenda virtual (uma linha por plano)
+
+    A agenda é ``transaction_date`` (início), ``schedule_interval`` (meses
+    entre ocorrências) e ``schedule_end`` (data da última ocorrência).
+    Parcelamentos terminam na parcela ``installments_total``; recorrências
+    mensais/anuais terminam em ``end`` ou não terminam (``None``).
+    """
+    interval = SCHEDULE_INTERVALS.get(finance.recurrence)
+    if interval is None:
+        raise ValueError(
+            'Movimentação virtual exige recorrência '
+            f'{", ".join(SCHEDULE_INTERVALS)}'
+        )
+    if isinstance(end, str):
+        end = datetime.strptime(end, '%Y-%m-%d').date()
+
+    finance.schedule_interval = interval
+    finance.installment_current = 1
+    if finance.recurrence == 'INSTALLMENT':
+        total = int(finance.installments_total or 1)
+        if total < 1:
+            raise ValueError('Parcelamento deve ter ao menos 1 parcela')
+        end = add_months(finance.transaction_date, (total - 1) * interval)
+    elif end is not None and end < finance.transaction_date:
+        raise ValueError('Fim da recorrência anterior à data inicial')
+    finance.schedule_end = end
+
+
+def iter_occurrences(finance, start=None, end=None):
+    """Gera ``(número, data)`` das ocorrências em ``[start, end)``
+
+    Pula direto para o primeiro intervalo que alcança ``start`` (sem
+    percorrer as ocorrências anteriores) e para em ``end``, no fim da
+    agenda ou, sem nenhum dos dois, nunca: consuma com ``islice``.
+    """
+    first = finance.transaction_date
+    interval = finance.schedule_interval
+    index = 0
+    if start is not None and start > first:
+        index = (month_index(start.year, start.month)
+                 - month_index(first.year, first.month)) // interval
+    while True:
+        day = add_months(first, index * interval)
+        if finance.schedule_end is not None and day > finance.schedule_end:
+            return
+        if end is not None and day >= end:
+            return
+        if start is None or day >= start:
+            yield index + 1, day
+        index += 1
+
+
+def occurrence_title(finance, number):
+    """Título da ocorrência, no mesmo formato das parcelas gravadas"""
+    if finance.recurrence == 'INSTALLMENT' and number > 1:
+        return f"{finance.title} - Parcela {number}/{finance.installments_total}"
+    return finance.title
+
+
+def occurrence_dict(finance, number, day):
+    """``finance.to_dict()`` de uma ocorrência (``number=None``: a própria linha)"""
+    data = finance.to_dict()
+    if number is None:
+        return data
+    data['title'] = occurrence_title(finance, number)
+    data['transaction_date'] = day.isoformat()
+    data['installment_current'] = number
+    data['virtual'] = True
+    return data
+
+
+def schedules_in_range(query, model, start=None, end=None):
+    """Filtra as agendas com alguma ocorrência possível em ``[start, end)``"""
+    query = query.filter(model.schedule_interval.isnot(None))
+    if end is not None:
+        query = query.filter(model.transaction_date < end)
+    if start is not None:
+        query = query.filter(or_(
+            model.schedule_end.is_(None), model.schedule_end >= start
+        ))
+    return query
+
+
+def merge_occurrences(rows, schedules, start=None, end=None):
+    """Intercala movimentações gravadas com as ocorrências das agendas
+
+    ``rows`` deve vir ordenado por ``transaction_date``. Gera
+    ``(data, finance, número)``, com ``número = None`` para as linhas
+    gravadas.
+    """
+    return heapq.merge(
+        ((finance.transaction_date, finance, None) for finance in rows),
+        expand_schedules(schedules, start, end),
+        key=lambda occurrence: occurrence[0]
+    )
+
+
+def expand_schedules(schedules, start=None, end=None):
+    """Ocorrências de várias agendas em ordem de data
+
+    Gera ``(data, finance, número)``; ``heapq.merge`` intercala os
+    geradores de cada agenda sem expandi-los por inteiro.
+    """
+    return heapq.merge(
+        *(_tagged(finance, start, end) for finance in schedules),
+        key=lambda occurrence: occurrence[0]
+    )
+
+
+def _tagged(finance, start, end):
+    for number, day in iter_occurrences(finance, start, end):
+        yield day, finance, number
@@ -0,0 +1,212 @@
+from sqlalchemy import (
+    and_, case, delete, event, extract, func, insert, select, tuple_
+)
+from sqlalchemy.orm.attributes import get_history
+
+from utils.dates import month_range
+
+# Movimentações sem categoria entram na chave com category_id = 0: NULL não
+# pode fazer parte da chave primária nem casa com ``=`` no UPDATE.
+UNCATEGORIZED = 0
+
+# Valores em centavos inteiros: somas e incrementos são exatos
+ROLLUP_FIELDS = ('income_cents', 'expense_cents', 'transactions_count')
+
+
+def _split(cents):
+    """Receita e despesa (centavos) correspondentes a um valor"""
+    return (cents, 0) if cents > 0 else (0, -cents)
+
+
+def _apply(connection, table, key, income, expense, count):
+    year, month, category_id = key
+    where = and_(
+        table.c.year == year,
+        table.c.month == month,
+        table.c.category_id == category_id
+    )
+    result = connection.execute(
+        table.update().where(where).values(
+            income_cents=table.c.income_cents + income,
+            expense_cents=table.c.expense_cents + expense,
+            transactions_count=table.c.transactions_count + count
+        )
+    )
+    if result.rowcount == 0 and count > 0:
+        connection.execute(table.insert().values(
+            year=year, month=month, category_id=category_id,
+            income_cents=income, expense_cents=expense,
+            transactions_count=count
+        ))
+    elif count < 0:
+        connection.execute(
+            table.delete().where(where, table.c.transactions_count <= 0)
+        )
+
+
+def apply_rollup_delta(connection, rollup_model, key, cents, count):
+    """Soma uma movimentação (``count=1``) ou a retira (``count=-1``)
+
+    ``key`` é ``(ano, mês, category_id)``. Roda na conexão do flush, ou
+    seja, na mesma transação da escrita em ``finance``. Linhas que ficam
+    sem movimentações são removidas.
+    """
+    income, expense = _split(cents)
+    _apply(
+        connection, rollup_model.__table__, key,
+        income * count, expense * count, count
+    )
+
+
+def apply_rollup_rows(connection, rollup_model, rows):
+    """Soma ao rollup linhas inseridas em lote pelo Core
+
+    ``rows`` são os dicionários passados ao INSERT (com
+    ``transaction_date``, ``category_id`` e ``value_cents``). As linhas são
+    agrupadas por chave antes, então cada mês/categoria recebe um único
+    UPDATE.
+    """
+    deltas = {}
+    for row in rows:
+        key = rollup_key(row['transaction_date'], row.get('category_id'))
+        income, expense = _split(row['value_cents'])
+        total = deltas.setdefault(key, [0, 0, 0])
+        total[0] += income
+        total[1] += expense
+        total[2] += 1
+    for key, (income, expense, count) in deltas.items():
+        _apply(connection, rollup_model.__table__, key, income, expense, count)
+
+
+def rollup_key(transaction_date, category_id):
+    return (
+        transaction_date.year,
+        transaction_date.month,
+        category_id or UNCATEGORIZED
+    )
+
+
+def _committed(target, name):
+    """Valor da coluna como está no banco (antes do flush corrente)"""
+    history = get_history(target, name)
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, name)
+
+
+def track_rollup(model, rollup_model):
+    """Mantém ``rollup_model`` a cada INSERT/UPDATE/DELETE de ``model``
+
+    Escritas em lote pelo Core não disparam eventos do mapper e devem
+    chamar ``apply_rollup_delta`` ou ``rebuild_rollup`` diretamente.
+    """
+    def _entry(target, read):
+        # Agendas virtuais não são movimentações: as ocorrências são
+        # somadas na consulta (utils.recurrence)
+        if read(target, 'schedule_interval') is not None:
+            return None
+        return (
+            rollup_key(
+                read(target, 'transaction_date'), read(target, 'category_id')
+            ),
+            read(target, 'value_cents')
+        )
+
+    def _insert(mapper, connection, target):
+        new = _entry(target, getattr)
+        if new:
+            apply_rollup_delta(connection, rollup_model, *new, 1)
+
+    def _update(mapper, connection, target):
+        old = _entry(target, _committed)
+        new = _entry(target, getattr)
+        if old == new:
+            return
+        if old:
+            apply_rollup_delta(connection, rollup_model, *old, -1)
+        if new:
+            apply_rollup_delta(connection, rollup_model, *new, 1)
+
+    def _delete(mapper, connection, target):
+        old = _entry(target, _committed)
+        if old:
+            apply_rollup_delta(connection, rollup_model, *old, -1)
+
+    event.listen(model, 'after_insert', _insert)
+    event.listen(model, 'after_update', _update)
+    event.listen(model, 'after_delete', _delete)
+
+
+def _aggregate(finance_table):
+    """SELECT agrupado por (ano, mês, categoria) direto de ``finance``
+
+    Agendas virtuais ficam de fora, como em ``track_rollup``.
+    """
+    year = extract('year', finance_table.c.transaction_date)
+    month = extract('month', finance_table.c.transaction_date)
+    category_id = func.coalesce(finance_table.c.category_id, UNCATEGORIZED)
+    value = finance_table.c.value_cents
+    return select(
+        year.label('year'),
+        month.label('month'),
+        category_id.label('category_id'),
+        func.sum(case((value > 0, value), else_=0)).label('income_cents'),
+        func.sum(case((value < 0, -value), else_=0)).label('expense_cents'),
+        func.count().label('transactions_count')
+    ).where(
+        finance_table.c.schedule_interval.is_(None)
+    ).group_by(year, month, category_id)
+
+
+def _month_filter(columns, first, last):
+    return and_(
+        tuple_(columns.year, columns.month) >= tuple_(*first),
+        tuple_(columns.year, columns.month) <= tuple_(*last)
+    )
+
+
+def rebuild_rollup(connection, finance_table, rollup_table,
+                   first=None, last=None):
+    """Recalcula o rollup a partir de ``finance``
+
+    Sem ``first``/``last`` (``(ano, mês)``) refaz a tabela inteira; com
+    eles, só os meses do intervalo (usado após escritas em lote).
+    """
+    statement = _aggregate(finance_table)
+    cleanup = delete(rollup_table)
+    if first is not None:
+        statement = statement.where(
+            finance_table.c.transaction_date >= month_range(*first)[0],
+            finance_table.c.transaction_date < month_range(*last)[1]
+        )
+        cleanup = cleanup.where(_month_filter(rollup_table.c, first, last))
+
+    connection.execute(cleanup)
+    connection.execute(insert(rollup_table).from_select(
+        ['year', 'month', 'category_id', *ROLLUP_FIELDS], statement
+    ))
+
+
+def check_rollup(connection, finance_table, rollup_table):
+    """Compara o rollup com a soma direta de ``finance``
+
+    Retorna a lista de divergências ``(chave, esperado, armazenado)``;
+    lista vazia significa rollup consistente.
+    """
+    def by_key(rows):
+        return {
+            (int(row.year), int(row.month), int(row.category_id)): tuple(
+                getattr(row, field) for field in ROLLUP_FIELDS
+            )
+            for row in rows
+        }
+
+    expected = by_key(connection.execute(_aggregate(finance_table)))
+    stored = by_key(connection.execute(select(rollup_table)))
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want = expected.get(key, (0, 0, 0))
+        have = stored.get(key, (0, 0, 0))
+        if want != have:
+            mismatches.append((key, want, have))
+    return mismatches
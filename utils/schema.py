@@ -0,0 +1,124 @@
+from sqlalchemy import inspect, text
+
+from utils.rollup import rebuild_rollup
+
+# Preenchimento de colunas adicionadas depois que a tabela já existia.
+# Executado uma única vez, logo após o ALTER TABLE da coluna.
+BACKFILLS = {
+    ('finance', 'updated_at'): 'UPDATE finance SET updated_at = created_at',
+    ('finance', 'value_cents'): (
+        'UPDATE finance SET value_cents = CAST(ROUND(value * 100) AS INTEGER)'
+    ),
+    # Anexos antigos entram na fila do pós-processamento
+    ('attachment', 'status'): "UPDATE attachment SET status = 'pending'",
+    ('attachment', 'status_changed_at'): (
+        'UPDATE attachment SET status_changed_at = created_at'
+    ),
+}
+
+# Preenchimento de tabelas derivadas criadas em um banco que já tinha dados.
+# Cada função recebe a conexão e o ``MetaData`` dos modelos. Como o
+# conteúdo vem de outras tabelas, uma tabela derivada com colunas
+# diferentes do modelo é recriada em vez de alterada.
+TABLE_BACKFILLS = {
+    'finance_monthly_rollup': lambda connection, metadata: rebuild_rollup(
+        connection,
+        metadata.tables['finance'],
+        metadata.tables['finance_monthly_rollup']
+    ),
+}
+
+
+def add_missing_columns(db):
+    """Adiciona colunas declaradas nos modelos que faltam no banco
+
+    ``db.create_all()`` não altera tabelas existentes. Colunas novas
+    entram com ``ALTER TABLE ... ADD COLUMN`` (sempre anuláveis no
+    SQLite) e recebem o preenchimento definido em ``BACKFILLS``.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {
+                column['name'] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(
+                    f'ALTER TABLE {table.name} '
+                    f'ADD COLUMN {column.name} {column_type}'
+                ))
+                backfill = BACKFILLS.get((table.name, column.name))
+                if backfill:
+                    connection.execute(text(backfill))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def ensure_indexes(db):
+    """Cria os índices declarados nos modelos que ainda não existem no banco
+
+    ``db.create_all()`` só cria índices junto com tabelas novas; bancos já
+    existentes precisam deste passo para receber índices adicionados
+    depois.
+    """
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {item['name'] for item in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+
+def drop_stale_derived_tables(db):
+    """Apaga tabelas de ``TABLE_BACKFILLS`` cujas colunas mudaram no modelo"""
+    inspector = inspect(db.engine)
+    existing = set(inspector.get_table_names())
+    dropped = []
+    for name in TABLE_BACKFILLS:
+        if name not in existing:
+            continue
+        columns = {column['name'] for column in inspector.get_columns(name)}
+        if columns != set(db.metadata.tables[name].columns.keys()):
+            db.metadata.tables[name].drop(bind=db.engine)
+            dropped.append(name)
+    return dropped
+
+
+def backfill_tables(db, created):
+    """Preenche as tabelas derivadas recém-criadas (``TABLE_BACKFILLS``)"""
+    with db.engine.begin() as connection:
+        for name in created:
+            backfill = TABLE_BACKFILLS.get(name)
+            if backfill:
+                backfill(connection, db.metadata)
+
+
+def upgrade_schema(db):
+    """Aplica as alterações de esquema pendentes em um banco existente
+
+    Retorna a lista de tabelas, colunas e índices criados. Em um banco
+    vazio só executa ``db.create_all()`` e retorna lista vazia.
+    """
+    existing = set(inspect(db.engine).get_table_names())
+    if not existing:
+        db.create_all()
+        return []
+
+    existing -= set(drop_stale_derived_tables(db))
+    db.create_all()
+
+    created = [
+        table.name for table in db.metadata.sorted_tables
+        if table.name not in existing
+    ]
+    changes = created + add_missing_columns(db) + ensure_indexes(db)
+    # Depois das colunas: o preenchimento pode depender delas
+    backfill_tables(db, created)
+    return changes
@@ -0,0 +1,88 @@
+from datetime import date
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # opcional: acelera a serialização quando instalado
+except ImportError:
+    orjson = None
+
+# Colunas projetadas pelo caminho rápido (mesmas chaves do to_dict)
+TASK_FIELDS = (
+    'id', 'title', 'description', 'status', 'priority', 'type',
+    'created_at', 'updated_at', 'due_date', 'created_by', 'assigned_to',
+    'tags', 'category_id'
+)
+
+FINANCE_FIELDS = (
+    'id', 'title', 'description', 'value', 'value_cents', 'transaction_date',
+    'created_at',
+    'updated_at', 'recurrence', 'installments_total', 'installment_current',
+    'parent_finance_id', 'category_id', 'schedule_interval', 'schedule_end'
+)
+
+
+def json_default(value):
+    # Datas no mesmo formato ISO usado pelos to_dict() dos modelos
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON que usa orjson quando disponível
+
+    Sem orjson, cai no ``json`` da biblioteca padrão com o mesmo formato
+    de datas. Registrado com ``app.json = FastJSONProvider(app)``.
+    """
+
+    default = staticmethod(json_default)
+
+    def dumps_bytes(self, obj):
+        """Serializa direto para bytes (sem passar por ``str``)"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=self.default)
+        return self.dumps(obj, separators=(',', ':')).encode()
+
+    def response(self, *args, **kwargs):
+        pretty = (
+            (self.compact is None and self._app.debug)
+            or self.compact is False
+        )
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj), mimetype=self.mimetype
+        )
+
+
+def wants_fast_path(args):
+    """Indica se o cliente optou pelo caminho rápido (``?fast=true``)"""
+    return args.get('fast', '').lower() in ('1', 'true', 'yes')
+
+
+def project(model, fields):
+    """Colunas do modelo para um ``select()`` projetado"""
+    return [getattr(model, field) for field in fields]
+
+
+def rows_to_dicts(rows, fields):
+    """Converte tuplas de linha em dicts sem hidratar objetos do ORM"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def row_serializer(fields):
+    """Função que converte uma linha em dict (usada no streaming)"""
+    return lambda row: dict(zip(fields, row))
+
+
+def json_bytes_response(payload):
+    """Resposta JSON gerada pelo provider da aplicação, já em bytes"""
+    provider = current_app.json
+    if isinstance(provider, FastJSONProvider):
+        body = provider.dumps_bytes(payload)
+    else:
+        body = provider.dumps(payload, default=json_default)
+    return current_app.response_class(body, mimetype='application/json')
@@ -0,0 +1,365 @@
+import codecs
+import csv
+import hashlib
+import html
+import io
+import re
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select
+
+from utils.money import from_cents, to_cents
+from utils.pagination import parse_limit
+from utils.rollup import apply_rollup_rows
+from utils.versioning import bump_table_version
+
+IMPORT_FORMATS = ('csv', 'ofx')
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+# Erros listados no relatório; acima disso só a contagem
+MAX_REPORTED_ERRORS = 1000
+# Bloco lido por vez dos arquivos OFX; o cabeçalho (CHARSET) cabe no 1º
+OFX_CHUNK_SIZE = 64 * 1024
+OFX_HEADER_SIZE = 4096
+
+# Cabeçalhos aceitos no CSV para cada campo (comparados em minúsculas)
+CSV_COLUMNS = {
+    'transaction_date': ('transaction_date', 'date', 'data'),
+    'title': (
+        'title', 'titulo', 'título', 'descricao', 'descrição', 'historico',
+        'histórico', 'lançamento', 'lancamento'
+    ),
+    'value': ('value', 'valor', 'amount'),
+    'description': ('description', 'observacao', 'observação', 'detalhes'),
+    'category': ('category', 'category_id', 'categoria'),
+}
+REQUIRED_COLUMNS = ('transaction_date', 'title', 'value')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+OFX_CHARSET = re.compile(rb'CHARSET:\s*(\d+)|encoding="([^"]+)"', re.IGNORECASE)
+
+
+def parse_import_args(args, filename=None):
+    """Formato (``?format=`` ou extensão do arquivo) e ``?batch_size=``"""
+    import_format = (args.get('format') or '').lower()
+    if not import_format and filename and '.' in filename:
+        import_format = filename.rsplit('.', 1)[1].lower()
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(
+            f'Formato deve ser um de: {", ".join(IMPORT_FORMATS)} '
+            '(informe ?format= ou use a extensão do arquivo)'
+        )
+    batch_size = parse_limit(
+        args.get('batch_size'), DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE,
+        name='batch_size'
+    )
+    return import_format, batch_size
+
+
+def parse_amount(raw):
+    """Valor de extrato em centavos: ``-1234.56``, ``1.234,56``, ``R$ 10,00``
+
+    Mais de duas casas decimais é erro da linha, não arredondamento:
+    ``1.234`` tanto pode ser R$ 1,23 quanto R$ 1.234 com separador de
+    milhar.
+    """
+    text = str(raw or '').replace('R$', '').replace(' ', '').strip()
+    if not text:
+        raise ValueError('Valor é obrigatório')
+    if ',' in text and '.' in text:
+        # O separador que aparece por último é o decimal
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        text = text.replace(',', '.')
+    if '.' in text and len(text.rsplit('.', 1)[1]) > 2:
+        raise ValueError(
+            f'Valor ambíguo: {str(raw).strip()} (use no máximo duas casas '
+            'decimais, ex.: 1234.00 ou 1.234,00)'
+        )
+    return to_cents(text)
+
+
+def parse_statement_date(raw):
+    text = str(raw or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError('Data deve estar no formato YYYY-MM-DD ou DD/MM/YYYY')
+
+
+def category_lookup(session, category_model):
+    """Categorias por id e por nome (sem diferenciar maiúsculas)"""
+    lookup = {}
+    for category in session.query(category_model.id, category_model.name):
+        lookup[str(category.id)] = category.id
+        lookup[category.name.strip().lower()] = category.id
+    return lookup
+
+
+def finance_row(fields, categories):
+    """Valida um registro do extrato e monta a linha do INSERT
+
+    ``created_at``/``updated_at`` ficam para ``_insert_batch``, no momento
+    em que o lote é gravado.
+    """
+    title = (fields.get('title') or '').strip()
+    if not title:
+        raise ValueError('Título é obrigatório')
+    cents = parse_amount(fields.get('value'))
+    transaction_date = parse_statement_date(fields.get('transaction_date'))
+
+    category_id = None
+    category = (fields.get('category') or '').strip()
+    if category:
+        category_id = categories.get(category.lower())
+        if category_id is None:
+            raise ValueError(f'Categoria não encontrada: {category}')
+
+    return {
+        'title': title[:255],
+        'description': (fields.get('description') or '').strip() or None,
+        'value': from_cents(cents),
+        'value_cents': cents,
+        'transaction_date': transaction_date,
+        'recurrence': 'NONE',
+        'installments_total': 1,
+        'installment_current': 1,
+        'parent_finance_id': None,
+        'category_id': category_id,
+    }
+
+
+def import_key(fields, row, seen):
+    """Chave da transação para não importar o mesmo extrato duas vezes
+
+    OFX: o ``FITID`` do banco, junto com a conta. CSV (ou OFX sem FITID):
+    data, valor e título, mais quantas vezes a mesma combinação já
+    apareceu no arquivo (``seen``), para que duas compras iguais no mesmo
+    dia continuem sendo duas. Reimportar o arquivo, ou um período
+    sobreposto, gera as mesmas chaves.
+    """
+    fitid = (fields.get('fitid') or '').strip()
+    if fitid:
+        basis = f'ofx|{fitid}'
+    else:
+        basis = '|'.join((
+            row['transaction_date'].isoformat(), str(row['value_cents']),
+            row['title'].lower()
+        ))
+        occurrence = seen[basis]
+        seen[basis] += 1
+        basis = f'{basis}|{occurrence}'
+    return hashlib.sha256(basis.encode('utf-8')).hexdigest()
+
+
+def _csv_header(header_line):
+    """Delimitador (``;`` ou ``,``) e posição de cada campo no cabeçalho"""
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    names = next(csv.reader([header_line], delimiter=delimiter), [])
+    aliases = {
+        alias: field for field, options in CSV_COLUMNS.items()
+        for alias in options
+    }
+    positions = {}
+    for position, name in enumerate(names):
+        field = aliases.get(name.strip().lower())
+        if field is not None and field not in positions:
+            positions[field] = position
+    missing = [field for field in REQUIRED_COLUMNS if field not in positions]
+    if missing:
+        raise ValueError(
+            f'Colunas obrigatórias ausentes no CSV: {", ".join(missing)}'
+        )
+    return delimiter, positions
+
+
+def csv_records(stream, encoding='utf-8-sig'):
+    """Gera ``(linha, campos)`` de um CSV, uma linha por vez
+
+    O cabeçalho é validado já na chamada (erro de arquivo, não de linha).
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, errors='replace',
+                            newline='')
+    delimiter, positions = _csv_header(text.readline())
+
+    def records():
+        reader = csv.reader(text, delimiter=delimiter)
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield reader.line_num + 1, {
+                field: row[position] if position < len(row) else ''
+                for field, position in positions.items()
+            }
+
+    return records()
+
+
+def _ofx_encoding(head):
+    match = OFX_CHARSET.search(head)
+    if match is None:
+        return 'utf-8'
+    encoding = (
+        f'cp{match.group(1).decode()}' if match.group(1)
+        else match.group(2).decode()
+    )
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+
+
+def _ofx_record(tags, account):
+    fitid = tags.get('FITID', '').strip()
+    name = html.unescape(tags.get('NAME', '')).strip()
+    memo = html.unescape(tags.get('MEMO', '')).strip()
+    posted = tags.get('DTPOSTED', '').strip()[:8]
+    try:
+        posted = datetime.strptime(posted, '%Y%m%d').date().isoformat()
+    except ValueError:
+        pass
+    return {
+        'title': name or memo,
+        'description': memo if name and memo != name else '',
+        'value': tags.get('TRNAMT', ''),
+        'transaction_date': posted,
+        'fitid': f'{account}:{fitid}' if fitid else '',
+    }
+
+
+def ofx_records(stream, chunk_size=OFX_CHUNK_SIZE):
+    """Gera ``(linha, campos)`` de cada ``<STMTTRN>`` de um OFX
+
+    Lê o arquivo em blocos e processa só as tags completas de cada bloco,
+    então funciona com OFX SGML (tags sem fechamento) e XML, em uma linha
+    ou em várias. ``linha`` é onde a transação começa. O ``ACCTID`` da
+    conta acompanha o ``FITID`` de cada transação.
+    """
+    head = stream.read(max(chunk_size, OFX_HEADER_SIZE))
+    decoder = codecs.getincrementaldecoder(_ofx_encoding(head))('replace')
+    buffer, line, tags, start = decoder.decode(head), 1, None, None
+    account = ''
+    done = not head
+
+    while True:
+        if not done:
+            chunk = stream.read(chunk_size)
+            done = not chunk
+            buffer += decoder.decode(chunk, final=done)
+        # Só até o último "<": a tag seguinte pode estar incompleta
+        cut = len(buffer) if done else buffer.rfind('<')
+        position = 0
+        for match in OFX_TAG.finditer(buffer, 0, max(cut, 0)):
+            line += buffer.count('\n', position, match.start())
+            position = match.start()
+            closing, tag, value = match.groups()
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and tags is not None:
+                    yield start, _ofx_record(tags, account)
+                tags, start = (None, None) if closing else ({}, line)
+            elif tags is not None and not closing:
+                tags[tag] = value
+            elif tag == 'ACCTID' and not closing:
+                account = value.strip()
+        if done:
+            return
+        line += buffer.count('\n', position, max(cut, 0))
+        buffer = buffer[max(cut, 0):]
+
+
+def statement_records(stream, import_format, encoding=None):
+    if import_format == 'ofx':
+        return ofx_records(stream)
+    return csv_records(stream, encoding or 'utf-8-sig')
+
+
+def _new_rows(connection, table, rows):
+    """Linhas cujo ``import_key`` não está no banco nem repetido no lote"""
+    keys = {row['import_key'] for row in rows}
+    existing = set(connection.execute(
+        select(table.c.import_key).where(table.c.import_key.in_(keys))
+    ).scalars())
+    fresh = {}
+    for row in rows:
+        if row['import_key'] not in existing:
+            fresh.setdefault(row['import_key'], row)
+    return list(fresh.values())
+
+
+def _insert_batch(session, table, version_model, rollup_model, rows):
+    """Um lote: INSERT executemany, versão da tabela e rollup, um commit
+
+    Transações já importadas (mesmo ``import_key``, pelo índice único)
+    ficam de fora; retorna quantas linhas entraram. O horário é tomado
+    por lote, logo antes do INSERT: numa importação longa, as linhas de
+    um lote não ficam com ``updated_at`` anterior a lotes já commitados
+    (o que as esconderia do ``/changes?since=``).
+    """
+    connection = session.connection()
+    rows = _new_rows(connection, table, rows)
+    if not rows:
+        session.commit()
+        return 0
+    now = datetime.utcnow()
+    for row in rows:
+        row['created_at'] = row['updated_at'] = now
+    connection.execute(table.insert(), rows)
+    bump_table_version(connection, version_model, table.name)
+    apply_rollup_rows(connection, rollup_model, rows)
+    session.commit()
+    return len(rows)
+
+
+def import_statement(session, finance_model, category_model, version_model,
+                     rollup_model, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Valida ``records`` e insere as linhas válidas em lotes
+
+    Cada lote de ``batch_size`` linhas é uma transação (INSERT pelo Core
+    com executemany); versão da tabela e rollup mensal são atualizados no
+    mesmo lote, como em ``utils.installments``. Linhas inválidas não
+    interrompem a importação: entram no relatório com o número da linha.
+    Transações já importadas antes (``import_key``) são puladas e só
+    contadas em ``duplicates``.
+    """
+    categories = category_lookup(session, category_model)
+    table = finance_model.__table__
+    batch, errors, seen = [], [], Counter()
+    read = imported = batches = error_count = 0
+
+    for line, fields in records:
+        try:
+            row = finance_row(fields, categories)
+            row['import_key'] = import_key(fields, row, seen)
+            batch.append(row)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line, 'message': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            imported += _insert_batch(
+                session, table, version_model, rollup_model, batch
+            )
+            read, batches, batch = read + len(batch), batches + 1, []
+
+    if batch:
+        imported += _insert_batch(
+            session, table, version_model, rollup_model, batch
+        )
+        read, batches = read + len(batch), batches + 1
+
+    return {
+        'imported': imported,
+        'duplicates': read - imported,
+        'batches': batches,
+        'errors_count': error_count,
+        'errors': errors
+    }
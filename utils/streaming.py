@@ -0,0 +1,62 @@
+from flask import current_app, stream_with_context
+
+from utils.serialization import FastJSONProvider, json_default
+
+STREAM_BATCH_SIZE = 1000
+
+
+def wants_stream(args):
+    """Indica se o cliente pediu a resposta em streaming (``?stream=true``)"""
+    return args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def _encoder():
+    provider = current_app.json
+    if isinstance(provider, FastJSONProvider):
+        return provider.dumps_bytes
+    return lambda obj: provider.dumps(
+        obj, default=json_default, separators=(',', ':')
+    ).encode()
+
+
+def iter_json_array(items, serialize, batch_size=STREAM_BATCH_SIZE):
+    """Gera um array JSON em pedaços, um lote de itens por vez
+
+    ``items`` é consumido de forma preguiçosa (``yield_per``), então a
+    memória fica limitada ao tamanho do lote, não ao do resultado.
+    """
+    encode = _encoder()
+    yield b'['
+    separator = b''
+    batch = []
+    for item in items:
+        batch.append(encode(serialize(item)))
+        if len(batch) >= batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
+
+
+def stream_query(query, serialize, batch_size=STREAM_BATCH_SIZE):
+    """Resposta em streaming para uma ``Query`` do ORM"""
+    return _stream(query.yield_per(batch_size), serialize, batch_size)
+
+
+def stream_select(session, statement, serialize, batch_size=STREAM_BATCH_SIZE):
+    """Resposta em streaming para um ``select()`` projetado"""
+    rows = session.execute(
+        statement.execution_options(yield_per=batch_size)
+    )
+    return _stream(rows, serialize, batch_size)
+
+
+def _stream(items, serialize, batch_size):
+    # Erros no meio do envio não podem mais trocar o status da resposta;
+    # a validação dos parâmetros acontece antes de chegar aqui
+    return current_app.response_class(
+        stream_with_context(iter_json_array(items, serialize, batch_size)),
+        mimetype='application/json'
+    )
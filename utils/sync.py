@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from utils.pagination import (
+    after_cursor, decode_token, encode_token, order_clauses
+)
+
+# Mudanças mais recentes que isso ainda não entram no token: uma transação
+# que gravou updated_at mas não fez commit poderia ficar para trás do
+# cursor. O cliente recebe a mudança no próximo poll.
+SYNC_LAG = timedelta(seconds=2)
+
+
+def track_deletions(model, log_model):
+    """Registra um tombstone em ``log_model`` a cada DELETE de ``model``
+
+    O INSERT roda na mesma conexão (e transação) do DELETE.
+    """
+    table_name = model.__tablename__
+
+    @event.listens_for(model, 'after_delete')
+    def _log_deletion(mapper, connection, target):
+        connection.execute(log_model.__table__.insert().values(
+            table_name=table_name,
+            record_id=target.id,
+            deleted_at=datetime.utcnow()
+        ))
+
+    return _log_deletion
+
+
+def _decode_since(token):
+    if not token:
+        return None, 0, 0
+    payload = decode_token(token)
+    try:
+        updated_at = (
+            datetime.fromisoformat(payload['u']) if payload['u'] else None
+        )
+        return updated_at, int(payload['i']), int(payload['d'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Token since inválido')
+
+
+def changes_since(query, model, log_model, token, limit):
+    """Linhas criadas/alteradas e ids apagados depois do token ``since``
+
+    As linhas são percorridas por ``(updated_at, id)`` e os tombstones pelo
+    id do log, ambos por keyset. Sem token, devolve o estado completo (em
+    páginas) e nenhum tombstone. O cliente deve aplicar as linhas como
+    upsert por id, pois uma mesma linha pode voltar em polls seguidos.
+    """
+    since_updated_at, since_id, since_deleted = _decode_since(token)
+    horizon = datetime.utcnow() - SYNC_LAG
+    keys = [(model.updated_at, False), (model.id, False)]
+
+    query = query.filter(model.updated_at <= horizon)
+    if since_updated_at is not None:
+        query = query.filter(after_cursor(keys, [since_updated_at, since_id]))
+    rows = query.order_by(*order_clauses(keys)).limit(limit + 1).all()
+
+    deleted = []
+    if token:
+        deleted = (
+            log_model.query
+            .filter(
+                log_model.table_name == model.__tablename__,
+                log_model.id > since_deleted,
+                log_model.deleted_at <= horizon
+            )
+            .order_by(log_model.id)
+            .limit(limit + 1)
+            .all()
+        )
+    else:
+        # Estado inicial: os tombstones anteriores não interessam
+        last = log_model.query.order_by(log_model.id.desc()).first()
+        since_deleted = last.id if last else 0
+
+    has_more = len(rows) > limit or len(deleted) > limit
+    rows, deleted = rows[:limit], deleted[:limit]
+
+    if rows:
+        since_updated_at, since_id = rows[-1].updated_at, rows[-1].id
+    if deleted:
+        since_deleted = deleted[-1].id
+
+    next_since = encode_token({
+        'u': since_updated_at.isoformat() if since_updated_at else None,
+        'i': since_id,
+        'd': since_deleted,
+    })
+    return rows, [entry.record_id for entry in deleted], next_since, has_more
+
+
+def sync_response(items, deleted, next_since, has_more):
+    """Formato padrão de resposta dos endpoints de sincronização"""
+    return {
+        'changes': items,
+        'deleted': deleted,
+        'next_since': next_since,
+        'has_more': has_more
+    }
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+from utils.pagination import wants_full_listing
+from utils.streaming import wants_stream
+
+TASK_STATUSES = ('TO_DO', 'IN_PROGRESS', 'DONE')
+TASK_PRIORITIES = ('LOW', 'MEDIUM', 'HIGH')
+TASK_TYPES = ('WORK', 'UNIVERSITY')
+
+# Campos aceitos em ?sort= (prefixo "-" para ordem decrescente)
+SORT_FIELDS = ('id', 'created_at', 'updated_at', 'due_date', 'title')
+
+
+def _parse_choices(raw, name, choices):
+    values = [value.strip().upper() for value in raw.split(',') if value.strip()]
+    if not values:
+        raise ValueError(f'Parâmetro {name} vazio')
+    invalid = [value for value in values if value not in choices]
+    if invalid:
+        raise ValueError(
+            f'Valor inválido para {name}: {", ".join(invalid)} '
+            f'(aceitos: {", ".join(choices)})'
+        )
+    return values
+
+
+def _parse_date(raw, name):
+    try:
+        return datetime.strptime(raw, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Parâmetro {name} deve estar no formato YYYY-MM-DD')
+
+
+def parse_task_filters(args, task_type=None):
+    """Valida os parâmetros de listagem de tarefas e devolve a especificação
+
+    ``task_type`` vem da rota ``/tasks/<task_type>``; nesse caso o
+    parâmetro ``type`` na query string é uma combinação inválida.
+    Parâmetros desconhecidos são ignorados (cache-busters como ``_=`` e
+    parâmetros acrescentados por proxies). Levanta ``ValueError`` com a
+    mensagem para o cliente.
+    """
+    spec = {}
+
+    if task_type is not None:
+        if 'type' in args:
+            raise ValueError('Parâmetro type não pode ser usado nesta rota')
+        spec['type'] = [task_type.upper()]
+    elif args.get('type'):
+        spec['type'] = _parse_choices(args['type'], 'type', TASK_TYPES)
+
+    if args.get('status'):
+        spec['status'] = _parse_choices(args['status'], 'status', TASK_STATUSES)
+    if args.get('priority'):
+        spec['priority'] = _parse_choices(
+            args['priority'], 'priority', TASK_PRIORITIES
+        )
+
+    for name in ('assigned_to', 'created_by'):
+        if args.get(name):
+            spec[name] = args[name]
+
+    if args.get('category_id'):
+        try:
+            spec['category_id'] = int(args['category_id'])
+        except ValueError:
+            raise ValueError('Parâmetro category_id deve ser um número inteiro')
+
+    if args.get('due_from'):
+        spec['due_from'] = _parse_date(args['due_from'], 'due_from')
+    if args.get('due_to'):
+        spec['due_to'] = _parse_date(args['due_to'], 'due_to')
+    if (
+        'due_from' in spec and 'due_to' in spec
+        and spec['due_from'] > spec['due_to']
+    ):
+        raise ValueError('due_from deve ser anterior ou igual a due_to')
+
+    sort = args.get('sort') or 'id'
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in SORT_FIELDS:
+        raise ValueError(
+            f'Ordenação inválida: {sort} (aceitos: {", ".join(SORT_FIELDS)})'
+        )
+    # due_date é opcional; a paginação por cursor não atravessa NULLs,
+    # então a ordenação por prazo só vale dentro de um intervalo de datas
+    if field == 'due_date' and not ('due_from' in spec or 'due_to' in spec):
+        raise ValueError('Ordenação por due_date exige due_from ou due_to')
+    spec['sort'] = (field, descending)
+
+    if args.get('cursor') and wants_full_listing(args):
+        raise ValueError('Parâmetros cursor e all não podem ser combinados')
+    if wants_stream(args) and (args.get('cursor') or args.get('limit')):
+        raise ValueError(
+            'Parâmetro stream devolve a listagem completa; '
+            'não combine com cursor ou limit'
+        )
+
+    return spec
+
+
+def apply_task_filters(query, model, spec):
+    """Aplica a especificação de filtros a uma consulta de tarefas"""
+    for name in ('type', 'status', 'priority'):
+        if name in spec:
+            column = getattr(model, name)
+            values = spec[name]
+            query = query.filter(
+                column == values[0] if len(values) == 1 else column.in_(values)
+            )
+
+    for name in ('assigned_to', 'created_by', 'category_id'):
+        if name in spec:
+            query = query.filter(getattr(model, name) == spec[name])
+
+    if 'due_from' in spec:
+        query = query.filter(model.due_date >= spec['due_from'])
+    if 'due_to' in spec:
+        query = query.filter(model.due_date <= spec['due_to'])
+
+    return query
+
+
+def task_sort_keys(model, spec):
+    """Colunas de ordenação (sempre desempatadas pelo id)"""
+    field, descending = spec['sort']
+    if field == 'id':
+        return [(model.id, descending)]
+    return [(getattr(model, field), descending), (model.id, descending)]
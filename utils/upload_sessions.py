@@ -0,0 +1,207 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, func
+
+from utils.blobs import (
+    BLOB_CHUNK_SIZE, TMP_DIR, acquire_blob, blob_path, hash_file, link_file
+)
+
+# Tamanho máximo de um arquivo enviado em partes
+MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+# Tamanho sugerido de cada PATCH (abaixo do MAX_CONTENT_LENGTH de 16MB)
+RECOMMENDED_CHUNK_SIZE = 8 * 1024 ** 2
+# Sessões sem PATCH por mais que isso são consideradas abandonadas
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+# Limites das sessões abertas ao mesmo tempo: quantidade e soma dos
+# tamanhos declarados (o que elas ainda podem ocupar em disco)
+DEFAULT_MAX_UPLOAD_SESSIONS = 20
+DEFAULT_MAX_RESERVED_BYTES = 4 * 1024 ** 3
+
+
+class UploadCapacityError(Exception):
+    """Nova sessão ultrapassaria os limites de sessões abertas"""
+
+
+def session_file(root, upload_id):
+    """Arquivo da sessão, em ``root/tmp`` (mesmo FS dos blobs)"""
+    return os.path.join(root, TMP_DIR, f'{upload_id}.upload')
+
+
+def session_response(upload):
+    """``to_dict()`` da sessão com o prazo para retomar o envio"""
+    data = upload.to_dict()
+    data['expires_at'] = (upload.updated_at + UPLOAD_SESSION_TTL).isoformat()
+    data['chunk_size'] = RECOMMENDED_CHUNK_SIZE
+    return data
+
+
+def parse_upload_size(raw):
+    try:
+        size = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError('Campo size deve ser um número inteiro de bytes')
+    if size < 1 or size > MAX_UPLOAD_SIZE:
+        raise ValueError(f'Campo size deve estar entre 1 e {MAX_UPLOAD_SIZE}')
+    return size
+
+
+def parse_offset(raw):
+    """Offset do chunk (cabeçalho ``Upload-Offset`` ou ``?offset=``)"""
+    try:
+        offset = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError('Informe o offset do chunk (cabeçalho Upload-Offset)')
+    if offset < 0:
+        raise ValueError('Offset não pode ser negativo')
+    return offset
+
+
+def _create_sparse(path, size):
+    """Cria o arquivo com ``size`` bytes esparsos
+
+    Nada é reservado em disco: o espaço só é ocupado conforme os chunks
+    chegam, então abrir uma sessão não custa o tamanho declarado.
+    """
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        os.ftruncate(descriptor, size)
+    finally:
+        os.close(descriptor)
+
+
+def _pwrite(descriptor, data, offset):
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(descriptor, data, offset)
+    os.lseek(descriptor, offset, os.SEEK_SET)
+    return os.write(descriptor, data)
+
+
+def _check_capacity(session, model, size, max_sessions, max_reserved):
+    """Levanta ``UploadCapacityError`` se não cabe mais uma sessão de ``size``"""
+    count, reserved = session.query(
+        func.count(model.id), func.coalesce(func.sum(model.size), 0)
+    ).one()
+    if count >= max_sessions:
+        raise UploadCapacityError(
+            f'Limite de {max_sessions} uploads em andamento atingido'
+        )
+    if reserved + size > max_reserved:
+        raise UploadCapacityError(
+            'Limite de bytes em uploads em andamento atingido '
+            f'({reserved} de {max_reserved} reservados)'
+        )
+
+
+def create_upload_session(session, model, root, filename, size,
+                          max_sessions=DEFAULT_MAX_UPLOAD_SESSIONS,
+                          max_reserved=DEFAULT_MAX_RESERVED_BYTES, **fields):
+    """Registra a sessão e cria o arquivo esparso (sem commit)
+
+    Recusa a sessão (``UploadCapacityError``) acima de ``max_sessions``
+    abertas ou de ``max_reserved`` bytes declarados no total.
+    """
+    _check_capacity(session, model, size, max_sessions, max_reserved)
+    upload = model(
+        id=uuid.uuid4().hex, filename=filename, size=size, received=0,
+        **fields
+    )
+    os.makedirs(os.path.join(root, TMP_DIR), exist_ok=True)
+    _create_sparse(session_file(root, upload.id), size)
+    session.add(upload)
+    session.flush()
+    return upload
+
+
+def write_chunk(session, model, upload, stream, offset, root,
+                chunk_size=BLOB_CHUNK_SIZE):
+    """Grava o corpo do PATCH em ``offset`` com escritas posicionais
+
+    O corpo é lido em blocos e cada bloco vai direto para sua posição no
+    arquivo da sessão. Depois do ``fsync`` o fim do chunk passa a ser o
+    offset confirmado (sem recuar se um chunk antigo for reenviado).
+    Retorna o novo offset; o chamador faz o commit.
+    """
+    written = 0
+    descriptor = os.open(session_file(root, upload.id), os.O_WRONLY)
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            if offset + written + len(data) > upload.size:
+                raise ValueError('Chunk ultrapassa o tamanho declarado')
+            while data:
+                count = _pwrite(descriptor, data, offset + written)
+                data = data[count:]
+                written += count
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+    end = offset + written
+    table = model.__table__
+    session.execute(
+        table.update().where(table.c.id == upload.id).values(
+            received=case(
+                (table.c.received < end, end), else_=table.c.received
+            ),
+            updated_at=datetime.utcnow()
+        )
+    )
+    session.refresh(upload)
+    return upload.received
+
+
+def finalize_upload(session, blob_model, upload, root):
+    """Transforma o arquivo completo da sessão em blob (sem commit)
+
+    O SHA-256 é calculado numa leitura do arquivo (os chunks podem ter
+    chegado fora de ordem ou repetidos); conteúdo novo é ligado (ou
+    copiado) em ``blob_path``. O arquivo da sessão continua em
+    ``root/tmp``: se o commit falhar, o upload pode ser concluído de
+    novo. Depois do commit o chamador usa ``publish_blob`` com ele.
+    """
+    path = session_file(root, upload.id)
+    digest, size = hash_file(path)
+    blob = acquire_blob(session, blob_model, digest, size)
+    target = blob_path(root, digest)
+    if not os.path.exists(target):
+        link_file(path, target)
+    session.delete(upload)
+    return blob
+
+
+def discard_upload_session(session, upload, root):
+    """Cancela a sessão e apaga o arquivo parcial (sem commit)"""
+    path = session_file(root, upload.id)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete(upload)
+
+
+def expire_upload_sessions(session, model, root, now=None):
+    """Apaga sessões abandonadas e arquivos temporários antigos
+
+    Sessões sem escrita há mais de ``UPLOAD_SESSION_TTL`` saem pela
+    faixa de ``ix_upload_session_updated_at``. Cada PATCH atualiza a
+    data do arquivo junto com ``updated_at``, então qualquer arquivo de
+    ``root/tmp`` mais antigo que o prazo também está abandonado (inclui
+    ``.part`` de uploads simples interrompidos). Faz o commit.
+    """
+    cutoff = (now or datetime.utcnow()) - UPLOAD_SESSION_TTL
+    expired = session.query(model).filter(model.updated_at < cutoff).all()
+    for upload in expired:
+        discard_upload_session(session, upload, root)
+    session.commit()
+
+    removed = 0
+    directory = os.path.join(root, TMP_DIR)
+    if os.path.isdir(directory):
+        limit = cutoff.replace(tzinfo=timezone.utc).timestamp()
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+                removed += 1
+    return len(expired), removed
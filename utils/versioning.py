@@ -0,0 +1,89 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event
+
+
+def bump_table_version(connection, version_model, table_name):
+    """Incrementa o contador de versão da tabela na transação corrente"""
+    table = version_model.__table__
+    result = connection.execute(
+        table.update()
+        .where(table.c.table_name == table_name)
+        .values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            table.insert().values(table_name=table_name, version=1)
+        )
+
+
+def track_versions(model, version_model):
+    """Incrementa a versão da tabela de ``model`` a cada INSERT/UPDATE/DELETE
+
+    O contador fica no próprio banco (não na memória do processo), então
+    todos os workers do gunicorn enxergam o mesmo valor. Escritas em lote
+    pelo Core não disparam eventos do mapper e devem chamar
+    ``bump_table_version`` diretamente.
+    """
+    table_name = model.__tablename__
+
+    def _bump(mapper, connection, target):
+        bump_table_version(connection, version_model, table_name)
+
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, _bump)
+
+
+def read_table_versions(session, version_model, table_names):
+    """Versões atuais das tabelas (0 para tabelas nunca alteradas)"""
+    rows = session.query(
+        version_model.table_name, version_model.version
+    ).filter(version_model.table_name.in_(table_names)).all()
+    versions = dict(rows)
+    return [versions.get(name, 0) for name in table_names]
+
+
+def make_conditional_get(db, version_model):
+    """Cria o decorator ``@conditional_get(*tabelas, extra=None)``
+
+    O ETag fraco combina rota, query string e a versão das tabelas de que
+    a resposta depende. Se o cliente já tem esse ETag (``If-None-Match``),
+    responde 304 sem executar a consulta nem serializar nada. ``extra`` é
+    uma função para dependências fora do banco (ex.: a data de hoje).
+
+    A versão é lida antes da consulta, na mesma transação de leitura, então
+    o conteúdo nunca é mais antigo que o ETag enviado.
+    """
+    def conditional_get(*table_names, extra=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                versions = read_table_versions(
+                    db.session, version_model, table_names
+                )
+                parts = [request.full_path] + [
+                    f'{name}:{version}'
+                    for name, version in zip(table_names, versions)
+                ]
+                if extra is not None:
+                    parts.append(str(extra()))
+                etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+                if request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                    response.set_etag(etag, weak=True)
+                    return response
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    response.set_etag(etag, weak=True)
+                    response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
+    return conditional_get